@@ -11,6 +11,7 @@ import re
 import time
 import configparser
 import sys
+import os
 import financeData
 
 class DataCenterConfigError(Exception): pass
@@ -127,6 +128,22 @@ class DataCenterConfig():
             None
         """
         return "{0:s}_{1:s}_{2:s}_{3:s}.csv".format(self.Name, self.dataSource, str(self.period), self.timeType)
+    def binaryFileNameStr (self):
+        """Generate filename string for binary history file.
+
+        Generate filename string. The name is the csv file name with the
+        extension ".fds".
+
+        Args:
+            None
+
+        Returns:
+            None
+
+        Raise:
+            None
+        """
+        return os.path.splitext(self.fileNameStr())[0]+".fds"
 class DataCenterCofigCollect():
     """This class contain a list of DataCenterConfig.
     
@@ -244,6 +261,8 @@ class DataCenter():
         """Get finance data from file.
 
         This function can get data from file with DataCenterConfig.
+        The binary history file is used if it exists, otherwise the csv
+        history file is used.
 
         Args:
             dataConfig: must be DataCenterConfig class.
@@ -256,9 +275,12 @@ class DataCenter():
             None
         """
         if  isinstance(dataConfig,DataCenterConfig):
-            strtemp=dataConfig.historyDir+"/"+dataConfig.fileNameStr()
+            strtemp=dataConfig.historyDir+"/"+dataConfig.binaryFileNameStr()
+            if not os.path.exists(strtemp):
+                strtemp=dataConfig.historyDir+"/"+dataConfig.fileNameStr()
             result=financeData.FinanceDataSet(None, dataConfig.timeType,
-                                              dataConfig.period)
+                                              dataConfig.period,
+                                              dataConfig.symbol)
         else:
             raise DataCenterFileNotExist("{0:s} is not a file name string or"
                                          " DataCenterConfig class."
@@ -271,7 +293,9 @@ class DataCenter():
     def saveDataToFile (self, config, inputdata):
         """save finance data to file.
 
-        This function can save data to file with DataCenterConfig.
+        This function can save data to binary file with DataCenterConfig.
+        If the file is loaded by getDataFromFile and only new rows are added,
+        only the new rows are written.
 
         Args:
             dataConfig: must be a DataCenterConfig class.
@@ -283,14 +307,39 @@ class DataCenter():
             return a class financeData.FinanceDataSet.
 
         Raise:
+            DataCenterError: config or inputdata has a wrong type.
+        """
+        if not isinstance(config, DataCenterConfig):
+            raise DataCenterError("{0:s} is not a DataCenterConfig class.".format(str(config)))
+        if not isinstance(inputdata, financeData.FinanceDataSet):
+            raise DataCenterError("{0:s} is not a FinanceDataSet class.".format(str(inputdata)))
+        strtemp=config.historyDir+"/"+config.binaryFileNameStr()
+        inputdata.saveDataToBinaryFile(strtemp)
+    def exportDataToCsv (self, config, inputdata):
+        """export finance data to csv file.
+
+        This function can save data to csv file with DataCenterConfig.
+        The rows after the last row of the csv file are appended if the older
+        rows are not changed, otherwise the file is rewritten.
+
+        Args:
+            dataConfig: must be a DataCenterConfig class.
+                      This arg can give file information to save data.
+            inputdata: must be a financeData.FinanceDataSet class.
+                     The finace data set.
+
+        Returns:
             None
+
+        Raise:
+            DataCenterError: config or inputdata has a wrong type.
         """
         if not isinstance(config, DataCenterConfig):
-            raise DataCenter("{0:s} is not a DataCenterConfig class.".format(str(config)))
+            raise DataCenterError("{0:s} is not a DataCenterConfig class.".format(str(config)))
         if not isinstance(inputdata, financeData.FinanceDataSet):
-            raise DataCenter("{0:s} is not a FinanceDataSet class.".format(str(inputdata)))
+            raise DataCenterError("{0:s} is not a FinanceDataSet class.".format(str(inputdata)))
         strtemp=config.historyDir+"/"+config.fileNameStr()
-        inputdata.saveDataToFile(strtemp)
+        inputdata.saveDataToFile(strtemp, True)
     def getHistoryDataFromInternet (self, setting, startTime=datetime.datetime(1976,1,1)):
         """get financedata from internet
 
@@ -483,13 +532,25 @@ if __name__=="__main__":
         print("    Get From File",":",item.historyDir+"/"+item.fileNameStr())
         sys.stdout.flush()
         filedata=dcenter.getDataFromFile(item)
+        if filedata.loadStatistics is not None:
+            print("    Load {rows:d} rows in {seconds:.3f} s"
+                  " ({rowsPerSecond:.0f} rows/s)."
+                  .format(**filedata.loadStatistics))
         #continue
         print("    Get From Internet",":",item.dataSource)
         sys.stdout.flush()
         if item.timeType==financeData.FinanceDataSet.timeTypeDict["day"]:
             newData=dcenter.getHistoryDataFromInternet(item,filedata.getLastTime()+datetime.timedelta(days=1))
-        print("    There are {0:d} new items.".format(len(newData)))
+        newData.sortTime()
+        sizetemp=len(filedata)
+        filedata.mergeset(newData, "old")
+        print("    There are {0:d} new items.".format(len(filedata)-sizetemp))
         sys.stdout.flush()
-        filedata.addset(newData)
-        dcenter.saveDataToFile(item,filedata)
+        for savetemp in (dcenter.saveDataToFile, dcenter.exportDataToCsv):
+            savetemp(item,filedata)
+            print("    Save {format:s} {rows:d} rows{0:s} in {seconds:.3f} s."
+                  .format(" incrementally"
+                          if filedata.saveStatistics["incremental"] else "",
+                          **filedata.saveStatistics))
+            sys.stdout.flush()
 
@@ -11,12 +11,466 @@ import time
 import os
 import sys
 import unittest
+import tempfile
+import struct
+import shutil
+import itertools
+import numpy
 
 class FinanceDataError(Exception): pass
 class FinanceDataOutOfIndex(FinanceDataError): pass
 class FinanceDataSetDataWrong(FinanceDataError): pass
 class FinanceDataSetHighValueWrong(FinanceDataError): pass
 class FinanceDataSetFileNotExist(FinanceDataError): pass
+class FinanceDataSetFileFormatWrong(FinanceDataError): pass
+class FinanceDataNotSorted(FinanceDataError): pass
+class FinanceDataSetMergeConflict(FinanceDataError): pass
+
+epochBase=datetime.datetime(1970,1,1)
+epochUnit=datetime.timedelta(microseconds=1)
+
+def datetime2Epoch (idatetime):
+    """convert datetime to epoch time
+
+    convert datetime to int epoch time. The epoch time is microseconds from
+    1970/01/01 00:00:00 without any time zone convert.
+
+    Args:
+        idatetime: datetime.datetime
+
+    Returns:
+        return int epoch time.
+
+    Raise:
+        None
+    """
+    return (idatetime-epochBase)//epochUnit
+def epoch2Datetime (iepoch):
+    """convert epoch time to datetime
+
+    convert int epoch time to datetime. It is inverse of datetime2Epoch.
+
+    Args:
+        iepoch: int epoch time
+
+    Returns:
+        return datetime.datetime.
+
+    Raise:
+        None
+    """
+    return epochBase+datetime.timedelta(microseconds=int(iepoch))
+def toEpochArray (itime):
+    """convert time sequence to int64 epoch array
+
+    convert time sequence to int64 epoch array.
+
+    Args:
+        itime: numpy int64 epoch array, numpy datetime64 array or a sequence
+             of datetime.datetime
+
+    Returns:
+        return numpy int64 array.
+
+    Raise:
+        None
+    """
+    if isinstance(itime, numpy.ndarray):
+        if itime.dtype.kind=='M':
+            return itime.astype('datetime64[us]').view(numpy.int64)
+        if itime.dtype.kind in 'iu':
+            return itime.astype(numpy.int64, copy=False)
+    return numpy.array(list(itime), dtype='datetime64[us]').view(numpy.int64)
+def epochArray2DatetimeList (iepoch):
+    """convert int64 epoch array to a datetime list
+
+    convert int64 epoch array to a list of datetime.datetime.
+
+    Args:
+        iepoch: numpy int64 epoch array
+
+    Returns:
+        return a list of datetime.datetime.
+
+    Raise:
+        None
+    """
+    return numpy.asarray(iepoch, dtype=numpy.int64).view('datetime64[us]').astype(object).tolist()
+# serial numbers of lines and datasets, they are never reused like id()
+_serialCounter=itertools.count(1)
+def _reserve (buffer, size, need):
+    """return a buffer which can keep need elements
+
+    The first size elements are kept. The buffer grows geometrically so
+    appending one element is amortized O(1).
+    """
+    if need<=len(buffer):
+        return buffer
+    result=numpy.empty(max(need, 2*len(buffer), 16), dtype=buffer.dtype)
+    result[:size]=buffer[:size]
+    return result
+def _readOnly (array):
+    result=array.view()
+    result.flags.writeable=False
+    return result
+def _sparseArgTable (values, greater):
+    """build a sparse table of first best value indexes
+
+    Level j keeps the index of the first best value in values[i:i+2**j],
+    greater(a, b) is True where value a is better than value b.
+    """
+    return _extendSparseArgTable([numpy.empty(0, dtype=numpy.int64)], values,
+                                 greater, 0)
+def _extendSparseArgTable (levels, values, greater, oldSize):
+    """update a sparse table for values whose rows from oldSize are new
+
+    Only the entries which cover the new rows are computed, one level from
+    the level below, so adding one row costs O(log n).
+    """
+    sizetemp=len(values)
+    levels[0]=_reserve(levels[0], oldSize, sizetemp)
+    levels[0][oldSize:sizetemp]=numpy.arange(oldSize, sizetemp)
+    leveltemp=1
+    while 2**leveltemp<=sizetemp:
+        span=2**(leveltemp-1)
+        if leveltemp==len(levels):
+            levels.append(levels[0][:0].copy())
+            begin=0
+        else:
+            begin=max(oldSize-2**leveltemp+1, 0)
+        end=sizetemp-2**leveltemp+1
+        levels[leveltemp]=_reserve(levels[leveltemp], begin, end)
+        first=levels[leveltemp-1][begin:end]
+        second=levels[leveltemp-1][begin+span:end+span]
+        levels[leveltemp][begin:end]=numpy.where(greater(values[second],
+                                                         values[first]),
+                                                 second, first)
+        leveltemp+=1
+    return levels
+def _rangeArgIndex (tables, cleanRows, key, values, greater, start, stop):
+    """answer first best index queries with a cached sparse table
+
+    tables[key] keeps the sparse table of values and cleanRows[key] the
+    count of rows which are not changed since the table is updated.
+    """
+    if key not in tables:
+        tables[key]=[numpy.empty(0, dtype=numpy.int64)]
+        cleanRows[key]=0
+    if cleanRows[key]<len(values):
+        _extendSparseArgTable(tables[key], values, greater, cleanRows[key])
+        cleanRows[key]=len(values)
+    return _sparseArgQuery(tables[key], values, greater, start, stop)
+def _checkedRangeIndex (query, size, start, stop, greater):
+    """check [start, stop) ranges and call query(start, stop, greater)"""
+    starttemp=numpy.asarray(start, dtype=numpy.int64)
+    stoptemp=numpy.asarray(stop, dtype=numpy.int64)
+    if (starttemp<0).any() or (stoptemp>size).any() or \
+       (starttemp>=stoptemp).any():
+        raise FinanceDataOutOfIndex("range {0:s}:{1:s} is empty or out of "
+                                    "{2:d} values."
+                                    .format(str(start), str(stop), size))
+    result=query(starttemp, stoptemp, greater)
+    return int(result) if result.ndim==0 else result
+def _sparseArgQuery (levels, values, greater, start, stop):
+    """return the first best value indexes of values[start:stop]
+
+    start and stop are index arrays and start<stop. Each range is covered
+    by two table ranges of the same level.
+    """
+    start=numpy.asarray(start, dtype=numpy.int64)
+    stop=numpy.asarray(stop, dtype=numpy.int64)
+    level=numpy.frexp(stop-start)[1]-1
+    result=numpy.empty(start.shape, dtype=numpy.int64)
+    for leveltemp in numpy.unique(level).tolist():
+        select=level==leveltemp
+        first=levels[leveltemp][start[select]]
+        second=levels[leveltemp][stop[select]-2**leveltemp]
+        result[select]=numpy.where(greater(values[second], values[first]),
+                                   second, first)
+    return result
+def _prominence (values, peaks):
+    """return the prominence of each peak index"""
+    maxtable=_sparseArgTable(values, numpy.greater)
+    mintable=_sparseArgTable(values, numpy.less)
+    heights=values[peaks]
+    # extend both sides by binary lifting while no value is higher
+    left=peaks.copy()
+    right=peaks+1
+    for leveltemp in range(len(maxtable)-1, -1, -1):
+        span=2**leveltemp
+        select=left>=span
+        select[select]=(values[maxtable[leveltemp][left[select]-span]]
+                        <=heights[select])
+        left[select]-=span
+        select=right+span<=len(values)
+        select[select]=(values[maxtable[leveltemp][right[select]]]
+                        <=heights[select])
+        right[select]+=span
+    basetemp=numpy.maximum(
+        values[_sparseArgQuery(mintable, values, numpy.less, left, peaks+1)],
+        values[_sparseArgQuery(mintable, values, numpy.less, peaks, right)])
+    return heights-basetemp
+def _thinPeak (values, peaks, minDistance):
+    """remove lower peaks closer than minDistance to a higher peak"""
+    keep=numpy.ones(len(peaks), dtype=bool)
+    for icount in numpy.argsort(-values[peaks], kind="stable").tolist():
+        if not keep[icount]:
+            continue
+        first=numpy.searchsorted(peaks, peaks[icount]-minDistance+1)
+        last=numpy.searchsorted(peaks, peaks[icount]+minDistance)
+        keep[first:last]=False
+        keep[icount]=True
+    return peaks[keep]
+def _isSorted (itime):
+    return bool(numpy.all(itime[1:]>=itime[:-1]))
+def _sliceSorted (k, timeSorted):
+    """a slice with positive step keeps the time order"""
+    if timeSorted and (k.step is None or k.step>0):
+        return True
+    return None
+def _addSorted (timeSorted, itime, size, epoch):
+    """update sorted flag after epoch is put after itime[size-1]"""
+    if timeSorted is not False and size>0 and epoch<itime[size-1]:
+        return False
+    return timeSorted
+def _indexOfTime (itime, timeSorted, idatetime):
+    epochtemp=datetime2Epoch(idatetime)
+    if timeSorted:
+        indextemp=int(numpy.searchsorted(itime, epochtemp, "left"))
+        if indextemp<len(itime) and itime[indextemp]==epochtemp:
+            return indextemp
+    else:
+        indextemp=numpy.flatnonzero(itime==epochtemp)
+        if len(indextemp)!=0:
+            return int(indextemp[0])
+    raise FinanceDataOutOfIndex("{0:s} is not found.".format(str(idatetime)))
+def _asOfIndex (itime, idatetime):
+    indextemp=int(numpy.searchsorted(itime, datetime2Epoch(idatetime),
+                                     "right"))-1
+    if indextemp<0:
+        raise FinanceDataOutOfIndex("{0:s} is before the first time."
+                                    .format(str(idatetime)))
+    return indextemp
+def _digitsValue (digits):
+    return digits@(10**numpy.arange(digits.shape[1]-1, -1, -1))
+def _parseCsvColumns (text):
+    """parse csv text in FinanceDataSet.dataStrType2 layout in batch
+
+    The time strings are checked and converted as a fixed width byte matrix,
+    and the numbers are converted column by column. It returns None if the
+    text is not in this layout, then the caller uses the general parser.
+
+    Args:
+        text: csv file content
+
+    Returns:
+        return (int64 epoch time array, float64 (5, n) value array) or None
+
+    Raise:
+        None
+    """
+    lines=text.splitlines()
+    if len(lines)!=0 and lines[0].strip()==FinanceDataSet.csvHeadString:
+        del lines[0]
+    while len(lines)!=0 and lines[-1].strip()=="":
+        del lines[-1]
+    if len(lines)==0 or '"' in text:
+        return None
+    fields=",".join(lines).split(",")
+    if len(fields)!=6*len(lines):
+        return None
+    try:
+        timetemp=numpy.array(fields[0::6], dtype="S")
+        valuetemp=numpy.array([fields[icount::6] for icount in range(1, 6)],
+                              dtype=numpy.float64)
+    except (UnicodeEncodeError, ValueError):
+        return None
+    if timetemp.dtype.itemsize!=26:
+        return None
+    chars=timetemp.view(numpy.uint8).reshape(len(lines), 26)
+    for col, chartemp in ((4, b"/"), (7, b"/"), (10, b" "), (13, b":"),
+                          (16, b":"), (19, b":")):
+        if (chars[:, col]!=ord(chartemp)).any():
+            return None
+    digits=chars[:, [0,1,2,3,5,6,8,9,11,12,14,15,17,18,20,21,22,23,24,25]]
+    digits=digits.astype(numpy.int64)-ord(b"0")
+    if (digits<0).any() or (digits>9).any():
+        return None
+    year=_digitsValue(digits[:, 0:4])
+    month=_digitsValue(digits[:, 4:6])
+    day=_digitsValue(digits[:, 6:8])
+    hour=_digitsValue(digits[:, 8:10])
+    minute=_digitsValue(digits[:, 10:12])
+    second=_digitsValue(digits[:, 12:14])
+    if ((month<1).any() or (month>12).any() or (day<1).any() or
+        (hour>23).any() or (minute>59).any() or (second>59).any()):
+        return None
+    monthtemp=((year-1970)*12+month-1).astype("datetime64[M]")
+    daytemp=monthtemp.astype("datetime64[D]")+(day-1)
+    if (daytemp.astype("datetime64[M]")!=monthtemp).any():
+        return None
+    # microseconds are checked but dropped like time.strptime does
+    epochtemp=(daytemp.astype(numpy.int64)*86400+hour*3600+minute*60
+               +second)*1000000
+    return (epochtemp, valuetemp)
+def isBinaryDataFile (fileName):
+    """check a file is written by FinanceDataSet.saveDataToBinaryFile
+
+    Args:
+        fileName: file path
+
+    Returns:
+        return True if the file starts with FinanceDataSet.binaryMagic
+
+    Raise:
+        None
+    """
+    try:
+        with open(fileName, "rb") as binFileR:
+            magic=binFileR.read(len(FinanceDataSet.binaryMagic))
+    except OSError:
+        return False
+    return magic==FinanceDataSet.binaryMagic
+def _binaryColumns (buffer, fileName):
+    """unpack a FinanceDataSet binary file buffer
+
+    Args:
+        buffer: the file content, bytes, bytearray or numpy.memmap
+        fileName: file name for error message
+
+    Returns:
+        return (head dict, time column, (5, capacity) value columns). The
+        columns share the buffer.
+
+    Raise:
+        FinanceDataSetFileFormatWrong: the buffer is not a binary data file
+    """
+    headtemp=_binaryHead(buffer, fileName)
+    capacity=headtemp["capacity"]
+    columntemp=len(FinanceDataSet.columnDict)
+    if len(buffer)<FinanceDataSet.binaryHeadSize+8*(columntemp+1)*capacity:
+        raise FinanceDataSetFileFormatWrong("{0:s} is truncated."
+                                            .format(fileName))
+    timetemp=numpy.frombuffer(buffer, dtype="<i8", count=capacity,
+                              offset=FinanceDataSet.binaryHeadSize)
+    valuetemp=numpy.frombuffer(buffer, dtype="<f8",
+                               count=columntemp*capacity,
+                               offset=FinanceDataSet.binaryHeadSize+8*capacity)
+    return (headtemp, timetemp, valuetemp.reshape(columntemp, capacity))
+def _binaryHead (buffer, fileName):
+    """unpack a FinanceDataSet binary file head into a dict"""
+    if len(buffer)<FinanceDataSet.binaryHeadSize:
+        raise FinanceDataSetFileFormatWrong("{0:s} is too short."
+                                            .format(fileName))
+    (magic, version, flags, rows, capacity, firstTime, lastTime, period,
+     timeType, symbol)=FinanceDataSet.binaryHeadStruct.unpack_from(buffer, 0)
+    if magic!=FinanceDataSet.binaryMagic:
+        raise FinanceDataSetFileFormatWrong("{0:s} is not a binary data file."
+                                            .format(fileName))
+    if version!=FinanceDataSet.binaryVersion:
+        raise FinanceDataSetFileFormatWrong("{0:s} version {1:d} is not "
+                                            "supported."
+                                            .format(fileName, version))
+    if rows<0 or rows>capacity:
+        raise FinanceDataSetFileFormatWrong("{0:s} row count is wrong."
+                                            .format(fileName))
+    return {"sorted":bool(flags&1), "rows":rows, "capacity":capacity,
+            "firstTime":firstTime, "lastTime":lastTime, "period":period,
+            "timeType":timeType.rstrip(b"\0").decode("ascii"),
+            "symbol":symbol.rstrip(b"\0").decode("utf-8", "replace")}
+def _fileIdentity (fileName):
+    """return (real path, size, modified time) of a file, or None"""
+    try:
+        stattemp=os.stat(fileName)
+    except OSError:
+        return None
+    return (os.path.realpath(fileName), stattemp.st_size,
+            stattemp.st_mtime_ns)
+def _writeAtomic (fileName, binary, writer):
+    """write a file by writer(fileObject) and replace fileName atomically"""
+    (handle, temppath)=tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(fileName)), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb" if binary else "w",
+                       newline=None if binary else '') as fileW:
+            writer(fileW)
+            fileW.flush()
+            os.fsync(fileW.fileno())
+        if os.path.exists(fileName):
+            shutil.copymode(fileName, temppath)
+        else:
+            os.chmod(temppath, 0o644)
+        os.replace(temppath, fileName)
+    except BaseException:
+        if os.path.exists(temppath):
+            os.remove(temppath)
+        raise
+def _reserveColumns (buffer, size, need):
+    """return a 2-D buffer which can keep need columns, like _reserve"""
+    if need<=buffer.shape[1]:
+        return buffer
+    result=numpy.empty((buffer.shape[0], max(need, 2*buffer.shape[1], 16)),
+                       dtype=buffer.dtype)
+    result[:, :size]=buffer[:, :size]
+    return result
+def _aggregateColumns (itime, ivalues, starts):
+    """merge open, high, low, close, volume rows from each start index
+
+    Args:
+        itime: epoch time column
+        ivalues: (5, n) value columns
+        starts: sorted start indexes, the first one is a valid index
+
+    Returns:
+        return (time of the last rows, (5, len(starts)) merged values)
+
+    Raise:
+        None
+    """
+    lasts=numpy.append(starts[1:], len(itime))-1
+    (opentemp, hightemp, lowtemp, closetemp, voltemp)=ivalues
+    return (itime[lasts],
+            numpy.array([opentemp[starts],
+                         numpy.maximum.reduceat(hightemp, starts),
+                         numpy.minimum.reduceat(lowtemp, starts),
+                         closetemp[lasts],
+                         numpy.add.reduceat(voltemp, starts)]))
+def _timeBucket (itime, timeType):
+    """return the calendar unit index of each epoch time"""
+    itime=numpy.asarray(itime, dtype=numpy.int64)
+    if timeType=="year" or timeType=="month":
+        return (itime.view("datetime64[us]")
+                .astype("datetime64[{0:s}]".format(timeType[0].upper()))
+                .astype(numpy.int64))
+    daytemp=itime//86400000000
+    if timeType=="week":
+        # 1970/01/01 is Thursday, so weeks start on Monday
+        return (daytemp+3)//7
+    if timeType=="day":
+        return daytemp
+    return itime//{"hour":3600000000,
+                   "minute":60000000,
+                   "second":1000000}[timeType]
+def _uniqueMask (itime):
+    """return a mask which keeps the first row of each same time run"""
+    keep=numpy.ones(len(itime), dtype=bool)
+    keep[1:]=itime[1:]!=itime[:-1]
+    return keep
+def _firstIndex (mask, default):
+    """return the first True index of mask, or default"""
+    indextemp=numpy.flatnonzero(mask)
+    return int(indextemp[0]) if len(indextemp)!=0 else default
+def _timeRange (itime, start, end):
+    """return (begin, stop) index of start<=time<=end in sorted time array"""
+    if start is None:
+        begin=0
+    else:
+        begin=int(numpy.searchsorted(itime, datetime2Epoch(start), "left"))
+    if end is None:
+        stop=len(itime)
+    else:
+        stop=int(numpy.searchsorted(itime, datetime2Epoch(end), "right"))
+    return (begin, max(begin, stop))
 
 class FinancePoint:
     """This class finance data element "Point".
@@ -70,16 +524,30 @@ class FinancePoint:
         if not isinstance(other, FinancePoint):
             raise FinanceDataError("FinnacePoint > error.")
         return self.value>other.value
+    def __eq__ (self, other):
+        if not isinstance(other, FinancePoint):
+            return NotImplemented
+        return self.time==other.time and self.value==other.value
+    def __hash__ (self):
+        return hash((self.time, self.value))
     def __str__ (self):
         return ("FinancePoint Time: {} Value: {}".format(self.time, self.value))
 
 class FinanceLine():
     """This class finance line.
     
-    This is a container list for finance point.
+    This is a container list for finance point. The points are kept in two
+    columns, an int64 epoch time array and a float64 value array.
+    A sliced FinanceLine, or a FinanceLine which is created by
+    FinanceLine.fromArray with copy=False, is a view. It shares the source
+    arrays and copies them before it is changed.
+    The line remembers whether its time is sorted. Time lookup functions use
+    binary search on a sorted line.
 
     Attributes:
-        None
+        timeArray: read only int64 epoch time array
+        valueArray: read only float64 value array
+        cacheKey: (identity, version) of the line data for result caches
     """
     peakValeDict={"slope":0.0,"peak":1.0,"vale":2.0}
     def __init__(self, iline=None):
@@ -97,13 +565,87 @@ class FinanceLine():
         Raise:
             FinanceDataError: An error occured intialing instance.
         """
-        if not iline:
-            self.__points=[]
+        if iline is None:
+            self.__time=numpy.empty(0, dtype=numpy.int64)
+            self.__value=numpy.empty(0, dtype=numpy.float64)
+            self.__size=0
+            self.__sorted=True
         elif isinstance(iline, FinanceLine):
-            self=copy.copy(iline)
-            return
+            self.__time=iline.timeArray.copy()
+            self.__value=iline.valueArray.copy()
+            self.__size=len(iline)
+            self.__sorted=iline.__sorted
         else:
             raise FinanceDataError("FinanceLine init fail")
+        self.__shared=False
+        self.__rangeTable={}
+        self.__cleanRows={}
+        self.__serial=next(_serialCounter)
+        self.__version=0
+        self.__source=None
+    @classmethod
+    def fromArray (cls, itime, ivalue, copy=True, timeSorted=None,
+                   source=None):
+        """create a FinanceLine from time and value arrays
+
+        create a FinanceLine from time and value arrays
+
+        Args:
+            itime: time array. int64 epoch, datetime64 or datetime.datetime
+                 sequence
+            ivalue: value array, it must have same length as itime.
+            copy: False to share the input arrays until the line is changed.
+            timeSorted: True or False if the caller knows whether itime is
+                      sorted. None to check it when it is needed.
+            source: None or a hashable (identity, version) of the shared
+                  arrays. Lines which have the same source share cacheKey
+                  until they are changed.
+
+        Returns:
+            return a FinanceLine
+
+        Raise:
+            FinanceDataError: An error occured creating line.
+        """
+        timetemp=toEpochArray(itime)
+        valuetemp=numpy.asarray(ivalue, dtype=numpy.float64)
+        if timetemp.ndim!=1 or timetemp.shape!=valuetemp.shape:
+            raise FinanceDataError("FinanceLine.fromArray time and value "
+                                   "arrays are not matched.")
+        result=cls()
+        if copy:
+            result.__time=timetemp.copy()
+            result.__value=valuetemp.copy()
+        else:
+            result.__time=timetemp
+            result.__value=valuetemp
+            result.__shared=True
+        result.__size=len(timetemp)
+        result.__sorted=timeSorted
+        result.__source=source
+        return result
+    @property
+    def cacheKey (self):
+        """(identity, version) of the line data
+
+        The version is changed when the line is changed, so a cached result
+        of a cacheKey is valid as long as the key is the same.
+        """
+        if self.__source is not None:
+            return self.__source
+        return (("line", self.__serial), self.__version)
+    @property
+    def timeArray (self):
+        return _readOnly(self.__time[:self.__size])
+    @property
+    def valueArray (self):
+        return _readOnly(self.__value[:self.__size])
+    def __detach (self):
+        """copy shared arrays before this line is changed"""
+        if self.__shared:
+            self.__time=self.__time[:self.__size].copy()
+            self.__value=self.__value[:self.__size].copy()
+            self.__shared=False
     def add (self, ipoint):
         """add a point into list
 
@@ -121,8 +663,16 @@ class FinanceLine():
         if not isinstance(ipoint, FinancePoint):
             raise FinanceDataError("FinanceLine.add ipoint is not a "
                                    "FinancePoint class.")
-        self.__points.append(ipoint)
-        #self.__points.sort(key=lambda t: t.time)
+        self.__detach()
+        self.__changed(self.__size)
+        epochtemp=datetime2Epoch(ipoint.time)
+        self.__sorted=_addSorted(self.__sorted, self.__time, self.__size,
+                                 epochtemp)
+        self.__time=_reserve(self.__time, self.__size, self.__size+1)
+        self.__value=_reserve(self.__value, self.__size, self.__size+1)
+        self.__time[self.__size]=epochtemp
+        self.__value[self.__size]=ipoint.value
+        self.__size+=1
     def __getitem__ (self, k):
         """for operator [] to get element or slice a segment
 
@@ -132,19 +682,25 @@ class FinanceLine():
             k: list slice input arg.
 
         Returns:
-            if slice a segment, return a FinanceLine
+            if slice a segment, return a FinanceLine view which shares data
+            with this line
             if access one element, return a FinancePoint
 
         Raise:
             None
         """
-        result=FinanceLine()
         if isinstance(k,slice):
-            for icount in range(*k.indices(len(self))):
-                result.add(self.__points[icount])
-        else:
-            return self.__points[k]
-        return result
+            return FinanceLine.fromArray(self.__time[:self.__size][k],
+                                         self.__value[:self.__size][k],
+                                         copy=False,
+                                         timeSorted=_sliceSorted(k,
+                                                                 self.__sorted))
+        ktemp=k+self.__size if k<0 else k
+        if ktemp<0 or ktemp>=self.__size:
+            raise IndexError("FinanceLine index {0:s} out of range."
+                             .format(str(k)))
+        return FinancePoint(epoch2Datetime(self.__time[ktemp]),
+                            self.__value[ktemp])
         
     def __setitem__ (self, k, ipoint):
         """for operator [] to set element
@@ -165,14 +721,39 @@ class FinanceLine():
                                    "a FinancePoint class.")
         if isinstance(k,slice):
             raise FinanceDataError("FinanceLine.__setitem__ can't be sliced.")
-        self.__points[k]=ipoint
+        ktemp=k+self.__size if k<0 else k
+        if ktemp<0 or ktemp>=self.__size:
+            raise IndexError("FinanceLine index {0:s} out of range."
+                             .format(str(k)))
+        self.__detach()
+        self.__changed(ktemp)
+        epochtemp=datetime2Epoch(ipoint.time)
+        if self.__sorted and ((ktemp>0 and self.__time[ktemp-1]>epochtemp) or
+                              (ktemp<self.__size-1 and
+                               self.__time[ktemp+1]<epochtemp)):
+            self.__sorted=False
+        self.__time[ktemp]=epochtemp
+        self.__value[ktemp]=ipoint.value
     def __len__ (self):
-        return len(self.__points)
-    #def __delitem__ (self, k):
-    #    del self.__points[k]
+        return self.__size
+    def __iter__ (self):
+        for timetemp, valuetemp in zip(epochArray2DatetimeList(self.timeArray),
+                                       self.valueArray.tolist()):
+            yield FinancePoint(timetemp, valuetemp)
+    def __delitem__ (self, k):
+        indextemp=numpy.arange(self.__size)[k]
+        self.__changed(int(numpy.min(indextemp, initial=self.__size)))
+        self.__time=numpy.delete(self.__time[:self.__size], indextemp)
+        self.__value=numpy.delete(self.__value[:self.__size], indextemp)
+        self.__size=len(self.__time)
+        self.__shared=False
+        if not self.__sorted:
+            self.__sorted=None
     def __str__ (self):
-        return str("FinanceDataSet Size:{0:d} lastdata:{1:s}".format(
-            len(self.__points), self.__points.time))
+        if self.__size==0:
+            return "FinanceLine Size:0"
+        return str("FinanceLine Size:{0:d} lastdata:{1:s}".format(
+            self.__size, str(self[-1].time)))
     def index(self, value):
         """search element wiht value
 
@@ -187,14 +768,15 @@ class FinanceLine():
         Raise:
             FinanceDataOutOfIndex: can't find match element index
         """
-        for i, v in enumerate(self):
-            if isinstance(value,datetime.datetime):
-                if v.time == value:
-                    return i
-            if isinstance(value,float):
-                if v.value == value:
-                    return i
-        raise FinanceDataOutOfIndex()
+        if isinstance(value,datetime.datetime):
+            return self.indexOfTime(value)
+        elif isinstance(value,float):
+            indextemp=numpy.flatnonzero(self.valueArray==value)
+        else:
+            indextemp=()
+        if len(indextemp)==0:
+            raise FinanceDataOutOfIndex()
+        return int(indextemp[0])
     def sortTime (self):
         """sort the list with time
 
@@ -209,7 +791,86 @@ class FinanceLine():
         Raise:
             None
         """
-        self.__points.sort(key=lambda t: t.time)
+        order=numpy.argsort(self.timeArray, kind="stable")
+        self.__changed(_firstIndex(order!=numpy.arange(self.__size),
+                                   self.__size))
+        self.__time=self.__time[:self.__size][order]
+        self.__value=self.__value[:self.__size][order]
+        self.__shared=False
+        self.__sorted=True
+    def isTimeSorted (self):
+        """check the line is sorted with time
+
+        check the line is sorted with time. The result is kept until the
+        line is changed.
+
+        Args:
+            None
+
+        Returns:
+            return True if time is in ascending order.
+
+        Raise:
+            None
+        """
+        if self.__sorted is None:
+            self.__sorted=_isSorted(self.timeArray)
+        return self.__sorted
+    def indexOfTime (self, itime):
+        """search element with time
+
+        search the first element with time. It uses binary search if the line
+        is sorted, otherwise it scans the time array.
+
+        Args:
+            itime: searching time, datetime.datetime
+
+        Returns:
+            return index in list
+
+        Raise:
+            FinanceDataOutOfIndex: can't find match element index
+        """
+        return _indexOfTime(self.timeArray, self.isTimeSorted(), itime)
+    def asOfIndex (self, itime):
+        """search the last element at or before time
+
+        search the last element whose time is at or before itime.
+        The line must be sorted.
+
+        Args:
+            itime: searching time, datetime.datetime
+
+        Returns:
+            return index in list
+
+        Raise:
+            FinanceDataNotSorted: the line is not sorted
+            FinanceDataOutOfIndex: itime is before the first element
+        """
+        if not self.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceLine is not sorted with time.")
+        return _asOfIndex(self.timeArray, itime)
+    def sliceByTime (self, start=None, end=None):
+        """slice the elements between start and end time
+
+        slice the elements whose time is between start and end. The line must
+        be sorted.
+
+        Args:
+            start: start time, datetime.datetime. None means from first.
+            end: end time, datetime.datetime and included. None means to last.
+
+        Returns:
+            return a FinanceLine view
+
+        Raise:
+            FinanceDataNotSorted: the line is not sorted
+        """
+        if not self.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceLine is not sorted with time.")
+        (begin, stop)=_timeRange(self.timeArray, start, end)
+        return self[begin:stop]
     def getTimeList (self):
         """provide the time list from point list
 
@@ -224,10 +885,7 @@ class FinanceLine():
         Raise:
             None
         """
-        result=[]
-        for item in self.__points:
-            result.append(item.time)
-        return result
+        return epochArray2DatetimeList(self.timeArray)
     def getValueList (self):
         """provide the value list from point list
 
@@ -242,10 +900,7 @@ class FinanceLine():
         Raise:
             None
         """
-        result=[]
-        for item in self.__points:
-            result.append(item.value)
-        return result
+        return self.valueArray.tolist()
     def removeRepeatItem (self):
         """remove the point whcih have same time.
 
@@ -260,12 +915,13 @@ class FinanceLine():
         Raise:
             None
         """
-        indextemp=[]
-        for icount in range(len(self)-1):
-            if self[icount].time == self[icount+1].time:
-                indextemp.append(icount)
-        for icount in reversed(indextemp):
-            del self[icount]
+        keep=numpy.ones(self.__size, dtype=bool)
+        keep[:-1]=self.timeArray[:-1]!=self.timeArray[1:]
+        self.__changed(_firstIndex(~keep, self.__size))
+        self.__time=self.__time[:self.__size][keep]
+        self.__value=self.__value[:self.__size][keep]
+        self.__size=len(self.__time)
+        self.__shared=False
     def findPeak (self):
         """search line peak
 
@@ -283,38 +939,92 @@ class FinanceLine():
         Raise:
             None
         """
-        result=FinanceLine()
-        for icount in range(len(self)-1):
-            if icount==0:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["slope"]))
-                continue
-            if self[icount-1].value<=self[icount].value>self[icount+1].value:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["peak"]))
-            else:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["slope"]))
-        result.add(FinancePoint(self[icount].time, 
-                                FinanceLine.peakValeDict["slope"]))
-        return result
+        return self.__peakValeLine(self.findPeakIndex(), "peak")
     def findVale (self):
-        result=FinanceLine()
-        for icount in range(len(self)-1):
-            if icount==0:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["slope"]))
-                continue
-            elif self[icount-1].value>=self[icount].value<self[icount+1].value:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["vale"]))
-            else:
-                result.add(FinancePoint(self[icount].time, 
-                                        FinanceLine.peakValeDict["slope"]))
-        result.add(FinancePoint(self[icount].time, 
-                                FinanceLine.peakValeDict["slope"]))
-        return result
-    def getMaxValueIndex (self, start=0, end=-1):
+        """search line vale
+
+        search line vale
+
+        Args:
+            None
+
+        Returns:
+            return a FinanceLine which contain vale value.
+            peakvale value:
+                FinanceLine.peakValeDict["slope"]: not peak or value
+                FinanceLine.peakValeDict["vale"]: vale
+
+        Raise:
+            None
+        """
+        return self.__peakValeLine(self.findValeIndex(), "vale")
+    def __peakValeLine (self, index, name):
+        valuetemp=numpy.full(self.__size, FinanceLine.peakValeDict["slope"])
+        valuetemp[index]=FinanceLine.peakValeDict[name]
+        return FinanceLine.fromArray(self.timeArray, valuetemp,
+                                     timeSorted=self.__sorted)
+    def findPeakIndex (self, minProminence=0.0, minDistance=1, mask=False):
+        """search line peak indexes
+
+        search line peak indexes. A peak is higher than the next value and
+        not lower than the previous value, the first and last values are not
+        peaks. The prominence of a peak is its height above the higher one
+        of the lowest values on both sides before a higher value. If
+        minDistance is more than 1, lower peaks closer than minDistance to a
+        higher peak are removed.
+
+        Args:
+            minProminence: min prominence of a peak
+            minDistance: min index distance between peaks
+            mask: True to return a bool mask instead of indexes
+
+        Returns:
+            return an int64 index array, or a bool mask if mask is True
+
+        Raise:
+            None
+        """
+        return self.__peakIndex(self.valueArray, minProminence, minDistance,
+                                mask)
+    def findValeIndex (self, minProminence=0.0, minDistance=1, mask=False):
+        """search line vale indexes
+
+        search line vale indexes. A vale is lower than the next value and
+        not higher than the previous value. The options are the same as
+        findPeakIndex with the line turned upside down.
+
+        Args:
+            minProminence: min prominence of a vale
+            minDistance: min index distance between vales
+            mask: True to return a bool mask instead of indexes
+
+        Returns:
+            return an int64 index array, or a bool mask if mask is True
+
+        Raise:
+            None
+        """
+        return self.__peakIndex(-self.valueArray, minProminence, minDistance,
+                                mask)
+    def __peakIndex (self, values, minProminence, minDistance, mask):
+        result=numpy.flatnonzero((values[1:-1]>=values[:-2]) &
+                                 (values[1:-1]>values[2:]))+1
+        if minProminence>0 and len(result)!=0:
+            result=result[_prominence(values, result)>=minProminence]
+        if minDistance>1 and len(result)>1:
+            result=_thinPeak(values, result, minDistance)
+        if not mask:
+            return result
+        masktemp=numpy.zeros(len(values), dtype=bool)
+        masktemp[result]=True
+        return masktemp
+    def __changed (self, index):
+        """rows from index are changed, cached tables are not valid"""
+        for keytemp in self.__cleanRows:
+            self.__cleanRows[keytemp]=min(self.__cleanRows[keytemp], index)
+        self.__version+=1
+        self.__source=None
+    def __valueIndex (self, start, end, greater):
         if start>=0:
             loopstart=start
         else:
@@ -325,34 +1035,88 @@ class FinanceLine():
             loopend=len(self)+end+1
         if loopstart==loopend:
             return loopstart
-        result=None
-        for icount in range(loopstart, loopend):
-            if icount<0 or icount>=len(self):
-                continue
-            if result==None or maxValue<self[icount].value:
-                result=icount
-                maxValue=self[icount].value
-        return result
+        (loopstart, loopend)=(max(loopstart, 0), min(loopend, len(self)))
+        if loopstart>=loopend:
+            return None
+        return int(self.__rangeIndex(loopstart, loopend, greater))
+    def __rangeIndex (self, start, stop, greater):
+        return _rangeArgIndex(self.__rangeTable, self.__cleanRows,
+                              greater.__name__, self.__value[:self.__size],
+                              greater, start, stop)
+    def getMaxValueIndex (self, start=0, end=-1):
+        """get the index of the first max value
+
+        get the index of the first max value from start to end. end is not
+        included if it is not negative, -1 means to the last value. The
+        answer comes from a cached sparse table in O(1), the table is
+        extended for added values in O(log n) each.
+
+        Args:
+            start: start index
+            end: end index
+
+        Returns:
+            return the index, start if start and end are the same, or None if
+            the range is out of the line
+
+        Raise:
+            None
+        """
+        return self.__valueIndex(start, end, numpy.greater)
     def getMinValueIndex (self, start=0, end=-1):
-        if start>=0:
-            loopstart=start
-        else:
-            loopstart=len(self)+start
-        if end>=0:
-            loopend=end
-        else:
-            loopend=len(self)+end+1
-        if loopstart==loopend:
-            return loopstart
-        result=None
-        minValue=0
-        for icount in range(loopstart, loopend):
-            if icount<0 or icount>=len(self):
-                continue
-            if result==None or minValue>self[icount].value:
-                result=icount
-                minValue=self[icount].value
-        return result
+        """get the index of the first min value
+
+        get the index of the first min value from start to end, like
+        getMaxValueIndex.
+
+        Args:
+            start: start index
+            end: end index
+
+        Returns:
+            return the index, start if start and end are the same, or None if
+            the range is out of the line
+
+        Raise:
+            None
+        """
+        return self.__valueIndex(start, end, numpy.less)
+    def getRangeMaxIndex (self, start, stop):
+        """get the first max value indexes of ranges
+
+        get the first max value index of values[start:stop] for each start
+        and stop. start and stop can be int or int arrays.
+
+        Args:
+            start: start indexes
+            stop: stop indexes, not included
+
+        Returns:
+            return an index, or an int64 index array for arrays
+
+        Raise:
+            FinanceDataOutOfIndex: a range is empty or out of the line
+        """
+        return _checkedRangeIndex(self.__rangeIndex, len(self), start, stop,
+                                  numpy.greater)
+    def getRangeMinIndex (self, start, stop):
+        """get the first min value indexes of ranges
+
+        get the first min value index of values[start:stop] for each start
+        and stop, like getRangeMaxIndex.
+
+        Args:
+            start: start indexes
+            stop: stop indexes, not included
+
+        Returns:
+            return an index, or an int64 index array for arrays
+
+        Raise:
+            FinanceDataOutOfIndex: a range is empty or out of the line
+        """
+        return _checkedRangeIndex(self.__rangeIndex, len(self), start, stop,
+                                  numpy.less)
 
 class FinanceDataSet():
     """This class contain maket finance line data.
@@ -360,6 +1124,9 @@ class FinanceDataSet():
     This class contain maket finance line data. A market always have 5 types of 
     data: open, high, low, close, and volume. This class can contain and 
     manipulate these data.
+    The data are kept in columns. There is one int64 epoch time column and
+    one float64 array for open, high, low, close, and volume. The FinanceLine
+    properties share these columns.
 
     Attributes:
         openValue: market open value FinanceLine
@@ -367,18 +1134,35 @@ class FinanceDataSet():
         lowValue: market low value FinanceLine
         closeValue: market close value FinanceLine
         volumeValue: market volume value FinanceLine
+        timeArray: read only int64 epoch time column
+        timeType: time unit type
+        period: time period
+        symbol: finance data symbol
     """
     timeTypeDict={"year":"year",
                   "month":"month",
+                  "week":"week",
                   "day":"day",
                   "hour":"hour",
                   "minute":"minute",
                   "second":"second",
                   "tick":"tick"}
+    mergePolicyDict={"new":"new",
+                     "old":"old",
+                     "raise":"raise"}
+    columnDict={"open":0,
+                "high":1,
+                "low":2,
+                "close":3,
+                "volume":4}
     dataStrType="%Y/%m/%d"
     dataStrType2='%Y/%m/%d %H:%M:%S:%f'
     csvHeadString="time,open,high,low,close,volume"
-    def __init__ (self, iset=None, timeType="day", period=1):
+    binaryMagic=b"FADSBIN\0"
+    binaryVersion=1
+    binaryHeadStruct=struct.Struct("<8sIIqqqqq16s64s")
+    binaryHeadSize=256
+    def __init__ (self, iset=None, timeType="day", period=1, symbol=""):
         """FinanceDataSet initial function
 
         FinanceDataSet initial function.
@@ -387,6 +1171,7 @@ class FinanceDataSet():
             iset: input FinanceDataSet or a None.
             timeType: setup time unit type
             period: time period
+            symbol: finance data symbol
 
         Returns:
             None
@@ -394,7 +1179,15 @@ class FinanceDataSet():
         Raise:
             FinanceDataError: An error occured intialing instance.
         """
-        if iset==None:
+        self.loadStatistics=None
+        self.saveStatistics=None
+        self.__cleanRows={"binary":0, "csv":0, "pyramid":0}
+        self.__syncFile=None
+        self.__pyramid=[]
+        self.__rangeTable={}
+        self.__serial=next(_serialCounter)
+        self.__version=0
+        if iset is None:
             pass
         elif isinstance(iset, FinanceDataSet):
             self.copy(iset)
@@ -404,52 +1197,183 @@ class FinanceDataSet():
         if timeType not in FinanceDataSet.timeTypeDict.values():
             raise FinanceDataError("{0:s} is not a defined time type."
                                    .format(str(timeType)))
-        self.__openValue=FinanceLine()
-        self.__highValue=FinanceLine()
-        self.__lowValue=FinanceLine()
-        self.__closeValue=FinanceLine()
-        self.__volumeValue=FinanceLine()
+        self.__time=numpy.empty(0, dtype=numpy.int64)
+        self.__values=numpy.empty((len(FinanceDataSet.columnDict), 0),
+                                  dtype=numpy.float64)
+        self.__size=0
+        self.__sorted=True
         self.timeType=timeType
         self.period=period
+        self.symbol=symbol
+    def __line (self, name):
+        return FinanceLine.fromArray(self.__time[:self.__size],
+                                     self.__values[FinanceDataSet
+                                                   .columnDict[name],
+                                                   :self.__size],
+                                     copy=False, timeSorted=self.__sorted,
+                                     source=(("set", self.__serial, name),
+                                             self.__version))
+    def __setColumns (self, itime, ivalues, timeSorted=None, changedFrom=0):
+        self.__time=itime
+        self.__values=ivalues
+        self.__size=len(itime)
+        self.__sorted=timeSorted
+        self.__version+=1
+        # rows before changedFrom are the same as before
+        for keytemp in self.__cleanRows:
+            self.__cleanRows[keytemp]=min(self.__cleanRows[keytemp],
+                                          changedFrom)
+    def __setCleanRows (self, fileRows):
+        """the data are just loaded, only fileRows rows are in the file"""
+        self.__version+=1
+        for keytemp in self.__cleanRows:
+            self.__cleanRows[keytemp]=0
+        self.__cleanRows.update(binary=fileRows, csv=fileRows)
     @property
     def openValue (self):
-        return self.__openValue
+        return self.__line("open")
     @property
     def highValue (self):
-        return self.__highValue
+        return self.__line("high")
     @property
     def lowValue (self):
-        return self.__lowValue
+        return self.__line("low")
     @property
     def closeValue (self):
-        return self.__closeValue
+        return self.__line("close")
     @property
     def volumeValue (self):
-        return self.__volumeValue
+        return self.__line("volume")
+    @property
+    def timeArray (self):
+        return _readOnly(self.__time[:self.__size])
+    def getColumnArray (self, name):
+        """get a read only value column
+
+        get a read only value column
+
+        Args:
+            name: column name in FinanceDataSet.columnDict
+
+        Returns:
+            return float64 numpy array
+
+        Raise:
+            FinanceDataError: name is not a column name
+        """
+        if name not in FinanceDataSet.columnDict.keys():
+            raise FinanceDataError("{0:s} is not a column name."
+                                   .format(str(name)))
+        return _readOnly(self.__values[FinanceDataSet.columnDict[name],
+                                       :self.__size])
+    def getRangeMaxIndex (self, name, start, stop):
+        """get the first max value indexes of column ranges
+
+        get the first max value index of column name in [start, stop) for
+        each start and stop. The column has a cached sparse table like
+        FinanceLine.getRangeMaxIndex.
+
+        Args:
+            name: column name in FinanceDataSet.columnDict
+            start: start indexes, int or int array
+            stop: stop indexes, not included
+
+        Returns:
+            return an index, or an int64 index array for arrays
+
+        Raise:
+            FinanceDataError: name is not a column name
+            FinanceDataOutOfIndex: a range is empty or out of the data
+        """
+        return _checkedRangeIndex(self.__columnRangeIndex(name), self.__size,
+                                  start, stop, numpy.greater)
+    def getRangeMinIndex (self, name, start, stop):
+        """get the first min value indexes of column ranges
+
+        get the first min value index of column name in [start, stop) for
+        each start and stop, like getRangeMaxIndex.
+
+        Args:
+            name: column name in FinanceDataSet.columnDict
+            start: start indexes, int or int array
+            stop: stop indexes, not included
+
+        Returns:
+            return an index, or an int64 index array for arrays
+
+        Raise:
+            FinanceDataError: name is not a column name
+            FinanceDataOutOfIndex: a range is empty or out of the data
+        """
+        return _checkedRangeIndex(self.__columnRangeIndex(name), self.__size,
+                                  start, stop, numpy.less)
+    def __columnRangeIndex (self, name):
+        valuetemp=self.getColumnArray(name)
+        def query (start, stop, greater):
+            return _rangeArgIndex(self.__rangeTable, self.__cleanRows,
+                                  name+":"+greater.__name__, valuetemp,
+                                  greater, start, stop)
+        return query
     def __len__ (self):
-        return len(self.__closeValue)
+        return self.__size
     def __delitem__ (self, k):
-        del self.__openValue[k]
-        del self.__highValue[k]
-        del self.__lowValue[k]
-        del self.__closeValue[k]
-        del self.__volumeValue[k]
+        indextemp=numpy.arange(self.__size)[k]
+        self.__setColumns(numpy.delete(self.__time[:self.__size], indextemp),
+                          numpy.delete(self.__values[:, :self.__size],
+                                       indextemp, axis=1), self.__sorted,
+                          int(numpy.min(indextemp, initial=self.__size)))
+    def __rowIndex (self, k):
+        ktemp=k+self.__size if k<0 else k
+        if ktemp<0 or ktemp>=self.__size:
+            raise IndexError("FinanceDataSet index {0:s} out of range."
+                             .format(str(k)))
+        return ktemp
     def __getitem__ (self, k):
-        result=FinanceDataSet(None,self.timeType,self.period)
+        """for operator [] to get one row or slice a segment
+
+        for operator [] to get one row or slice a segment. The result is a
+        view, it shares the columns with this data set. Adding data into the
+        view copies the columns first, so this data set is never changed.
+
+        Args:
+            k: list slice input arg.
+
+        Returns:
+            return a FinanceDataSet
+
+        Raise:
+            IndexError: k is out of range
+        """
+        result=FinanceDataSet(None,self.timeType,self.period,self.symbol)
         if isinstance(k,slice):
-            for icount in range(*k.indices(len(self))):
-                result.addset(self[icount])
+            result.__setColumns(self.__time[:self.__size][k],
+                                self.__values[:, :self.__size][:, k],
+                                _sliceSorted(k, self.__sorted))
         else:
-            result.add(self.__openValue[k].time,
-                       self.__openValue[k].value,
-                       self.__highValue[k].value,
-                       self.__lowValue[k].value,
-                       self.__closeValue[k].value,
-                       self.__volumeValue[k].value)
+            ktemp=self.__rowIndex(k)
+            result.__setColumns(self.__time[ktemp:ktemp+1],
+                                self.__values[:, ktemp:ktemp+1], True)
         return result
+    def getRow (self, k):
+        """get one row data
+
+        get one row data without creating FinanceDataSet or FinancePoint.
+
+        Args:
+            k: row index
+
+        Returns:
+            return tuple (time, open, high, low, close, volume)
+
+        Raise:
+            IndexError: k is out of range
+        """
+        ktemp=self.__rowIndex(k)
+        return ((epoch2Datetime(self.__time[ktemp]),)
+                +tuple(self.__values[:, ktemp].tolist()))
     def __str__ (self):
         return str("FinanceDataSet Size:{0:d} lastdata:{1:s}".format(
-            len(self.__openValue),str(self.__openValue[-1].time)))
+            self.__size,str(self.openValue[-1].time)))
     #def index(self, value):
     #    return self.closeValue.index(value)
     def copy (self, iset):
@@ -468,13 +1392,23 @@ class FinanceDataSet():
         """
         if not isinstance(iset, FinanceDataSet):
             raise FinanceDataError("copy fail")
-        self.__openValue    = copy.copy(iset.__openValue  )
-        self.__highValue    = copy.copy(iset.__highValue  )
-        self.__lowValue     = copy.copy(iset.__lowValue   )
-        self.__closeValue   = copy.copy(iset.__closeValue )
-        self.__volumeValue  = copy.copy(iset.__volumeValue)
+        self.__setColumns(iset.__time[:iset.__size].copy(),
+                          iset.__values[:, :iset.__size].copy(), iset.__sorted)
         self.timeType       = copy.copy(iset.timeType     )
         self.period         = copy.copy(iset.period       )
+        self.symbol         = copy.copy(iset.symbol       )
+        self.__syncFile=None
+    def __reserve (self, need):
+        if not self.__values.flags.writeable:
+            # memory mapped columns are copied before the first change
+            need=max(need, self.__values.shape[1]+1)
+        elif need<=self.__values.shape[1]:
+            return
+        self.__time=_reserve(self.__time, self.__size, need)
+        valuetemp=numpy.empty((self.__values.shape[0], len(self.__time)),
+                              dtype=numpy.float64)
+        valuetemp[:, :self.__size]=self.__values[:, :self.__size]
+        self.__values=valuetemp
     def add (self, idatetime, iopen, ihigh, ilow, iclose, ivolume=0):
         """add data into list
 
@@ -498,6 +1432,18 @@ class FinanceDataSet():
         if not isinstance(idatetime, datetime.datetime):
             raise FinanceDataError("FinanceDataSet.add idtetime is not a "
                                    "datetime class.")
+        valuetemp=self.__checkValue(idatetime, iopen, ihigh, ilow, iclose,
+                                    ivolume)
+        epochtemp=datetime2Epoch(idatetime)
+        self.__sorted=_addSorted(self.__sorted, self.__time, self.__size,
+                                 epochtemp)
+        self.__reserve(self.__size+1)
+        self.__time[self.__size]=epochtemp
+        self.__values[:, self.__size]=valuetemp
+        self.__size+=1
+        self.__version+=1
+    def __checkValue (self, idatetime, iopen, ihigh, ilow, iclose, ivolume):
+        """check one row and return float (open, high, low, close, volume)"""
         try:
             opentemp =float(iopen)
             hightemp =float(ihigh)
@@ -519,15 +1465,28 @@ class FinanceDataSet():
         if lowtemp>opentemp or lowtemp>hightemp or lowtemp>closetemp:
             raise FinanceDataSetHighValueWrong("low value is not lowest value"
                                                +debugstr)
-        self.__openValue.add(FinancePoint(idatetime, opentemp))
-        self.__highValue.add(FinancePoint(idatetime, hightemp))
-        self.__lowValue.add(FinancePoint(idatetime, lowtemp))
-        self.__closeValue.add(FinancePoint(idatetime, closetemp))
-        self.__volumeValue.add(FinancePoint(idatetime, voltemp))
+        return (opentemp, hightemp, lowtemp, closetemp, voltemp)
+    def __appendColumns (self, itime, ivalues, timeSorted):
+        """append columns which are already checked"""
+        sizetemp=len(itime)
+        if sizetemp==0:
+            return
+        if self.__sorted is not False:
+            if timeSorted:
+                self.__sorted=_addSorted(self.__sorted, self.__time,
+                                         self.__size, itime[0])
+            else:
+                self.__sorted=timeSorted
+        self.__reserve(self.__size+sizetemp)
+        self.__time[self.__size:self.__size+sizetemp]=itime
+        self.__values[:, self.__size:self.__size+sizetemp]=ivalues
+        self.__size+=sizetemp
+        self.__version+=1
     def addset (self, idataset):
         """add a FinanceDataSet into list
 
-        add a FinanceDataSet into list
+        add a FinanceDataSet into list. The rows of idataset are already
+        checked by FinanceDataSet.add, so the columns are appended directly.
 
         Args:
             idataset: input FinanceDataSet
@@ -541,15 +1500,84 @@ class FinanceDataSet():
         if not isinstance(idataset,FinanceDataSet):
             raise FinanceDataError("FinanceDataSet.addset idataset is not a "
                                    "FinanceDataSet class.")
-        for icount in range(len(idataset)):
-            self.add(idataset.openValue[icount].time,
-                     idataset.openValue[icount].value,
-                     idataset.highValue[icount].value,
-                     idataset.lowValue[icount].value,
-                     idataset.closeValue[icount].value,
-                     idataset.volumeValue[icount].value,)
+        self.__appendColumns(idataset.timeArray,
+                             idataset.__values[:, :idataset.__size],
+                             idataset.isTimeSorted())
         #self.sortTime()
         #self.removeRepeatItem()
+    def mergeset (self, idataset, policy="new"):
+        """merge a time sorted FinanceDataSet
+
+        merge a time sorted FinanceDataSet into this time sorted data set.
+        The result is sorted and has one row for each time. In each data set
+        only the first row of the same time is kept, like removeRepeatItem.
+        For a time in both data sets, policy "new" keeps the row of
+        idataset, "old" keeps the row of this data set, and "raise" raises
+        FinanceDataSetMergeConflict if the two rows are different.
+        The rows are merged in one pass after the insert positions of
+        idataset rows are found by binary search, so the cost is
+        O(n + m log n) instead of a sort of n + m rows.
+
+        Args:
+            idataset: input FinanceDataSet sorted with time
+            policy: a policy in FinanceDataSet.mergePolicyDict
+
+        Returns:
+            None
+
+        Raise:
+            FinanceDataError: An error occured merging data.
+            FinanceDataNotSorted: a data set is not sorted
+            FinanceDataSetMergeConflict: rows with the same time are different
+        """
+        if not isinstance(idataset,FinanceDataSet):
+            raise FinanceDataError("FinanceDataSet.mergeset idataset is not a "
+                                   "FinanceDataSet class.")
+        if policy not in FinanceDataSet.mergePolicyDict.values():
+            raise FinanceDataError("{0:s} is not a defined merge policy."
+                                   .format(str(policy)))
+        if not self.isTimeSorted() or not idataset.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceDataSet is not sorted with "
+                                       "time.")
+        oldindex=numpy.flatnonzero(_uniqueMask(self.timeArray))
+        newindex=numpy.flatnonzero(_uniqueMask(idataset.timeArray))
+        oldtime=self.__time[oldindex]
+        newtime=idataset.__time[newindex]
+        sizetemp=len(oldindex)+len(newindex)
+        fromnew=numpy.zeros(sizetemp, dtype=bool)
+        fromnew[numpy.searchsorted(oldtime, newtime, side="right")
+                +numpy.arange(len(newindex))]=True
+        timetemp=numpy.empty(sizetemp, dtype=numpy.int64)
+        timetemp[~fromnew]=oldtime
+        timetemp[fromnew]=newtime
+        valuetemp=numpy.empty((len(FinanceDataSet.columnDict), sizetemp),
+                              dtype=numpy.float64)
+        valuetemp[:, ~fromnew]=self.__values[:, oldindex]
+        valuetemp[:, fromnew]=idataset.__values[:, newindex]
+        # a time in both data sets is an old row followed by a new row
+        same=timetemp[1:]==timetemp[:-1]
+        if policy=="raise":
+            difftemp=((valuetemp[:, 1:]!=valuetemp[:, :-1]) &
+                      ~(numpy.isnan(valuetemp[:, 1:]) &
+                        numpy.isnan(valuetemp[:, :-1])))
+            conflict=same & difftemp.any(axis=0)
+            if conflict.any():
+                icount=_firstIndex(conflict, 0)
+                raise FinanceDataSetMergeConflict(
+                    "FinanceDataSet.mergeset rows of {0:s} are different."
+                    .format(str(epoch2Datetime(timetemp[icount]))))
+        keep=numpy.ones(sizetemp, dtype=bool)
+        if policy=="new":
+            keep[:-1]=~same
+        else:
+            keep[1:]=~same
+        # rows before the first new or moved row are not changed
+        origin=numpy.full(sizetemp, -1, dtype=numpy.int64)
+        origin[~fromnew]=oldindex
+        origin=origin[keep]
+        self.__setColumns(timetemp[keep], valuetemp[:, keep], True,
+                          _firstIndex(origin!=numpy.arange(len(origin)),
+                                      len(origin)))
     def removeRepeatItem (self):
         """remove items which have same repeat finance time
 
@@ -564,14 +1592,10 @@ class FinanceDataSet():
         Raise:
             None
         """
-        indextemp=[]
-        for icount in range(len(self.openValue)):
-            if icount==0:
-                continue
-            if self.openValue[icount].time == self.openValue[icount-1].time:
-                indextemp.append(icount)
-        for icount in reversed(indextemp):
-            del self[icount]
+        keep=_uniqueMask(self.timeArray)
+        self.__setColumns(self.__time[:self.__size][keep],
+                          self.__values[:, :self.__size][:, keep],
+                          self.__sorted, _firstIndex(~keep, self.__size))
     def getLastTime (self):
         """get the latest finance time
 
@@ -586,14 +1610,14 @@ class FinanceDataSet():
         Raise:
             None
         """
-        try:
-            return self.__openValue[-1].time
-        except IndexError:
+        if self.__size==0:
             return datetime.datetime(1976,1,1)
+        return epoch2Datetime(self.__time[self.__size-1])
     def changePeriod (self, iperiod):
         """change period and recalculate the data
 
-        change period and recalculate the data
+        change period and recalculate the data. Every iperiod rows are
+        merged into one row. Use resample to merge rows by calendar.
 
         Args:
             iperiod: new period
@@ -602,48 +1626,168 @@ class FinanceDataSet():
             None
 
         Raise:
-            None
+            FinanceDataError: iperiod is smaller than period
         """
-        if self.period>iperiod:
-            raise FinanceDataError("{0:s} is not a defined time type."
-                                   .format(str(timeType)))
-        newset=FinanceDataSet(None, self.timeType, iperiod)
-        timetemp=self.openValue[0].time
-        opentemp=self.openValue[0].value
-        hightemp=0
-        lowtemp=99999999999999.99999
-        closetemp=self.closeValue[0].value
-        voltemp=0
-        for icount in range(len(self)):
-            voltemp+=self.volumeValue[icount].value
-            if hightemp<self.highValue[icount].value:
-                hightemp=self.highValue[icount].value
-            if lowtemp>self.lowValue[icount].value:
-                lowtemp=self.lowValue[icount].value
-            if icount%iperiod==0:
-                opentemp=self.openValue[icount].value
-            elif icount%iperiod==iperiod-1 or icount==len(self)-1:
-                closetemp=self.closeValue[icount].value
-                timetemp=self.openValue[icount].time
-                newset.add(timetemp, opentemp, hightemp, lowtemp, closetemp, 
-                           voltemp)
-                hightemp=0
-                lowtemp=99999999999999.99999
-                voltemp=0         
+        if not isinstance(iperiod, int) or self.period>iperiod:
+            raise FinanceDataError("{0:s} is smaller than period {1:d}."
+                                   .format(str(iperiod), self.period))
+        newset=self.__aggregate(numpy.arange(0, self.__size, iperiod),
+                                self.timeType, iperiod)
         self.copy(newset)
+    def resample (self, timeType, period=1):
+        """merge rows into calendar buckets
+
+        merge rows into calendar buckets of period timeType units, like 5
+        minutes, 1 week or 3 months. Weeks start on Monday, the other
+        buckets are counted from 1970/01/01. A bucket has the open of its
+        first row, the highest high, the lowest low, the close of its last
+        row, the volume sum, and the time of its last row. Buckets without
+        rows are not created. This data set is not changed.
+
+        Args:
+            timeType: bucket time unit in FinanceDataSet.timeTypeDict except
+                      "tick"
+            period: bucket size in timeType units
+
+        Returns:
+            return a new FinanceDataSet
+
+        Raise:
+            FinanceDataError: timeType or period is wrong
+        """
+        if (timeType not in FinanceDataSet.timeTypeDict.values() or
+            timeType==FinanceDataSet.timeTypeDict["tick"]):
+            raise FinanceDataError("{0:s} is not a resample time type."
+                                   .format(str(timeType)))
+        if not isinstance(period, int) or period<1:
+            raise FinanceDataError("{0:s} is not a positive integer."
+                                   .format(str(period)))
+        if self.isTimeSorted():
+            settemp=self
+        else:
+            settemp=FinanceDataSet(self)
+            settemp.sortTime()
+        bucket=_timeBucket(settemp.timeArray, timeType)//period
+        starts=numpy.flatnonzero(_uniqueMask(bucket))
+        return settemp.__aggregate(starts, timeType, period)
+    def __aggregate (self, starts, timeType, period):
+        """merge rows from each start index to the next one"""
+        result=FinanceDataSet(None, timeType, period, self.symbol)
+        if self.__size==0:
+            return result
+        (timetemp, valuetemp)=_aggregateColumns(self.__time[:self.__size],
+                                                self.__values[:, :self.__size],
+                                                starts)
+        result.__setColumns(timetemp, valuetemp, self.__sorted or None)
+        return result
+    def getPyramidLevel (self, level):
+        """get the data merged by 2**level rows
+
+        get the data merged by 2**level rows. Row k of level L merges rows
+        k*2**L to (k+1)*2**L-1 like changePeriod, so the last row may merge
+        less rows. The levels are built from the level below and cached, and
+        only the rows after the first changed row are merged again, so
+        adding rows costs O(log n) for all levels.
+
+        Args:
+            level: pyramid level, 0 is this data
+
+        Returns:
+            return a FinanceDataSet view of the cached level
+
+        Raise:
+            FinanceDataError: level is not a non-negative integer
+        """
+        if not isinstance(level, int) or level<0:
+            raise FinanceDataError("{0:s} is not a pyramid level."
+                                   .format(str(level)))
+        if level==0:
+            return self[:]
+        self.__updatePyramid(level)
+        leveltemp=self.__pyramid[level-1]
+        leveltemp["shared"]=True
+        result=FinanceDataSet(None, self.timeType, self.period*2**level,
+                              self.symbol)
+        result.__setColumns(leveltemp["time"][:leveltemp["size"]],
+                            leveltemp["values"][:, :leveltemp["size"]],
+                            self.__sorted or None)
+        return result
+    @staticmethod
+    def getPyramidLevelFor (rows, maxRows):
+        """get the lowest pyramid level which has at most maxRows rows
+
+        get the lowest pyramid level which has at most maxRows rows for rows
+        rows of level 0.
+
+        Args:
+            rows: row count of level 0
+            maxRows: max row count
+
+        Returns:
+            return a pyramid level
+
+        Raise:
+            None
+        """
+        level=0
+        while rows>max(maxRows, 1):
+            rows=(rows+1)//2
+            level+=1
+        return level
+    def __updatePyramid (self, level):
+        """merge the changed rows of pyramid levels 1 to level"""
+        dirtytemp=self.__cleanRows["pyramid"]
+        timetemp=self.__time[:self.__size]
+        valuetemp=self.__values[:, :self.__size]
+        # all cached levels are updated, they share one watermark
+        for icount in range(max(level, len(self.__pyramid))):
+            if icount==len(self.__pyramid):
+                self.__pyramid.append({"time":self.__time[:0].copy(),
+                                       "values":self.__values[:, :0].copy(),
+                                       "size":0, "shared":False})
+            leveltemp=self.__pyramid[icount]
+            sizetemp=(len(timetemp)+1)//2
+            dirtytemp=min(dirtytemp//2, leveltemp["size"], sizetemp)
+            if dirtytemp<sizetemp:
+                if leveltemp["shared"]:
+                    # a returned view keeps the old rows
+                    leveltemp["time"]=leveltemp["time"][:dirtytemp].copy()
+                    leveltemp["values"]=(leveltemp["values"][:, :dirtytemp]
+                                         .copy())
+                    leveltemp["shared"]=False
+                leveltemp["time"]=_reserve(leveltemp["time"], dirtytemp,
+                                           sizetemp)
+                leveltemp["values"]=_reserveColumns(leveltemp["values"],
+                                                    dirtytemp, sizetemp)
+                (leveltemp["time"][dirtytemp:sizetemp],
+                 leveltemp["values"][:, dirtytemp:sizetemp])=\
+                    _aggregateColumns(timetemp, valuetemp,
+                                      numpy.arange(2*dirtytemp, len(timetemp),
+                                                   2))
+            leveltemp["size"]=sizetemp
+            timetemp=leveltemp["time"][:sizetemp]
+            valuetemp=leveltemp["values"][:, :sizetemp]
+        self.__cleanRows["pyramid"]=self.__size
     def getDataFromFile (self, dataFile):
         """get finance data from csv file
 
-        get finance data from csv file
+        get finance data from csv file. A file written by saveDataToFile is
+        parsed column by column in batch, other files are parsed row by row.
+        A binary file written by saveDataToBinaryFile is read by
+        getDataFromBinaryFile. The row count and speed of the load are kept
+        in loadStatistics.
 
         Args:
-            dataFile: csv file path
+            dataFile: csv or binary file path
 
         Returns:
             None
 
         Raise:
             FinanceDataSetFileNotExist: an error occured getting data from file
+            FinanceDataSetDataWrong: a value of a row is zero
+            FinanceDataSetHighValueWrong: high or low value of a row is wrong
+            FinanceDataSetFileFormatWrong: the binary file is broken
         """
         if isinstance(dataFile,str):
             #if not os.path.exists(os.path.dirname(dataFile)):
@@ -652,11 +1796,48 @@ class FinanceDataSet():
         else:
             raise FinanceDataSetFileNotExist("{0:s} is not a file name string."
                                              .format(str(dataFile)))
+        starttemp=time.perf_counter()
+        sizetemp=self.__size
+        if isBinaryDataFile(strtemp):
+            self.getDataFromBinaryFile(strtemp)
+            return
         try:
             csvFileR=open(strtemp, "r")
         except FileNotFoundError:
             raise FinanceDataSetFileNotExist("{0:s} is not exist."
                                              .format(str(strtemp)))
+        with csvFileR:
+            columntemp=_parseCsvColumns(csvFileR.read())
+            if columntemp is None:
+                csvFileR.seek(0)
+                self.__addCsvRows(csvFileR)
+            else:
+                self.__addCheckedColumns(*columntemp)
+        self.sortTime()
+        if sizetemp==0:
+            self.__setCleanRows(self.__size)
+        self.__setLoadStatistics(strtemp, "csv", columntemp is not None,
+                                 self.__size-sizetemp, starttemp)
+    def __setLoadStatistics (self, fileName, fileFormat, bulk, rows, start):
+        secondtemp=time.perf_counter()-start
+        self.loadStatistics={"file":fileName, "format":fileFormat,
+                             "bulk":bulk, "rows":rows, "seconds":secondtemp,
+                             "rowsPerSecond":(rows/secondtemp
+                                              if secondtemp>0 else 0.0)}
+    def __addCheckedColumns (self, itime, ivalues):
+        """check parsed csv columns and append them"""
+        opentemp, hightemp, lowtemp, closetemp, voltemp=ivalues
+        wrongtemp=((opentemp==0)|(hightemp==0)|(lowtemp==0)|(closetemp==0)|
+                   (hightemp<opentemp)|(hightemp<lowtemp)|(hightemp<closetemp)|
+                   (lowtemp>opentemp)|(lowtemp>closetemp))
+        if wrongtemp.any():
+            # let the row checker raise the same error as add
+            icount=int(numpy.flatnonzero(wrongtemp)[0])
+            self.__checkValue(epoch2Datetime(itime[icount]),
+                              *ivalues[:, icount].tolist())
+        self.__appendColumns(itime, ivalues, None)
+    def __addCsvRows (self, csvFileR):
+        """add csv rows one by one"""
         csvContent=csv.reader(csvFileR, delimiter=',')
         for i in csvContent:
             try:
@@ -689,14 +1870,17 @@ class FinanceDataSet():
             except ValueError:
                 volValue=0.0
             self.add(dt,openValue, highValue, lowValue, closeValue, volValue)
-        self.sortTime()
-    def saveDataToFile (self, dataFile):
+    def saveDataToFile (self, dataFile, append=False):
         """save finance data to csv file
 
-        save finance data to csv file
+        save finance data to csv file. If append is True and the last row of
+        the file is a row of this data set which is not changed since the
+        data set is loaded or saved, only the rows after it are appended.
+        Otherwise the file is rewritten to a temporary file and replaced.
 
         Args:
             dataFile: csv file path
+            append: True to append new rows if it is possible
 
         Returns:
             None
@@ -705,30 +1889,293 @@ class FinanceDataSet():
             None
         """
         if isinstance(dataFile,str):
-            if not os.path.exists(os.path.dirname(dataFile)):
+            if (os.path.dirname(dataFile)!="" and
+                not os.path.exists(os.path.dirname(dataFile))):
                 os.makedirs(os.path.dirname(dataFile))
             strtemp=dataFile
         else:
             raise FinanceDataSetFileNotExist("{0:s} is not a file name string."
                                              .format(str(dataFile)))
-        csvFileW=open(strtemp, "w", newline='')
+        starttemp=time.perf_counter()
+        rowtemp=self.__csvAppendStart(strtemp) if append else None
+        if rowtemp is None:
+            _writeAtomic(strtemp, False, self.__writeCsvRows)
+            self.__setSaveStatistics(strtemp, "csv", False, self.__size,
+                                     starttemp)
+        else:
+            with open(strtemp, "a", newline='') as csvFileW:
+                self.__writeCsvRows(csvFileW, rowtemp)
+            self.__setSaveStatistics(strtemp, "csv", True,
+                                     self.__size-rowtemp, starttemp)
+        self.__cleanRows["csv"]=self.__size
+    def __writeCsvRows (self, csvFileW, start=None):
+        """write rows from start, or the head and all rows if start is None"""
         csvContent=csv.writer(csvFileW, delimiter=',')
-        csvContent.writerow(["time",
-                            "open",
-                            "high",
-                            "low",
-                            "close",
-                            "volume"])
-        for icount in range(len(self.openValue)):
+        if start is None:
+            csvContent.writerow(["time",
+                                "open",
+                                "high",
+                                "low",
+                                "close",
+                                "volume"])
+            start=0
+        timetemp=epochArray2DatetimeList(self.timeArray[start:])
+        valuetemp=self.__values[:, start:self.__size].tolist()
+        for icount in range(self.__size-start):
             csvContent.writerow([datetime.datetime.strftime(
-                                    self.openValue[icount].time, 
+                                    timetemp[icount],
                                     FinanceDataSet.dataStrType2),
-                                 str(self.openValue[icount].value),
-                                 str(self.highValue[icount].value),
-                                 str(self.lowValue[icount].value),
-                                 str(self.closeValue[icount].value),
-                                 str(self.volumeValue[icount].value)])
-        csvFileW.close()
+                                 str(valuetemp[0][icount]),
+                                 str(valuetemp[1][icount]),
+                                 str(valuetemp[2][icount]),
+                                 str(valuetemp[3][icount]),
+                                 str(valuetemp[4][icount])])
+    def __csvAppendStart (self, fileName):
+        """return the first row to append to a csv file, or None"""
+        if not os.path.isfile(fileName) or not self.isTimeSorted():
+            return None
+        with open(fileName, "rb") as csvFileR:
+            csvFileR.seek(0, os.SEEK_END)
+            csvFileR.seek(max(0, csvFileR.tell()-4096))
+            tailtemp=csvFileR.read()
+        if not tailtemp.endswith(b"\n"):
+            return None
+        linetemp=tailtemp.decode("utf-8", "replace").splitlines()[-1]
+        if linetemp.strip()==FinanceDataSet.csvHeadString:
+            return 0
+        columntemp=_parseCsvColumns(linetemp)
+        if columntemp is None:
+            return None
+        (timetemp, valuetemp)=columntemp
+        itemp=int(numpy.searchsorted(self.timeArray, timetemp[0],
+                                     side="right"))-1
+        if (itemp<0 or itemp>=self.__cleanRows["csv"] or
+            self.__time[itemp]!=timetemp[0] or
+            not numpy.array_equal(self.__values[:, itemp], valuetemp[:, 0])):
+            return None
+        return itemp+1
+    def __setSaveStatistics (self, fileName, fileFormat, incremental, rows,
+                             start):
+        self.saveStatistics={"file":fileName, "format":fileFormat,
+                             "incremental":incremental, "rows":rows,
+                             "seconds":time.perf_counter()-start}
+    def __binaryHead (self, capacity):
+        """pack the binary file head for capacity rows"""
+        if self.__size==0:
+            (firsttemp, lasttemp)=(0, 0)
+        elif self.isTimeSorted():
+            (firsttemp, lasttemp)=(int(self.__time[0]),
+                                   int(self.__time[self.__size-1]))
+        else:
+            (firsttemp, lasttemp)=(int(self.timeArray.min()),
+                                   int(self.timeArray.max()))
+        headtemp=FinanceDataSet.binaryHeadStruct.pack(
+            FinanceDataSet.binaryMagic, FinanceDataSet.binaryVersion,
+            1 if self.isTimeSorted() else 0, self.__size, capacity,
+            firsttemp, lasttemp, self.period, self.timeType.encode("ascii"),
+            self.symbol.encode("utf-8")[:64])
+        return headtemp.ljust(FinanceDataSet.binaryHeadSize, b"\0")
+    def saveDataToBinaryFile (self, dataFile, incremental=True):
+        """save finance data to binary file
+
+        save finance data to binary file. The file has a head with symbol,
+        timeType, period, row count and time range, then the int64 epoch time
+        column and the float64 open, high, low, close, and volume columns.
+        Each column has free space for later rows. All numbers are little
+        endian.
+        If incremental is True, dataFile is not changed since this data set
+        loaded or saved it, and only rows after its last row are added, the
+        new rows are written into the free space and the head is updated.
+        Otherwise the file is rewritten to a temporary file and replaced.
+
+        Args:
+            dataFile: binary file path
+            incremental: True to write only new rows if it is possible
+
+        Returns:
+            None
+
+        Raise:
+            FinanceDataSetFileNotExist: dataFile is not a file name string
+        """
+        if isinstance(dataFile,str):
+            if (os.path.dirname(dataFile)!="" and
+                not os.path.exists(os.path.dirname(dataFile))):
+                os.makedirs(os.path.dirname(dataFile))
+            strtemp=dataFile
+        else:
+            raise FinanceDataSetFileNotExist("{0:s} is not a file name string."
+                                             .format(str(dataFile)))
+        starttemp=time.perf_counter()
+        rowtemp=self.__appendBinaryRows(strtemp) if incremental else None
+        if rowtemp is None:
+            _writeAtomic(strtemp, True, self.__writeBinaryFile)
+            self.__setSaveStatistics(strtemp, "binary", False, self.__size,
+                                     starttemp)
+        else:
+            self.__setSaveStatistics(strtemp, "binary", True, rowtemp,
+                                     starttemp)
+        self.__cleanRows["binary"]=self.__size
+        self.__syncFile=_fileIdentity(strtemp)
+    def __writeBinaryFile (self, binFileW):
+        """write the whole binary file with free space"""
+        capacitytemp=self.__size+max(self.__size//4, 64)
+        padtemp=bytes(8*(capacitytemp-self.__size))
+        binFileW.write(self.__binaryHead(capacitytemp))
+        binFileW.write(self.timeArray.astype("<i8").tobytes())
+        binFileW.write(padtemp)
+        for icount in range(len(FinanceDataSet.columnDict)):
+            binFileW.write(self.__values[icount, :self.__size].astype("<f8")
+                           .tobytes())
+            binFileW.write(padtemp)
+    def __appendBinaryRows (self, fileName):
+        """write new rows into the free space of fileName
+
+        Return the count of written rows, or None if the file must be
+        rewritten.
+        """
+        if (self.__syncFile is None or
+            self.__syncFile!=_fileIdentity(fileName)):
+            return None
+        with open(fileName, "r+b") as binFileW:
+            try:
+                headtemp=_binaryHead(binFileW.read(
+                    FinanceDataSet.binaryHeadSize), fileName)
+            except FinanceDataSetFileFormatWrong:
+                return None
+            rowtemp=headtemp["rows"]
+            capacitytemp=headtemp["capacity"]
+            if (rowtemp>self.__cleanRows["binary"] or
+                self.__size>capacitytemp or
+                (rowtemp!=0 and rowtemp<self.__size and
+                 self.__time[rowtemp]<=headtemp["lastTime"])):
+                return None
+            if rowtemp<self.__size:
+                binFileW.seek(FinanceDataSet.binaryHeadSize+8*rowtemp)
+                binFileW.write(self.__time[rowtemp:self.__size]
+                               .astype("<i8").tobytes())
+                for icount in range(len(FinanceDataSet.columnDict)):
+                    binFileW.seek(FinanceDataSet.binaryHeadSize
+                                  +8*capacitytemp*(icount+1)+8*rowtemp)
+                    binFileW.write(self.__values[icount,
+                                                 rowtemp:self.__size]
+                                   .astype("<f8").tobytes())
+                # the rows must be on disk before the head counts them
+                binFileW.flush()
+                os.fsync(binFileW.fileno())
+            binFileW.seek(0)
+            binFileW.write(self.__binaryHead(capacitytemp))
+        return self.__size-rowtemp
+    def getDataFromBinaryFile (self, dataFile):
+        """get finance data from binary file
+
+        get finance data from binary file written by saveDataToBinaryFile.
+        The file is read by one read call and the columns use the read
+        buffer directly. If the data set is empty, timeType, period and
+        symbol are taken from the file head, otherwise the rows are appended.
+
+        Args:
+            dataFile: binary file path
+
+        Returns:
+            None
+
+        Raise:
+            FinanceDataSetFileNotExist: an error occured getting data from file
+            FinanceDataSetFileFormatWrong: the file is not a binary data file
+        """
+        if isinstance(dataFile,str):
+            strtemp=dataFile
+        else:
+            raise FinanceDataSetFileNotExist("{0:s} is not a file name string."
+                                             .format(str(dataFile)))
+        starttemp=time.perf_counter()
+        try:
+            binFileR=open(strtemp, "rb")
+        except FileNotFoundError:
+            raise FinanceDataSetFileNotExist("{0:s} is not exist."
+                                             .format(str(strtemp)))
+        with binFileR:
+            buffertemp=bytearray(os.fstat(binFileR.fileno()).st_size)
+            binFileR.readinto(buffertemp)
+        (headtemp, timetemp, valuetemp)=_binaryColumns(buffertemp, strtemp)
+        if self.__size==0:
+            self.__time=timetemp
+            self.__values=valuetemp
+            self.__size=headtemp["rows"]
+            self.__sorted=True if headtemp["sorted"] else None
+            self.__setCleanRows(self.__size)
+            self.__syncFile=_fileIdentity(strtemp)
+            self.timeType=headtemp["timeType"]
+            self.period=headtemp["period"]
+            self.symbol=headtemp["symbol"]
+        else:
+            self.__appendColumns(timetemp[:headtemp["rows"]],
+                                 valuetemp[:, :headtemp["rows"]],
+                                 True if headtemp["sorted"] else None)
+            self.sortTime()
+        self.__setLoadStatistics(strtemp, "binary", True, headtemp["rows"],
+                                 starttemp)
+    def mapBinaryFile (self, dataFile):
+        """map a binary file as read only data
+
+        map a binary file written by saveDataToBinaryFile as read only data.
+        The file is not read, the columns are zero copy arrays on the memory
+        map and only the touched rows are paged in. The data of the data set
+        are replaced by the file, timeType, period and symbol are taken from
+        the file head. The columns are copied before the data set is changed,
+        the file is never written.
+
+        Args:
+            dataFile: binary file path
+
+        Returns:
+            None
+
+        Raise:
+            FinanceDataSetFileNotExist: an error occured getting data from file
+            FinanceDataSetFileFormatWrong: the file is not a binary data file
+        """
+        if isinstance(dataFile,str):
+            strtemp=dataFile
+        else:
+            raise FinanceDataSetFileNotExist("{0:s} is not a file name string."
+                                             .format(str(dataFile)))
+        starttemp=time.perf_counter()
+        if not os.path.isfile(strtemp):
+            raise FinanceDataSetFileNotExist("{0:s} is not exist."
+                                             .format(str(strtemp)))
+        if os.path.getsize(strtemp)<FinanceDataSet.binaryHeadSize:
+            raise FinanceDataSetFileFormatWrong("{0:s} is too short."
+                                                .format(strtemp))
+        maptemp=numpy.memmap(strtemp, dtype=numpy.uint8, mode="r")
+        (headtemp, timetemp, valuetemp)=_binaryColumns(maptemp, strtemp)
+        self.__time=timetemp
+        self.__values=valuetemp
+        self.__size=headtemp["rows"]
+        self.__sorted=True if headtemp["sorted"] else None
+        self.__setCleanRows(self.__size)
+        self.__syncFile=_fileIdentity(strtemp)
+        self.timeType=headtemp["timeType"]
+        self.period=headtemp["period"]
+        self.symbol=headtemp["symbol"]
+        self.__setLoadStatistics(strtemp, "memmap", True, headtemp["rows"],
+                                 starttemp)
+    def isMemoryMapped (self):
+        """check the columns are on a read only memory map
+
+        check the columns are on a read only memory map
+
+        Args:
+            None
+
+        Returns:
+            return True if the columns are not copied from the memory map yet
+
+        Raise:
+            None
+        """
+        return not self.__values.flags.writeable
     def sortTime (self):
         """sort the data with time
 
@@ -743,11 +2190,109 @@ class FinanceDataSet():
         Raise:
             None
         """
-        self.__openValue.sortTime()
-        self.__highValue.sortTime()
-        self.__lowValue.sortTime()
-        self.__closeValue.sortTime()
-        self.__volumeValue.sortTime()
+        if self.isTimeSorted():
+            return
+        order=numpy.argsort(self.timeArray, kind="stable")
+        self.__setColumns(self.__time[:self.__size][order],
+                          self.__values[:, :self.__size][:, order], True,
+                          _firstIndex(order!=numpy.arange(self.__size),
+                                      self.__size))
+    def isTimeSorted (self):
+        """check the data is sorted with time
+
+        check the data is sorted with time. The result is kept until the
+        data is changed.
+
+        Args:
+            None
+
+        Returns:
+            return True if time is in ascending order.
+
+        Raise:
+            None
+        """
+        if self.__sorted is None:
+            self.__sorted=_isSorted(self.timeArray)
+        return self.__sorted
+    def indexOfTime (self, itime):
+        """search row with time
+
+        search the first row with time. It uses binary search if the data is
+        sorted, otherwise it scans the time column.
+
+        Args:
+            itime: searching time, datetime.datetime
+
+        Returns:
+            return row index
+
+        Raise:
+            FinanceDataOutOfIndex: can't find match row
+        """
+        return _indexOfTime(self.timeArray, self.isTimeSorted(), itime)
+    def asOfIndex (self, itime):
+        """search the last row at or before time
+
+        search the last row whose time is at or before itime.
+        The data must be sorted.
+
+        Args:
+            itime: searching time, datetime.datetime
+
+        Returns:
+            return row index
+
+        Raise:
+            FinanceDataNotSorted: the data is not sorted
+            FinanceDataOutOfIndex: itime is before the first row
+        """
+        if not self.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceDataSet is not sorted with "
+                                       "time.")
+        return _asOfIndex(self.timeArray, itime)
+    def asOfIndexArray (self, itime):
+        """search the last rows at or before a group of time
+
+        search the last row at or before each time in itime. It is used to
+        align other data to this data. The data must be sorted.
+
+        Args:
+            itime: time sequence, see toEpochArray
+
+        Returns:
+            return int64 numpy array of row index. -1 means the time is
+            before the first row.
+
+        Raise:
+            FinanceDataNotSorted: the data is not sorted
+        """
+        if not self.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceDataSet is not sorted with "
+                                       "time.")
+        return numpy.searchsorted(self.timeArray, toEpochArray(itime),
+                                  "right").astype(numpy.int64)-1
+    def sliceByTime (self, start=None, end=None):
+        """slice the rows between start and end time
+
+        slice the rows whose time is between start and end. The data must be
+        sorted.
+
+        Args:
+            start: start time, datetime.datetime. None means from first.
+            end: end time, datetime.datetime and included. None means to last.
+
+        Returns:
+            return a FinanceDataSet view
+
+        Raise:
+            FinanceDataNotSorted: the data is not sorted
+        """
+        if not self.isTimeSorted():
+            raise FinanceDataNotSorted("FinanceDataSet is not sorted with "
+                                       "time.")
+        (begin, stop)=_timeRange(self.timeArray, start, end)
+        return self[begin:stop]
 class financeDataTest(unittest.TestCase):
     def setUp(self):
         self.sampleLine=FinanceLine()
@@ -787,6 +2332,260 @@ class financeDataTest(unittest.TestCase):
         self.assertTrue(2.0==min(self.sampleLine).value)
     def test_getIndex (self):
         self.assertTrue(self.sampleLine.index(datetime.datetime(2016,1,26))==3)
+    def test_columnStorage (self):
+        self.assertEqual(self.sampleSet.timeArray.dtype, numpy.int64)
+        self.assertEqual(self.sampleSet.closeValue.valueArray.tolist(),
+                         [9050.0, 8050.0, 7050.0, 6050.0])
+        self.assertEqual(self.sampleSet.highValue[1],
+                         FinancePoint(datetime.datetime(2015,8,26),8100))
+        self.sampleSet.sortTime()
+        self.assertEqual(self.sampleSet.lowValue.getTimeList()[0],
+                         datetime.datetime(2015,1,26))
+        self.assertEqual(self.sampleSet.volumeValue.getValueList(),
+                         [55.0, 33.0, 44.0, 100.0])
+    def test_sharedLineCopy (self):
+        linetemp=self.sampleSet.closeValue
+        linetemp.add(FinancePoint(datetime.datetime(2016,1,26),1))
+        linetemp.sortTime()
+        self.assertEqual(len(self.sampleSet), 4)
+        self.assertEqual(self.sampleSet.closeValue[0].value, 9050.0)
+        self.assertEqual(linetemp[0].value, 6050.0)
+    def test_sliceView (self):
+        settemp=self.sampleSet[1:3]
+        self.assertTrue(numpy.shares_memory(settemp.timeArray,
+                                            self.sampleSet.timeArray))
+        self.assertEqual(settemp.getRow(-1),
+                         (datetime.datetime(2015,10,26),7000.0,7100.0,6900.0,
+                          7050.0,44.0))
+        settemp.add(datetime.datetime(2016,1,1),1,1,1,1,1)
+        self.assertEqual(len(self.sampleSet), 4)
+        self.assertEqual(self.sampleSet.getRow(3)[4], 6050.0)
+        linetemp=self.sampleLine[::2]
+        self.assertEqual(linetemp.getValueList(), [10.0, 3.0, 2.0])
+        linetemp[0]=FinancePoint(datetime.datetime(2016,1,1),1)
+        self.assertEqual(self.sampleLine[0].value, 10.0)
+    def test_timeIndex (self):
+        self.assertFalse(self.sampleSet.isTimeSorted())
+        self.assertRaises(FinanceDataNotSorted, self.sampleSet.sliceByTime,
+                          datetime.datetime(2015,1,1))
+        self.sampleSet.sortTime()
+        self.assertEqual(self.sampleSet.indexOfTime(datetime.datetime(2015,10,26)), 2)
+        self.assertRaises(FinanceDataOutOfIndex, self.sampleSet.indexOfTime,
+                          datetime.datetime(2015,10,27))
+        self.assertEqual(self.sampleSet.asOfIndex(datetime.datetime(2015,10,27)), 2)
+        self.assertRaises(FinanceDataOutOfIndex, self.sampleSet.asOfIndex,
+                          datetime.datetime(2014,1,1))
+        settemp=self.sampleSet.sliceByTime(datetime.datetime(2015,8,26),
+                                           datetime.datetime(2015,10,26))
+        self.assertEqual(settemp.closeValue.getValueList(), [8050.0, 7050.0])
+        self.assertEqual(self.sampleSet.asOfIndexArray(
+            [datetime.datetime(2014,1,1), datetime.datetime(2016,1,1)]).tolist(),
+            [-1, 3])
+        linetemp=self.sampleSet.closeValue.sliceByTime(end=datetime.datetime(2015,9,1))
+        self.assertEqual(len(linetemp), 2)
+        self.sampleSet.add(datetime.datetime(2015,2,1),1,1,1,1)
+        self.assertFalse(self.sampleSet.isTimeSorted())
+    def test_epoch (self):
+        dt=datetime.datetime(2016,5,25,23,13,11,22)
+        self.assertEqual(epoch2Datetime(datetime2Epoch(dt)), dt)
+        self.assertEqual(epochArray2DatetimeList(toEpochArray([dt])), [dt])
+    def test_csvLoad (self):
+        self.sampleSet.sortTime()
+        with tempfile.TemporaryDirectory() as dirtemp:
+            filetemp=os.path.join(dirtemp, "sample.csv")
+            self.sampleSet.saveDataToFile(filetemp)
+            settemp=FinanceDataSet()
+            settemp.getDataFromFile(filetemp)
+            self.assertTrue(settemp.loadStatistics["bulk"])
+            self.assertEqual(settemp.loadStatistics["rows"], 4)
+            self.assertEqual([settemp.getRow(icount) for icount in range(4)],
+                             [self.sampleSet.getRow(icount) for icount in range(4)])
+            with open(filetemp, "a") as csvFileW:
+                csvFileW.write('2016/01/04,"1,000",1100,900,1050,10\n')
+            settemp=FinanceDataSet()
+            settemp.getDataFromFile(filetemp)
+            self.assertFalse(settemp.loadStatistics["bulk"])
+            self.assertEqual(settemp.getRow(-1),
+                             (datetime.datetime(2016,1,4),1000.0,1100.0,900.0,
+                              1050.0,10.0))
+            with open(filetemp, "w") as csvFileW:
+                csvFileW.write("2016/01/04 00:00:00:000000,1,1,2,1,1\n")
+            self.assertRaises(FinanceDataSetHighValueWrong,
+                              FinanceDataSet().getDataFromFile, filetemp)
+    def test_binaryFile (self):
+        self.sampleSet.symbol="TEST"
+        with tempfile.TemporaryDirectory() as dirtemp:
+            filetemp=os.path.join(dirtemp, "sample.fds")
+            self.sampleSet.saveDataToBinaryFile(filetemp)
+            settemp=FinanceDataSet(None, "minute")
+            settemp.getDataFromFile(filetemp)
+            self.assertEqual(settemp.loadStatistics["format"], "binary")
+            self.assertEqual((settemp.timeType, settemp.period, settemp.symbol),
+                             ("day", 1, "TEST"))
+            self.assertFalse(settemp.isTimeSorted())
+            self.assertEqual([settemp.getRow(icount) for icount in range(4)],
+                             [self.sampleSet.getRow(icount) for icount in range(4)])
+            settemp.add(datetime.datetime(2016,1,1),1,1,1,1)
+            self.assertEqual(len(settemp), 5)
+            settemp.getDataFromBinaryFile(filetemp)
+            self.assertEqual(len(settemp), 9)
+            self.assertTrue(settemp.isTimeSorted())
+            FinanceDataSet().saveDataToBinaryFile(filetemp)
+            settemp=FinanceDataSet()
+            settemp.getDataFromBinaryFile(filetemp)
+            self.assertEqual(len(settemp), 0)
+            with open(filetemp, "r+b") as binFileW:
+                binFileW.truncate(100)
+            self.assertRaises(FinanceDataSetFileFormatWrong,
+                              FinanceDataSet().getDataFromBinaryFile, filetemp)
+    def test_memoryMap (self):
+        with tempfile.TemporaryDirectory() as dirtemp:
+            filetemp=os.path.join(dirtemp, "sample.fds")
+            self.sampleSet.saveDataToBinaryFile(filetemp)
+            self.assertTrue(isBinaryDataFile(filetemp))
+            settemp=FinanceDataSet()
+            settemp.mapBinaryFile(filetemp)
+            self.assertTrue(settemp.isMemoryMapped())
+            self.assertEqual(settemp.loadStatistics["format"], "memmap")
+            self.assertEqual(settemp[-2:].getRow(0), self.sampleSet.getRow(2))
+            self.assertEqual(settemp.closeValue.valueArray.tolist(),
+                             self.sampleSet.closeValue.valueArray.tolist())
+            settemp.add(datetime.datetime(2016,1,1),1,1,1,1)
+            self.assertFalse(settemp.isMemoryMapped())
+            del settemp
+            settemp=FinanceDataSet()
+            settemp.getDataFromFile(filetemp)
+            self.assertEqual(len(settemp), 4)
+    def test_incrementalSave (self):
+        self.sampleSet.sortTime()
+        with tempfile.TemporaryDirectory() as dirtemp:
+            filetemp=os.path.join(dirtemp, "sample.fds")
+            self.sampleSet.saveDataToBinaryFile(filetemp)
+            self.assertFalse(self.sampleSet.saveStatistics["incremental"])
+            settemp=FinanceDataSet()
+            settemp.getDataFromFile(filetemp)
+            settemp.add(datetime.datetime(2016,1,1),1,1,1,1)
+            settemp.add(datetime.datetime(2016,1,2),2,2,2,2)
+            settemp.saveDataToBinaryFile(filetemp)
+            self.assertEqual((settemp.saveStatistics["incremental"],
+                              settemp.saveStatistics["rows"]), (True, 2))
+            settemp.add(datetime.datetime(2015,1,1),3,3,3,3)
+            settemp.sortTime()
+            settemp.saveDataToBinaryFile(filetemp)
+            self.assertFalse(settemp.saveStatistics["incremental"])
+            loadtemp=FinanceDataSet()
+            loadtemp.mapBinaryFile(filetemp)
+            self.assertEqual([loadtemp.getRow(icount) for icount in range(7)],
+                             [settemp.getRow(icount) for icount in range(7)])
+            self.sampleSet.saveDataToBinaryFile(filetemp)
+            self.assertFalse(self.sampleSet.saveStatistics["incremental"])
+            csvtemp=os.path.join(dirtemp, "sample.csv")
+            self.sampleSet.saveDataToFile(csvtemp, True)
+            self.assertFalse(self.sampleSet.saveStatistics["incremental"])
+            self.sampleSet.add(datetime.datetime(2016,1,1),1,1,1,1)
+            self.sampleSet.saveDataToFile(csvtemp, True)
+            self.assertEqual((self.sampleSet.saveStatistics["incremental"],
+                              self.sampleSet.saveStatistics["rows"]), (True, 1))
+            loadtemp=FinanceDataSet()
+            loadtemp.getDataFromFile(csvtemp)
+            self.assertEqual(loadtemp.getRow(-1), self.sampleSet.getRow(-1))
+            self.assertEqual(len(loadtemp), 5)
+            del self.sampleSet[0]
+            self.sampleSet.saveDataToBinaryFile(filetemp)
+            self.sampleSet.saveDataToFile(csvtemp, True)
+            self.assertFalse(self.sampleSet.saveStatistics["incremental"])
+    def test_mergeSet (self):
+        self.sampleSet.sortTime()
+        settemp=FinanceDataSet()
+        settemp.add(datetime.datetime(2015,8,26),8000,8100,7900,8050,33)
+        settemp.add(datetime.datetime(2015,9,26),1,1,1,1,1)
+        settemp.add(datetime.datetime(2015,12,26),2,2,2,2,2)
+        settemp.add(datetime.datetime(2015,12,26),3,3,3,3,3)
+        settemp.add(datetime.datetime(2016,1,26),4,4,4,4,4)
+        self.assertRaises(FinanceDataSetMergeConflict,
+                          self.sampleSet[:].mergeset, settemp, "raise")
+        oldtemp=self.sampleSet[:]
+        oldtemp.mergeset(settemp, "old")
+        self.assertEqual(oldtemp.closeValue.getValueList(),
+                         [6050.0, 8050.0, 1.0, 7050.0, 9050.0, 4.0])
+        self.sampleSet.mergeset(settemp)
+        self.assertEqual(self.sampleSet.closeValue.getValueList(),
+                         [6050.0, 8050.0, 1.0, 7050.0, 2.0, 4.0])
+        self.assertTrue(self.sampleSet.isTimeSorted())
+        self.sampleSet.mergeset(settemp[:1], "raise")
+        self.assertEqual(len(self.sampleSet), 6)
+        del self.sampleLine[1:3]
+        self.assertEqual(self.sampleLine.getValueList(), [10.0, 7.0, 2.0, 5.5])
+    def test_resample (self):
+        settemp=FinanceDataSet()
+        for icount in range(1, 15):
+            settemp.add(datetime.datetime(2016,2,22)+datetime.timedelta(days=icount*3),
+                        icount, icount+1, icount-0.5, icount, 1)
+        weektemp=settemp.resample("week")
+        self.assertEqual(weektemp.timeType, "week")
+        self.assertEqual(len(settemp), 14)
+        self.assertEqual(weektemp.getRow(0),
+                         (datetime.datetime(2016,2,28),1.0,3.0,0.5,2.0,2.0))
+        self.assertEqual(weektemp.getRow(1),
+                         (datetime.datetime(2016,3,5),3.0,5.0,2.5,4.0,2.0))
+        monthtemp=settemp.resample("month")
+        self.assertEqual(monthtemp.closeValue.getValueList(), [2.0, 12.0, 14.0])
+        self.assertEqual(monthtemp.volumeValue.getValueList(), [2.0, 10.0, 2.0])
+        self.assertEqual(len(settemp.resample("year")), 1)
+        self.assertRaises(FinanceDataError, settemp.resample, "tick")
+        settemp.changePeriod(5)
+        self.assertEqual(settemp.openValue.getValueList(), [1.0, 6.0, 11.0])
+        self.assertEqual(settemp.highValue.getValueList(), [6.0, 11.0, 15.0])
+    def test_pyramid (self):
+        settemp=FinanceDataSet()
+        for icount in range(11):
+            settemp.add(datetime.datetime(2016,1,1)+datetime.timedelta(days=icount),
+                        icount+1, icount+3, icount+0.5, icount+2, icount)
+        def check (level):
+            changetemp=FinanceDataSet(settemp)
+            changetemp.changePeriod(2**level)
+            leveltemp=settemp.getPyramidLevel(level)
+            self.assertEqual([leveltemp.getRow(icount) for icount in range(len(leveltemp))],
+                             [changetemp.getRow(icount) for icount in range(len(changetemp))])
+            return leveltemp
+        leveltemp=check(2)
+        self.assertEqual(len(leveltemp), 3)
+        settemp.add(datetime.datetime(2016,2,1),1,20,1,1,1)
+        check(1)
+        check(3)
+        self.assertEqual(leveltemp.getRow(-1)[2], 13.0)
+        del settemp[0]
+        check(2)
+        self.assertEqual(FinanceDataSet.getPyramidLevelFor(1000, 300), 2)
+        self.assertEqual(FinanceDataSet.getPyramidLevelFor(10, 300), 0)
+    def test_peakVale (self):
+        linetemp=FinanceLine.fromArray(numpy.arange(9)*1000000,
+                                       [1, 5, 2, 3, 3, 2, 4, 0, 1])
+        self.assertEqual(linetemp.findPeakIndex().tolist(), [1, 4, 6])
+        self.assertEqual(linetemp.findValeIndex().tolist(), [2, 5, 7])
+        self.assertEqual(linetemp.findPeakIndex(minProminence=2).tolist(), [1, 6])
+        self.assertEqual(linetemp.findPeakIndex(minDistance=3).tolist(), [1, 6])
+        self.assertEqual(linetemp.findValeIndex(mask=True).tolist(),
+                         [False, False, True, False, False, True, False, True, False])
+        peaktemp=linetemp.findPeak()
+        self.assertEqual(peaktemp.getValueList(), [0.0, 1.0, 0.0, 0.0, 1.0, 0.0, 1.0, 0.0, 0.0])
+        self.assertEqual(peaktemp.getTimeList(), linetemp.getTimeList())
+    def test_rangeIndex (self):
+        self.assertEqual(self.sampleLine.getMaxValueIndex(), 0)
+        self.assertEqual(self.sampleLine.getMinValueIndex(1, -1), 4)
+        self.assertEqual(self.sampleLine.getMinValueIndex(1, 3), 1)
+        self.assertEqual(self.sampleLine.getMaxValueIndex(2, 2), 2)
+        self.assertEqual(self.sampleLine.getRangeMaxIndex([1, 2, 3], [3, 6, 4]).tolist(),
+                         [1, 3, 3])
+        self.assertRaises(FinanceDataOutOfIndex, self.sampleLine.getRangeMinIndex, 3, 3)
+        self.sampleLine.add(FinancePoint(datetime.datetime(2016,9,26),1))
+        self.assertEqual(self.sampleLine.getRangeMinIndex(0, 7), 6)
+        self.sampleLine[0]=FinancePoint(datetime.datetime(2016,5,25),0)
+        self.assertEqual(self.sampleLine.getMinValueIndex(), 0)
+        self.assertEqual(self.sampleSet.getRangeMaxIndex("high", 1, 4), 1)
+        self.sampleSet.sortTime()
+        self.assertEqual(self.sampleSet.getRangeMaxIndex("high", 1, 4), 3)
+        self.assertEqual(self.sampleSet.getRangeMinIndex("low", 1, 4), 2)
 if __name__=="__main__":
     unittest.main(verbosity=2)
 
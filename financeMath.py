@@ -4,15 +4,503 @@
     :synopsis: finance mathematic function class
 .. author: K.K.Chien
 """
+import abc
+import collections
 import datetime
+import hashlib
+import json
 import math
+import multiprocessing
+import os
+import shutil
 import sys
+import tempfile
 import unittest
+import zipfile
+import numpy
 import financeData
 
 class FinanceMathFunctionError(Exception): pass
 class FinanceMathFunctionOutofIndex(FinanceMathFunctionError): pass
 class FinanceMathFunctionPosBelowPeriod(FinanceMathFunctionError): pass
+class FinanceMathStateWrong(FinanceMathFunctionError): pass
+
+def _checkPeriod (period):
+    if not isinstance(period, int) or period<=1:
+        raise FinanceMathFunctionError("{0:s} is not a integer or <=1.".format(str(period)))
+def _windowSeries (values, period, kernel, block, out=None):
+    """apply a moving window kernel to a value array block by block
+
+    kernel(segment, period) returns the results of the windows which end at
+    segment[period-1:]. The prefix sums of a kernel restart in every block,
+    so their rounding error does not grow with the series length.
+    Positions before period-1 are NaN, or they are not written if the
+    results are written into out.
+    """
+    sizetemp=len(values)
+    if out is None:
+        result=numpy.full(sizetemp, numpy.nan)
+    else:
+        result=out
+    block=max(int(block), 1)
+    for start in range(period-1, sizetemp, block):
+        end=min(start+block, sizetemp)
+        result[start:end]=kernel(values[start-period+1:end], period)
+    return result
+def _prefixSum (values):
+    """prefix sums of values with a leading zero"""
+    result=numpy.zeros(len(values)+1)
+    numpy.cumsum(values, out=result[1:])
+    return result
+def _maKernel (segment, period):
+    # the sums are taken around segment[0] to keep them small
+    base=segment[0]
+    sumtemp=_prefixSum(segment-base)
+    return (sumtemp[period:]-sumtemp[:-period])/period+base
+def _wmaKernel (segment, period):
+    # weight of segment[j] in the window ending at t is j-(t-period)
+    base=segment[0]
+    segment=segment-base
+    sumtemp=_prefixSum(segment)
+    indexsum=_prefixSum(segment*numpy.arange(len(segment)))
+    sumtemp=sumtemp[period:]-sumtemp[:-period]
+    indexsum=indexsum[period:]-indexsum[:-period]
+    position=numpy.arange(period-1, len(segment))
+    return ((indexsum-(position-period)*sumtemp)/(period*(period+1)/2.0)
+            +base)
+def _emaKernel (segment, period):
+    # sum ratio**(t-j)*segment[j] is ratio**t times a prefix sum difference
+    ratio=1.0-2.0/(period+1)
+    scale=ratio**-numpy.arange(len(segment), dtype=numpy.float64)
+    sumtemp=_prefixSum(segment*scale)
+    divider=(1.0-ratio**period)/(1.0-ratio)
+    return (sumtemp[period:]-sumtemp[:-period])/scale[period-1:]/divider
+def _maArray (values, period):
+    """moving average array of values, NaN before period-1"""
+    return _windowSeries(values, period, _maKernel, 4096)
+def _wmaArray (values, period):
+    """weighted moving average array of values, NaN before period-1"""
+    return _windowSeries(values, period, _wmaKernel, 256)
+def _emaArray (values, period):
+    """exponential moving average array of values, NaN before period-1
+
+    It is the same finite window average as FinanceMathFunction.calEMA.
+    Blocks are kept short enough that ratio**-block is far from overflow.
+    """
+    ratio=1.0-2.0/(period+1)
+    return _windowSeries(values, period, _emaKernel,
+                         min(300.0/-math.log(ratio), 4096.0))
+def _trueRangeArray (close, high, low):
+    """true range array, the first bar has no previous close and is high-low"""
+    result=numpy.abs(numpy.subtract(high, low, dtype=numpy.float64))
+    if len(result)>1:
+        numpy.maximum(result[1:], numpy.abs(high[1:]-close[:-1]), out=result[1:])
+        numpy.maximum(result[1:], numpy.abs(low[1:]-close[:-1]), out=result[1:])
+    return result
+def _atrArray (close, high, low, period, multiplier):
+    """average true range array, the EMA of true range*multiplier"""
+    return _emaArray(_trueRangeArray(close, high, low)*multiplier, period)
+def _hmaArray (values, period):
+    """hull moving average array of values, NaN in warm-up positions"""
+    return FinanceHMAEngine(period).compute(values)
+def _multiWindowArray (values, periods, weighted):
+    """moving or weighted moving averages of values, one row per period
+
+    The prefix sums of every block are computed once and shared by all
+    periods. Positions before period-1 are NaN.
+    """
+    periodtemp=numpy.asarray(periods, dtype=numpy.int64).reshape(-1, 1)
+    sizetemp=len(values)
+    result=numpy.full((len(periodtemp), sizetemp), numpy.nan)
+    if len(periodtemp)==0:
+        return result
+    maxperiod=int(periodtemp.max())
+    if weighted:
+        divider=periodtemp*(periodtemp+1)/2.0
+    else:
+        divider=periodtemp.astype(numpy.float64)
+    block=256 if weighted else 4096
+    for start in range(int(periodtemp.min())-1, sizetemp, block):
+        end=min(start+block, sizetemp)
+        first=max(start-maxperiod+1, 0)
+        base=values[first]
+        segment=values[first:end]-base
+        sumtemp=_prefixSum(segment)
+        position=numpy.arange(start-first, end-first)
+        # windows of period p end at position and begin after begin
+        begin=position+1-periodtemp
+        begintemp=numpy.maximum(begin, 0)
+        windowsum=sumtemp[position+1]-sumtemp[begintemp]
+        if weighted:
+            indexsum=_prefixSum(segment*numpy.arange(len(segment)))
+            windowsum=(indexsum[position+1]-indexsum[begintemp]
+                       -(position-periodtemp)*windowsum)
+        result[:, start:end]=numpy.where(begin>=0, windowsum/divider+base,
+                                         numpy.nan)
+    return result
+def _multiHmaArray (values, periods):
+    """hull moving averages of values, one row per period
+
+    The full and half period weighted moving averages of all periods are
+    computed in one _multiWindowArray call.
+    """
+    for period in periods:
+        _checkPeriod(int(period/2))
+        _checkPeriod(int(math.sqrt(period)))
+    wmaperiods=sorted(set(periods)|set(int(period/2) for period in periods))
+    wmatemp=_multiWindowArray(values, wmaperiods, True)
+    rowdict={period:icount for (icount, period) in enumerate(wmaperiods)}
+    result=numpy.full((len(periods), len(values)), numpy.nan)
+    for (icount, period) in enumerate(periods):
+        if len(values)<period:
+            continue
+        difftemp=(wmatemp[rowdict[int(period/2)], period-1:]*2
+                  -wmatemp[rowdict[period], period-1:])
+        result[icount, period-1:]=_wmaArray(difftemp, int(math.sqrt(period)))
+    return result
+def _cacheBytes (value):
+    """approximate memory size of a cached value"""
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes
+    if isinstance(value, financeData.FinanceLine):
+        return len(value)*16
+    if isinstance(value, (tuple, list)):
+        return sum(_cacheBytes(item) for item in value)
+    if isinstance(value, FinanceBandBase):
+        # middle is the cached middle average, only offset is owned
+        return value.offset.nbytes
+    return 64
+
+class FinanceIndicatorCache():
+    """This class is a bounded cache of indicator results.
+    
+    A result is keyed by the cacheKey of its source FinanceLines, the
+    indicator name and its parameters. A FinanceLine cacheKey is
+    (identity, version), and the version is changed when the line or its
+    FinanceDataSet is changed. When a lookup finds a new version of a
+    source, the results of the old versions are dropped. The least recently
+    used results are dropped when the cache has more than maxEntries results
+    or maxBytes bytes.
+
+    Attributes:
+        maxEntries: maximum result count
+        maxBytes: maximum approximate result bytes
+        hits: count of lookups which find a result
+        misses: count of lookups which create a result
+    """
+    def __init__ (self, maxEntries=128, maxBytes=64*1024*1024):
+        self.maxEntries=maxEntries
+        self.maxBytes=maxBytes
+        self.hits=0
+        self.misses=0
+        self.__entries=collections.OrderedDict()
+        self.__bytes=0
+        self.__versions={}
+    def __len__ (self):
+        return len(self.__entries)
+    @property
+    def bytes (self):
+        return self.__bytes
+    def __remove (self, key):
+        self.__bytes-=_cacheBytes(self.__entries.pop(key))
+    def __dropTokens (self, tokens):
+        """drop the results which use one of tokens"""
+        for keytemp in [keytemp for keytemp in self.__entries 
+                        if any(token in tokens for (token, version) in keytemp[0])]:
+            self.__remove(keytemp)
+        for token in tokens:
+            self.__versions.pop(token, None)
+    def __forgetUnused (self):
+        usedtemp={token for keytemp in self.__entries
+                  for (token, version) in keytemp[0]}
+        for token in [token for token in self.__versions if token not in usedtemp]:
+            del self.__versions[token]
+    def lookup (self, lines, name, params, creator):
+        """get a cached result, or create and cache it
+
+        get a cached result, or create and cache it
+
+        Args:
+            lines: a FinanceLine or a tuple of source FinanceLines
+            name: indicator name
+            params: hashable indicator parameters
+            creator: a function without args which creates the result
+
+        Returns:
+            return the result. A numpy array result is read only.
+
+        Raise:
+            FinanceMathFunctionError: lines are not FinanceLine classes.
+        """
+        if isinstance(lines, financeData.FinanceLine):
+            lines=(lines,)
+        for line in lines:
+            if not isinstance(line, financeData.FinanceLine):
+                raise FinanceMathFunctionError("{0:s} is not a FinanceLine class.".format(str(line)))
+        sourcetemp=tuple(line.cacheKey for line in lines)
+        staletemp=[token for (token, version) in sourcetemp
+                   if self.__versions.get(token, version)!=version]
+        if staletemp:
+            self.__dropTokens(staletemp)
+        keytemp=(sourcetemp, name, params)
+        if keytemp in self.__entries:
+            self.hits+=1
+            self.__entries.move_to_end(keytemp)
+            return self.__entries[keytemp]
+        self.misses+=1
+        result=creator()
+        if isinstance(result, numpy.ndarray):
+            result.flags.writeable=False
+        self.__entries[keytemp]=result
+        self.__bytes+=_cacheBytes(result)
+        for (token, version) in sourcetemp:
+            self.__versions[token]=version
+        if len(self.__entries)>self.maxEntries or self.__bytes>self.maxBytes:
+            while len(self.__entries)>1 and (len(self.__entries)>self.maxEntries
+                                             or self.__bytes>self.maxBytes):
+                self.__remove(next(iter(self.__entries)))
+            self.__forgetUnused()
+        return result
+    def invalidate (self, line=None):
+        """drop cached results of a line
+
+        drop cached results of a line. Call it when the line is going to be
+        appended to and its old results are not used any more.
+
+        Args:
+            line: a FinanceLine, or None to drop all results
+
+        Returns:
+            None
+
+        Raise:
+            None
+        """
+        if line is None:
+            self.__entries.clear()
+            self.__versions.clear()
+            self.__bytes=0
+        else:
+            self.__dropTokens([line.cacheKey[0]])
+
+class FinanceIndicatorDiskCache():
+    """This class is a persistent cache of indicator results.
+    
+    A result is saved in cacheDir with the row count and the SHA-1 digest of
+    the source columns it is computed from. The file name is a hash of the
+    indicator name, its parameters, a source label and the first source row,
+    so the same indicator of a longer source finds the same file. When the
+    saved rows are still the head of the source, only the new rows are
+    computed and appended to the saved result.
+
+    Attributes:
+        cacheDir: cache file directory
+        hits: count of lookups which reuse a whole result
+        extends: count of lookups which compute new rows only
+        misses: count of lookups which compute a whole result
+    """
+    def __init__ (self, cacheDir="./cache"):
+        self.cacheDir=cacheDir
+        self.hits=0
+        self.extends=0
+        self.misses=0
+    @staticmethod
+    def __digest (sources, rows):
+        hashtemp=hashlib.sha1()
+        hashtemp.update(numpy.ascontiguousarray(sources[0].timeArray[:rows]))
+        for line in sources:
+            hashtemp.update(numpy.ascontiguousarray(line.valueArray[:rows]))
+        return hashtemp.digest()
+    def __fileName (self, sources, name, params, label):
+        hashtemp=hashlib.sha1(repr((name, params, label)).encode("utf-8"))
+        hashtemp.update(self.__digest(sources, 1))
+        return os.path.join(self.cacheDir, "{0:s}_{1:s}.npz"
+                                           .format(name, hashtemp.hexdigest()[:24]))
+    def lookup (self, sources, name, params, creator, lookback=None, label=""):
+        """get a saved result, or compute and save it
+
+        get a saved result, or compute and save it
+
+        Args:
+            sources: a tuple of FinanceLines which have the same time
+            name: indicator name
+            params: indicator parameters which have a stable repr
+            creator: creator(*lines) returns the result array of sliced
+                   source lines, its last axis is the source rows.
+            lookback: the count of rows a result value depends on, the
+                    value at row i uses rows i-lookback+1 to i. None if the
+                    result can't be extended.
+            label: source name, like the data file name
+
+        Returns:
+            return the result array
+
+        Raise:
+            FinanceMathFunctionError: sources are not matched FinanceLines.
+        """
+        for line in sources:
+            if not isinstance(line, financeData.FinanceLine):
+                raise FinanceMathFunctionError("{0:s} is not a FinanceLine class.".format(str(line)))
+            if len(line)!=len(sources[0]):
+                raise FinanceMathFunctionError("source lines are not matched.")
+        rows=len(sources[0])
+        filetemp=self.__fileName(sources, name, params, label)
+        result=None
+        try:
+            with numpy.load(filetemp, allow_pickle=False) as datatemp:
+                savedrows=int(datatemp["rows"])
+                if (savedrows<=rows and 
+                    datatemp["digest"].tobytes()==self.__digest(sources, savedrows)):
+                    result=datatemp["result"]
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            pass
+        if result is not None and savedrows==rows:
+            self.hits+=1
+            return result
+        if result is not None and lookback is not None:
+            self.extends+=1
+            start=max(savedrows-lookback, 0)
+            tailtemp=numpy.asarray(creator(*[line[start:] for line in sources]))
+            result=numpy.concatenate((result, tailtemp[..., savedrows-start:]), axis=-1)
+        else:
+            self.misses+=1
+            result=numpy.asarray(creator(*sources))
+        os.makedirs(self.cacheDir, exist_ok=True)
+        financeData._writeAtomic(filetemp, True, 
+                                 lambda fileW: numpy.savez(fileW, rows=numpy.int64(rows),
+                                                           digest=numpy.frombuffer(self.__digest(sources, rows), 
+                                                                                   dtype=numpy.uint8),
+                                                           result=result))
+        return result
+
+class FinanceHMAEngine():
+    """This class computes a hull moving average series.
+    
+    The series is 2*WMA(period/2)-WMA(period) filtered by WMA(sqrt(period)),
+    the same as calHMA. The two WMA passes, the difference line and the
+    result are kept in buffers which grow by doubling and are reused, so
+    extend() computes appended bars only, with period-1 bars of context.
+
+    Attributes:
+        period: moving average period
+        result: read only HMA array of the computed bars, NaN in warm-up
+    """
+    def __init__ (self, period):
+        _checkPeriod(period)
+        _checkPeriod(int(period/2))
+        _checkPeriod(int(math.sqrt(period)))
+        self.period=period
+        self.__buffers=numpy.empty((4, 0))
+        self.__size=0
+    def __len__ (self):
+        return self.__size
+    @property
+    def result (self):
+        return financeData._readOnly(self.__buffers[3, :self.__size])
+    @staticmethod
+    def __window (source, out, period, start, end):
+        """write WMA(period) of source[start:end] into out[start:end]"""
+        out[start:min(period-1, end)]=numpy.nan
+        first=max(start-period+1, 0)
+        _windowSeries(source[first:end], period, _wmaKernel, 256, out[first:end])
+    def compute (self, values):
+        """compute the HMA series of values
+
+        compute the HMA series of values
+
+        Args:
+            values: a value array
+
+        Returns:
+            return the read only result array
+
+        Raise:
+            None
+        """
+        self.__size=0
+        return self.extend(values)
+    def extend (self, values):
+        """compute the HMA of bars which are appended to values
+
+        compute the HMA of bars which are appended to values. The first
+        len(self) values must be the values which are computed before.
+
+        Args:
+            values: the whole value array
+
+        Returns:
+            return the read only result array
+
+        Raise:
+            FinanceMathFunctionError: values is shorter than computed bars.
+        """
+        values=numpy.asarray(values, dtype=numpy.float64)
+        (start, end)=(self.__size, len(values))
+        if end<start:
+            raise FinanceMathFunctionError("values are shorter than {0:d} computed bars.".format(start))
+        if end>self.__buffers.shape[1]:
+            buffertemp=numpy.empty((4, max(end, 2*self.__buffers.shape[1])))
+            buffertemp[:, :start]=self.__buffers[:, :start]
+            self.__buffers=buffertemp
+        (full, half, diff, result)=self.__buffers
+        self.__window(values, full, self.period, start, end)
+        self.__window(values, half, int(self.period/2), start, end)
+        numpy.subtract(half[start:end]*2, full[start:end], out=diff[start:end])
+        # the difference line starts at period-1
+        warmup=self.period-1
+        result[start:min(warmup, end)]=numpy.nan
+        if end>warmup:
+            self.__window(diff[warmup:end], result[warmup:end], 
+                          int(math.sqrt(self.period)), max(start-warmup, 0), end-warmup)
+        self.__size=end
+        return self.result
+
+class FinanceBandBase():
+    """This class keeps the multiplier independent part of a band.
+    
+    A band is middle+-offset*multiplier, where offset is the larger distance
+    from the middle line to the high or low average line. The middle and
+    offset lines depend on the period only, so they are computed once and
+    band() gives the lines of every multiplier.
+
+    Attributes:
+        timeArray: epoch time array of the source lines
+        middle: middle line value array, NaN in warm-up positions
+        offset: offset value array, NaN in warm-up positions
+        start: first position which has a band value
+    """
+    def __init__ (self, timeArray, middle, highAverage, lowAverage):
+        self.timeArray=timeArray
+        self.middle=middle
+        self.offset=numpy.maximum(highAverage-middle, middle-lowAverage)
+        self.middle.flags.writeable=False
+        self.offset.flags.writeable=False
+        validtemp=numpy.flatnonzero(~numpy.isnan(self.offset))
+        self.start=int(validtemp[0]) if len(validtemp) else len(middle)
+    def band (self, multiplier):
+        """get the band lines of a multiplier
+
+        get the band lines of a multiplier or a sequence of multipliers.
+        The offset line is broadcast to every multiplier.
+
+        Args:
+            multiplier: high/low mutiplier, or a sequence of mutipliers
+
+        Returns:
+            return (middle, high, low) value arrays. They have one row per
+            multiplier if multiplier is a sequence, and the middle rows are
+            a read only view of the middle line.
+
+        Raise:
+            None
+        """
+        multipliertemp=numpy.asarray(multiplier, dtype=numpy.float64)
+        if multipliertemp.ndim==0:
+            offsettemp=self.offset*multipliertemp
+            return (self.middle, self.middle+offsettemp, self.middle-offsettemp)
+        offsettemp=self.offset*multipliertemp.reshape(-1, 1)
+        return (numpy.broadcast_to(self.middle, offsettemp.shape), 
+                self.middle+offsettemp, self.middle-offsettemp)
 
 class FinanceMathFunction():
     """This class collect finance mathmatical functions.
@@ -20,7 +508,7 @@ class FinanceMathFunction():
     This class collect finance mathmatical functions.
 
     Attributes:
-        None
+        cache: FinanceIndicatorCache of the intermediate lines
     """
     goldRatio=1.6180339
     cjGRation=0.6180339
@@ -28,7 +516,19 @@ class FinanceMathFunction():
     def __init__ (self):
         self.clear()
     def clear (self):
-        self.tempdic={}
+        self.cache=FinanceIndicatorCache()
+    def __cachedValue (self, series, position):
+        """get series[position], NaN is a warm-up position"""
+        valuetemp=float(series[position])
+        if math.isnan(valuetemp):
+            raise FinanceMathFunctionPosBelowPeriod("position:{0:d} is in warm-up.".format(position))
+        return valuetemp
+    def __cachedEMA (self, inputData, period):
+        return self.cache.lookup(inputData, "ema", period,
+                                 lambda: _emaArray(inputData.valueArray, period))
+    def __cachedHMA (self, inputData, period):
+        return self.cache.lookup(inputData, "hma", period,
+                                 lambda: _hmaArray(inputData.valueArray, period))
     def calMA (self, inputData, outputData, position=5, period=5):
         """caculate moving average
 
@@ -146,6 +646,146 @@ class FinanceMathFunction():
             divider+=((1-alpha)**icount)
         valuetemp/=divider
         outputData.add(financeData.FinancePoint(inputData[position].time, valuetemp))
+    def __checkSeries (self, inputData, period):
+        if not isinstance(inputData, financeData.FinanceLine):
+            raise FinanceMathFunctionError("{0:s} is not a FinanceLine class.".format(str(inputData)))
+        if not isinstance(period, int) or period<=1:
+            raise FinanceMathFunctionError("{0:s} is not a integer or <=1.".format(str(period)))
+    def __checkLines (self, closeData, highData, lowData):
+        for line in (closeData, highData, lowData):
+            if not isinstance(line, financeData.FinanceLine):
+                raise FinanceMathFunctionError("{0:s} is not a FinanceLine class.".format(str(line)))
+        if not len(closeData)==len(highData)==len(lowData):
+            raise FinanceMathFunctionError("close, high and low lines are not matched.")
+    def __seriesLine (self, inputData, values):
+        return financeData.FinanceLine.fromArray(inputData.timeArray, values,
+                                                 copy=False)
+    def calMASeries (self, inputData, period=5):
+        """caculate moving average of a whole line
+
+        caculate moving average of a whole line. It uses running sums and
+        gives the same values as calMA for every position.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            period: moving average period, default 5
+
+        Returns:
+            return a FinanceLine which has the same time as inputData.
+            The values before position period-1 are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkSeries(inputData, period)
+        return self.__seriesLine(inputData,
+                                 _maArray(inputData.valueArray, period))
+    def calWMASeries (self, inputData, period=5):
+        """caculate weighted moving average of a whole line
+
+        caculate weighted moving average of a whole line. It uses running
+        sums of values and index weighted values, and gives the same values
+        as calWMA for every position.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            period: moving average period, default 5
+
+        Returns:
+            return a FinanceLine which has the same time as inputData.
+            The values before position period-1 are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkSeries(inputData, period)
+        return self.__seriesLine(inputData,
+                                 _wmaArray(inputData.valueArray, period))
+    def calEMASeries (self, inputData, period=5):
+        """caculate exponential moving average of a whole line
+
+        caculate exponential moving average of a whole line. The weighted
+        window sums are differences of prefix sums of values scaled by
+        ratio**-j, with ratio=1-2/(period+1), divided back by ratio**-t.
+        The prefix sums restart in short blocks to keep the scale finite.
+        It gives the same values as calEMA for every position.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            period: moving average period, default 5
+
+        Returns:
+            return a FinanceLine which has the same time as inputData.
+            The values before position period-1 are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkSeries(inputData, period)
+        return self.__seriesLine(inputData,
+                                 _emaArray(inputData.valueArray, period))
+    def calHMASeries (self, inputData, period=5):
+        """caculate hull moving average of a whole line
+
+        caculate hull moving average of a whole line. It gives the same
+        values as calHMA for every position.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            period: moving average period, default 5
+
+        Returns:
+            return a FinanceLine which has the same time as inputData.
+            The values before position period+int(sqrt(period))-2 are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkSeries(inputData, period)
+        return self.__seriesLine(inputData, self.__cachedHMA(inputData, period))
+    def calMultiPeriodSeries (self, inputData, periods, matype="hma"):
+        """caculate a moving average of a whole line for many periods
+
+        caculate a moving average of a whole line for many periods in one
+        pass. MA and WMA share the prefix sums of the line between periods,
+        HMA shares the WMA passes of all its full and half periods.
+        Every row is the same as the Series function of its period. EMA and
+        HMA rows are also cached as the averages of their periods, so the
+        bands and series of these periods reuse them.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            periods: a sequence of moving average periods
+            matype: 'ma', 'wma', 'ema' or 'hma'
+
+        Returns:
+            return a 2-D numpy array, one row per period and one column per
+            inputData position. Warm-up values are NaN. EMA and HMA arrays
+            are read only.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        periods=[int(period) if isinstance(period, numpy.integer) else period
+                 for period in periods]
+        for period in periods:
+            self.__checkSeries(inputData, period)
+        valuetemp=inputData.valueArray
+        if matype=="ma" or matype=="wma":
+            return _multiWindowArray(valuetemp, periods, matype=="wma")
+        elif matype=="ema":
+            result=numpy.full((len(periods), len(valuetemp)), numpy.nan)
+            for (icount, period) in enumerate(periods):
+                result[icount]=_emaArray(valuetemp, period)
+        elif matype=="hma":
+            result=_multiHmaArray(valuetemp, periods)
+        else:
+            raise FinanceMathFunctionError("{0:s} is not a moving average type.".format(str(matype)))
+        # cached rows are views, so the whole array is read only
+        result.flags.writeable=False
+        for (row, period) in zip(result, periods):
+            self.cache.lookup(inputData, matype, period, lambda: row)
+        return result
     def calHMA (self, inputData, outputData, position, period=5):
         """caculate hull moving average
 
@@ -178,17 +818,8 @@ class FinanceMathFunction():
             raise FinanceMathFunctionError("{0:s} is not a integer or <=1.".format(str(period)))
         if position<period-1:
             raise FinanceMathFunctionPosBelowPeriod("position:{0:d}<(period:{1:d}-1).".format(position,period))
-        idstr=str(id(inputData)+id(outputData))
-        if idstr not in self.tempdic.keys():
-            self.tempdic[idstr]=financeData.FinanceLine()
-        wma1=financeData.FinanceLine()
-        self.calWMA(inputData,wma1,position,period)
-        wma2=financeData.FinanceLine()
-        self.calWMA(inputData,wma2,position,int(period/2))
-        pointtemp=financeData.FinancePoint(inputData[position].time,wma2[0].value*2-wma1[0].value)
-        self.tempdic[idstr].add(pointtemp)
-        #self.tempdic[idstr].removeRepeatItem()
-        self.calWMA(self.tempdic[idstr],outputData,len(self.tempdic[idstr])-1,int(math.sqrt(period)))
+        valuetemp=self.__cachedValue(self.__cachedHMA(inputData, period), position)
+        outputData.add(financeData.FinancePoint(inputData[position].time, valuetemp))
     def calxMACD (self, inputData, inputMA1, inputMA2, outputDiff, position):
         if not isinstance(inputData, financeData.FinanceLine):
             raise FinanceMathFunctionError("{0:s} is not a FinanceLine class.".format(str(inputData)))
@@ -262,6 +893,29 @@ class FinanceMathFunction():
             raise FinanceMathFunctionPosBelowPeriod()
         pointtemp=financeData.FinancePoint(outputHMA[-1].time, outputHMA[-1].value-outputEMA[-1].value)
         outputDiff.add(pointtemp)
+    def calKKMACDSeries (self, inputData, periodHMA, periodEMA):
+        """caculate myself moving average convergence divergence of a whole line
+
+        caculate the (HMA-EMA) line of a whole line. It reads the cached HMA
+        and EMA arrays and gives the same values as calKKMACD outputDiff for
+        every position.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            periodHMA: HMA moving average period
+            periodEMA: EMA moving average period
+
+        Returns:
+            return a FinanceLine which has the same time as inputData.
+            Warm-up values are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkSeries(inputData, periodHMA)
+        self.__checkSeries(inputData, periodEMA)
+        return self.__seriesLine(inputData, self.__cachedHMA(inputData, periodHMA)
+                                            -self.__cachedEMA(inputData, periodEMA))
     def calEMABand (self, closeData, highData, lowData, outputMid, outputHigh, outputLow, position, period, multiplier):
         """caculate EMA band
 
@@ -309,29 +963,20 @@ class FinanceMathFunction():
             raise FinanceMathFunctionPosBelowPeriod("position:{0:d}<(period:{1:d}-1).".format(position,period))
         if not isinstance(multiplier, float):
             raise FinanceMathFunctionError("{0:s} is not a float.".format(str(multiplier)))
-        idhighstr=str(id(highData)+id(outputHigh))
-        if idhighstr not in self.tempdic.keys():
-            self.tempdic[idhighstr]=financeData.FinanceLine()
-        idlowstr=str(id(lowData)+id(outputLow))
-        if idlowstr not in self.tempdic.keys():
-            self.tempdic[idlowstr]=financeData.FinanceLine()
         exceptTemp=False
         try:
             self.calEMA(closeData,outputMid,position,period)
         except FinanceMathFunctionPosBelowPeriod as e:
             exceptTemp=True
         try:
-            self.calEMA(highData,self.tempdic[idhighstr],position,period)
-        except FinanceMathFunctionPosBelowPeriod as e:
-            exceptTemp=True
-        try:
-            self.calEMA(lowData,self.tempdic[idlowstr],position,period)
+            highvalue=self.__cachedValue(self.__cachedEMA(highData, period), position)
+            lowvalue=self.__cachedValue(self.__cachedEMA(lowData, period), position)
         except FinanceMathFunctionPosBelowPeriod as e:
             exceptTemp=True
         if exceptTemp:
             raise FinanceMathFunctionPosBelowPeriod()
-        temph=self.tempdic[idhighstr][-1].value-outputMid[-1].value
-        templ=outputMid[-1].value-self.tempdic[idlowstr][-1].value
+        temph=highvalue-outputMid[-1].value
+        templ=outputMid[-1].value-lowvalue
         if temph>templ:
             offset=temph
         else:
@@ -387,29 +1032,20 @@ class FinanceMathFunction():
             raise FinanceMathFunctionPosBelowPeriod("position:{0:d}<(period:{1:d}-1).".format(position,period))
         if not isinstance(multiplier, float):
             raise FinanceMathFunctionError("{0:s} is not a float.".format(str(multiplier)))
-        idhighstr=str(id(highData)+id(outputHigh))
-        if idhighstr not in self.tempdic.keys():
-            self.tempdic[idhighstr]=financeData.FinanceLine()
-        idlowstr=str(id(lowData)+id(outputLow))
-        if idlowstr not in self.tempdic.keys():
-            self.tempdic[idlowstr]=financeData.FinanceLine()
         exceptTemp=False
         try:
             self.calHMA(closeData,outputMid,position,period)
         except FinanceMathFunctionPosBelowPeriod as e:
             exceptTemp=True
         try:
-            self.calHMA(highData,self.tempdic[idhighstr],position,period)
-        except FinanceMathFunctionPosBelowPeriod as e:
-            exceptTemp=True
-        try:
-            self.calHMA(lowData,self.tempdic[idlowstr],position,period)
+            highvalue=self.__cachedValue(self.__cachedHMA(highData, period), position)
+            lowvalue=self.__cachedValue(self.__cachedHMA(lowData, period), position)
         except FinanceMathFunctionPosBelowPeriod as e:
             exceptTemp=True
         if exceptTemp:
             raise FinanceMathFunctionPosBelowPeriod()
-        temph=self.tempdic[idhighstr][-1].value-outputMid[-1].value
-        templ=outputMid[-1].value-self.tempdic[idlowstr][-1].value
+        temph=highvalue-outputMid[-1].value
+        templ=outputMid[-1].value-lowvalue
         if temph>templ:
             offset=temph
         else:
@@ -418,6 +1054,64 @@ class FinanceMathFunction():
         outputHigh.add(pointtemp)
         pointtemp=financeData.FinancePoint(outputMid[-1].time, outputMid[-1].value-offset*multiplier)
         outputLow.add(pointtemp)
+    def calBandBase (self, closeData, highData, lowData, period, matype="hma"):
+        """caculate the multiplier independent part of a band
+
+        caculate the middle and offset lines of an EMA or HMA band. The
+        result is cached, so the bands of many multipliers of a period share
+        one computation.
+
+        Args:
+            closeData: close source data, FinanceLine class
+            highData: high source data, FinanceLine class
+            lowData: low source data, FinanceLine class
+            period: band period
+            matype: 'hma' or 'ema'
+
+        Returns:
+            return a FinanceBandBase
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkLines(closeData, highData, lowData)
+        self.__checkSeries(closeData, period)
+        if matype=="hma":
+            averagetemp=self.__cachedHMA
+        elif matype=="ema":
+            averagetemp=self.__cachedEMA
+        else:
+            raise FinanceMathFunctionError("{0:s} is not a band type.".format(str(matype)))
+        return self.cache.lookup((closeData, highData, lowData), "band", 
+                                 (matype, period), 
+                                 lambda: FinanceBandBase(closeData.timeArray,
+                                                         averagetemp(closeData, period),
+                                                         averagetemp(highData, period),
+                                                         averagetemp(lowData, period)))
+    def calBandSeries (self, closeData, highData, lowData, period, multiplier, matype="hma"):
+        """caculate EMA or HMA band of whole lines
+
+        caculate EMA or HMA band of whole lines. It gives the same values as
+        calEMABand or calHMABand for every position. The middle and offset
+        lines are cached per period, so a sequence of multipliers shares them.
+
+        Args:
+            closeData: close source data, FinanceLine class
+            highData: high source data, FinanceLine class
+            lowData: low source data, FinanceLine class
+            period: band period
+            multiplier: high/low mutiplier, or a sequence of mutipliers
+            matype: 'hma' or 'ema'
+
+        Returns:
+            return (middle, high, low) value arrays aligned to closeData.
+            They have one row per multiplier if multiplier is a sequence.
+            Warm-up values are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        return self.calBandBase(closeData, highData, lowData, period, matype).band(multiplier)
     def calATR (self, closeData, highData, lowData, outputATR, position, period, multiplier):
         """caculate average true range
 
@@ -459,199 +1153,1078 @@ class FinanceMathFunction():
             raise FinanceMathFunctionPosBelowPeriod("position:{0:d}<(period:{1:d}-1).".format(position,period))
         if not isinstance(multiplier, float):
             raise FinanceMathFunctionError("{0:s} is not a float.".format(str(multiplier)))
-        idAtrstr=str(id(closeData)+id(outputATR))
-        if idAtrstr not in self.tempdic.keys():
-            self.tempdic[idAtrstr]=financeData.FinanceLine()
-        if position>=0:
-            ptemp=position
-        else:
-            ptemp=len(closeData)+positio1n
-        if ptemp==0:
-            rtemp=math.fabs(highData[ptemp].value-lowData[ptemp].value)
-            self.tempdic[idAtrstr].add(FinancePoint(closeData[ptemp].time, rtemp*multiplier))
-        else:
-            rtemp=math.fabs(highData[ptemp].value-lowData[ptemp].value)
-            stemp=math.fabs(highData[ptemp].value-closeData[ptemp-1].value)
-            if stemp>rtemp:
-                rtemp=stemp
-            stemp=math.fabs(lowData[ptemp].value-closeData[ptemp-1].value)
-            if stemp>rtemp:
-                rtemp=stemp
-            self.tempdic[idAtrstr].add(financeData.FinancePoint(closeData[ptemp].time, rtemp*multiplier))
-        try:
-            self.calEMA(self.tempdic[idAtrstr],outputATR,ptemp-period+1,period)
-        except FinanceMathFunctionPosBelowPeriod:
-            pass
-    def getHighLowSignificantPoint (self, inputCheckHigh, inputCheckLow, inputHigh, inputLow, offset=2):
+        atrtemp=self.__cachedATR(closeData, highData, lowData, period, multiplier)
+        outputATR.add(financeData.FinancePoint(closeData[position].time, 
+                                               self.__cachedValue(atrtemp, position)))
+    def __cachedATR (self, closeData, highData, lowData, period, multiplier):
+        return self.cache.lookup((closeData, highData, lowData), "atr", 
+                                 (period, multiplier),
+                                 lambda: _atrArray(closeData.valueArray, highData.valueArray, 
+                                                   lowData.valueArray, period, multiplier))
+    def calTRSeries (self, closeData, highData, lowData):
+        """caculate true range of whole lines
+
+        caculate true range of whole lines. It is the largest of high-low,
+        |high-previous close| and |low-previous close|. The first bar has no
+        previous close and its true range is high-low.
+
+        Args:
+            closeData: close source data, FinanceLine class
+            highData: high source data, FinanceLine class
+            lowData: low source data, FinanceLine class
+
+        Returns:
+            return a FinanceLine which has the same time as closeData.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkLines(closeData, highData, lowData)
+        return self.__seriesLine(closeData, 
+                                 _trueRangeArray(closeData.valueArray, highData.valueArray, 
+                                                 lowData.valueArray))
+    def calATRSeries (self, closeData, highData, lowData, period=14, multiplier=1.0):
+        """caculate average true range of whole lines
+
+        caculate average true range of whole lines in one pass. It is the
+        EMA of true range*multiplier and gives the same values as calATR
+        for every position. FinanceATRState updates it bar by bar.
+
+        Args:
+            closeData: close source data, FinanceLine class
+            highData: high source data, FinanceLine class
+            lowData: low source data, FinanceLine class
+            period: ATR period, default 14
+            multiplier: range mutiplier, default 1.0
+
+        Returns:
+            return a FinanceLine which has the same time as closeData.
+            The values before position period-1 are NaN.
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        self.__checkLines(closeData, highData, lowData)
+        self.__checkSeries(closeData, period)
+        return self.__seriesLine(closeData, 
+                                 self.__cachedATR(closeData, highData, lowData, 
+                                                  period, float(multiplier)))
+    def __turnIndex (self, checkLine, size, greater):
+        """bars where checkLine turns, checkLine is aligned to the last bar"""
+        checktemp=checkLine.valueArray
+        shift=size-len(checktemp)
+        # bar i of the source is checktemp[i-shift], bars 1 to size-2 are checked
+        first=max(1, shift+1)
+        if size-2<first:
+            return numpy.empty(0, dtype=numpy.int64)
+        centre=checktemp[first-shift:size-1-shift]
+        before=checktemp[first-shift-1:size-2-shift]
+        after=checktemp[first-shift+1:size-shift]
+        return numpy.flatnonzero(~greater(before, centre) & greater(centre, after))+first
+    def getSignificantPointIndex (self, inputCheckHigh, inputCheckLow, inputHigh, inputLow, offset=2):
+        """get significant high and low point indexes
+
+        get significant high and low point indexes. A turn of inputCheckHigh
+        at bar i marks the first max of inputHigh in bars i-offset to i+1,
+        and a turn of inputCheckLow marks the first min of inputLow. The
+        bars are walked from the last one, and a new point replaces the
+        last point of the same kind when no opposite point is between them.
+        Window extremes come from the FinanceLine sparse tables, and only
+        the turn bars are walked, so it takes linear time.
+
+        Args:
+            inputCheckHigh: high turn check line, FinanceLine class. It is
+                          aligned to the last bar of inputHigh.
+            inputCheckLow: low turn check line, FinanceLine class
+            inputHigh: high value line, FinanceLine class
+            inputLow: low value line, FinanceLine class
+            offset: bars before a turn which are searched, must be >=0
+
+        Returns:
+            return (high index array, low index array), both are sorted
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        sizetemp=len(inputHigh)
+        if sizetemp!=len(inputLow):
+            raise FinanceMathFunctionError("high and low lines are not matched.")
+        if not isinstance(offset, int) or offset<0:
+            raise FinanceMathFunctionError("{0:s} is not a integer or <0.".format(str(offset)))
+        highvalue=inputHigh.valueArray
+        lowvalue=inputLow.valueArray
+        peaktemp=self.__turnIndex(inputCheckHigh, sizetemp, numpy.greater)
+        valetemp=self.__turnIndex(inputCheckLow, sizetemp, numpy.less)
+        maxdict={}
+        mindict={}
+        if len(peaktemp):
+            maxdict=dict(zip(peaktemp.tolist(), 
+                             inputHigh.getRangeMaxIndex(numpy.maximum(peaktemp-offset, 0),
+                                                        peaktemp+2).tolist()))
+        if len(valetemp):
+            mindict=dict(zip(valetemp.tolist(), 
+                             inputLow.getRangeMinIndex(numpy.maximum(valetemp-offset, 0),
+                                                       valetemp+2).tolist()))
         maxList=[]
         minList=[]
-        resultHigh=financeData.FinanceLine()
-        resultLow=financeData.FinanceLine()
-        hlen=len(inputHigh)
-        llen=len(inputLow)
-        if hlen!=llen:
-            raise Exception()
-        for icount in range(-2, 0-hlen, -1):
-            checkrange1=icount-offset
-            checkrange2=icount+1
-            try:
-                if inputCheckHigh[icount-1].value<=inputCheckHigh[icount].value>inputCheckHigh[icount+1].value:
-                    indextemp=inputHigh.getMaxValueIndex(checkrange1, checkrange2)
-                    if indextemp!=None:
-                        if len(maxList)==0:
-                            maxList.append(indextemp)
-                        elif indextemp in maxList:
-                            pass
-                        elif inputHigh[indextemp].value<inputHigh[indextemp-1].value:
-                            pass
-                        elif len(minList)==0 or maxList[-1]<minList[-1]:
-                            if inputHigh[indextemp].value>inputHigh[maxList[-1]].value:
-                                del maxList[-1]
-                                maxList.append(indextemp)
-                        elif maxList[-1]>=minList[-1]:
-                            maxList.append(indextemp)
-            except IndexError:
+        maxSet=set()
+        minSet=set()
+        for icount in sorted(set(maxdict)|set(mindict), reverse=True):
+            indextemp=maxdict.get(icount)
+            if indextemp is None or indextemp in maxSet:
                 pass
-            try:
-                if inputCheckLow[icount-1].value>=inputCheckLow[icount].value<inputCheckLow[icount+1].value:
-                    indextemp=inputLow.getMinValueIndex(checkrange1, checkrange2)
-                    if indextemp!=None:
-                        if not len(minList):
-                            minList.append(indextemp)
-                        elif indextemp in minList:
-                            pass
-                        elif inputLow[indextemp].value>inputLow[indextemp-1].value:
-                            pass
-                        elif len(maxList)==0 or maxList[-1]>minList[-1]:
-                            if inputLow[indextemp].value<inputLow[minList[-1]].value:
-                                del minList[-1]
-                                minList.append(indextemp)
-                        elif maxList[-1]<=minList[-1]:
-                            minList.append(indextemp)
-            except IndexError:
+            elif len(maxList)==0:
+                maxList.append(indextemp)
+                maxSet.add(indextemp)
+            elif highvalue[indextemp]<highvalue[indextemp-1]:
                 pass
-        for icount in range(len(inputHigh)):
-            if icount in maxList:
-                resultHigh.add(financeData.FinancePoint(inputHigh[icount].time, 
-                                        financeData.FinanceLine.peakValeDict["peak"]))
-            else:
-                resultHigh.add(financeData.FinancePoint(inputHigh[icount].time, 
-                                        financeData.FinanceLine.peakValeDict["slope"]))
-            if icount in minList:
-                resultLow.add(financeData.FinancePoint(inputHigh[icount].time, 
-                                        financeData.FinanceLine.peakValeDict["vale"]))
-            else:
-                resultLow.add(financeData.FinancePoint(inputHigh[icount].time, 
-                                        financeData.FinanceLine.peakValeDict["slope"]))
-        return (resultHigh, resultLow)
+            elif len(minList)==0 or maxList[-1]<minList[-1]:
+                if highvalue[indextemp]>highvalue[maxList[-1]]:
+                    maxSet.discard(maxList.pop())
+                    maxList.append(indextemp)
+                    maxSet.add(indextemp)
+            elif maxList[-1]>=minList[-1]:
+                maxList.append(indextemp)
+                maxSet.add(indextemp)
+            indextemp=mindict.get(icount)
+            if indextemp is None or indextemp in minSet:
+                pass
+            elif len(minList)==0:
+                minList.append(indextemp)
+                minSet.add(indextemp)
+            elif lowvalue[indextemp]>lowvalue[indextemp-1]:
+                pass
+            elif len(maxList)==0 or maxList[-1]>minList[-1]:
+                if lowvalue[indextemp]<lowvalue[minList[-1]]:
+                    minSet.discard(minList.pop())
+                    minList.append(indextemp)
+                    minSet.add(indextemp)
+            elif maxList[-1]<=minList[-1]:
+                minList.append(indextemp)
+                minSet.add(indextemp)
+        return (numpy.array(sorted(maxSet), dtype=numpy.int64),
+                numpy.array(sorted(minSet), dtype=numpy.int64))
+    def getHighLowSignificantPoint (self, inputCheckHigh, inputCheckLow, inputHigh, inputLow, offset=2):
+        """get significant high and low points as flag lines
+
+        get significant high and low points as flag lines. It is the
+        FinanceLine view of getSignificantPointIndex.
+
+        Args:
+            inputCheckHigh: high turn check line, FinanceLine class
+            inputCheckLow: low turn check line, FinanceLine class
+            inputHigh: high value line, FinanceLine class
+            inputLow: low value line, FinanceLine class
+            offset: bars before a turn which are searched
+
+        Returns:
+            return (high line, low line). They have the time of inputHigh,
+            and the values are FinanceLine.peakValeDict "peak" or "slope",
+            and "vale" or "slope".
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        (maxIndex, minIndex)=self.getSignificantPointIndex(inputCheckHigh, inputCheckLow, 
+                                                           inputHigh, inputLow, offset)
+        resultHigh=numpy.full(len(inputHigh), financeData.FinanceLine.peakValeDict["slope"])
+        resultHigh[maxIndex]=financeData.FinanceLine.peakValeDict["peak"]
+        resultLow=numpy.full(len(inputHigh), financeData.FinanceLine.peakValeDict["slope"])
+        resultLow[minIndex]=financeData.FinanceLine.peakValeDict["vale"]
+        return (financeData.FinanceLine.fromArray(inputHigh.timeArray, resultHigh),
+                financeData.FinanceLine.fromArray(inputHigh.timeArray, resultLow))
     def calHMABandWeight (self, inputClose, inputHigh, inputLow, highSigPoint, lowSigPoint, period, multiplier):
-        result=0.0
-        wcount=0
-        midtemp=financeData.FinanceLine()
-        hightemp=financeData.FinanceLine()
-        lowtemp=financeData.FinanceLine()
-        for icount in range(len(inputClose)):
-            try:
-                self.calHMABand(inputClose,
-                       inputHigh, 
-                       inputLow,
-                       midtemp, hightemp, lowtemp, 
-                       icount, period, multiplier)
-            except FinanceMathFunctionPosBelowPeriod:
-                        continue
-        for icount in range(-1, -1-len(midtemp), -1):
-            if highSigPoint[icount].value==financeData.FinanceLine.peakValeDict["peak"]:  #high
-                if inputHigh[icount].value<midtemp[icount].value:
-                    continue
-                diff=math.fabs(inputHigh[icount].value-hightemp[icount].value)
-                result+=diff
-                wcount+=1
-            if lowSigPoint[icount].value==financeData.FinanceLine.peakValeDict["vale"]:  #low
-                if inputLow[icount].value>midtemp[icount].value:
-                    continue
-                diff=math.fabs(lowtemp[icount].value-inputLow[icount].value)
-                result+=diff
-                wcount+=1
-        if not wcount:
-            return result
-        return (result/wcount)
+        basetemp=self.calBandBase(inputClose, inputHigh, inputLow, period, "hma")
+        (midtemp, hightemp, lowtemp)=(values[basetemp.start:] for values in basetemp.band(multiplier))
+        highvalue=inputHigh.valueArray[basetemp.start:]
+        lowvalue=inputLow.valueArray[basetemp.start:]
+        peaktemp=highSigPoint.valueArray[basetemp.start:]==financeData.FinanceLine.peakValeDict["peak"]
+        valetemp=lowSigPoint.valueArray[basetemp.start:]==financeData.FinanceLine.peakValeDict["vale"]
+        # a peak under the middle line also skips the vale of its bar
+        peakskip=peaktemp&(highvalue<midtemp)
+        peaktemp&=~peakskip
+        valetemp&=~peakskip&~(lowvalue>midtemp)
+        # distances are summed from the last bar backwards, peak before vale
+        difftemp=numpy.column_stack((numpy.abs(highvalue-hightemp), 
+                                     numpy.abs(lowtemp-lowvalue)))[::-1].ravel()
+        difftemp=difftemp[numpy.column_stack((peaktemp, valetemp))[::-1].ravel()]
+        if len(difftemp)==0:
+            return 0.0
+        return float(numpy.cumsum(difftemp)[-1])/len(difftemp)
     def calKKMacdWeight (self, inputData, periodHMA, periodEMA, offset=2):
-        result=0.0
-        hamtemp=financeData.FinanceLine()
-        ematemp=financeData.FinanceLine()
-        difftemp=financeData.FinanceLine()
-        for icount in range(len(inputData)):
-            try:
-                self.calKKMACD(inputData, hmatemp, ematemp, difftemp, icount, periodHMA, periodEMA)
-            except FinanceMathFunctionPosBelowPeriod:
-                continue
-        ihDiff=len(inputData)-len(hamtemp)
-        ieDiff=len(inputData)-len(ematemp)
-        idDiff=len(inputData)-len(difftemp)
-        peaktemp=[]
-        valetemp=[]
-        difftemp.peakLine=difftemp.findPeak()
-        difftemp.valeLine=difftemp.findVale()
-        for icount in range(0-len(difftemp), -1):
-            if difftemp.peakLine[icount].value==financeData.FinanceLine.peakValeDict["slope"]:
-                continue
-            elif difftemp.peakLine[icount].value==financeData.FinanceLine.peakValeDict["peak"]:
-                indextemp=inputData.getMaxValueIndex(icount-offset, icount)
-                peaktemp.append([icount, indextemp, inputData[indextemp].value])
-        return result
+        """caculate how late the KK MACD turns after price extremes
+
+        caculate how late the KK MACD turns after price extremes. Every
+        peak of the (HMA-EMA) line is matched to the max price of the bars
+        from offset bars before the peak to the peak, and every vale to the
+        min price. The weight is the mean price distance from the matched
+        extremes to the prices at the turns, lower is better.
+
+        Args:
+            inputData: input source data, FinanceLine class
+            periodHMA: HMA moving average period
+            periodEMA: EMA moving average period
+            offset: bars before a turn which are searched
+
+        Returns:
+            return the weight, or inf if the (HMA-EMA) line has no turn
+
+        Raise:
+            FinanceMathFunctionError: An error occured caculating.
+        """
+        if not isinstance(offset, int) or offset<0:
+            raise FinanceMathFunctionError("{0:s} is not a integer or <0.".format(str(offset)))
+        difftemp=self.calKKMACDSeries(inputData, periodHMA, periodEMA)
+        validtemp=numpy.flatnonzero(~numpy.isnan(difftemp.valueArray))
+        if len(validtemp)==0:
+            return math.inf
+        start=int(validtemp[0])
+        peaktemp=difftemp[start:].findPeakIndex()+start
+        valetemp=difftemp[start:].findValeIndex()+start
+        if len(peaktemp)+len(valetemp)==0:
+            return math.inf
+        pricetemp=inputData.valueArray
+        hightemp=inputData.getRangeMaxIndex(numpy.maximum(peaktemp-offset, 0), peaktemp+1)
+        lowtemp=inputData.getRangeMinIndex(numpy.maximum(valetemp-offset, 0), valetemp+1)
+        result=(numpy.sum(pricetemp[hightemp]-pricetemp[peaktemp])
+                +numpy.sum(pricetemp[valetemp]-pricetemp[lowtemp]))
+        return float(result)/(len(peaktemp)+len(valetemp))
     def calRatio (self, closeData, highData, lowData, period, multiplier, matype='hma'):
-        midtemp=financeData.FinanceLine()
-        hightemp=financeData.FinanceLine()
-        lowtemp=financeData.FinanceLine()
-        for icount in range(len(closeData)):
-            try:
-                if matype=='hma':
-                    self.calHMABand(closeData, highData, lowData, midtemp, hightemp, lowtemp, icount, period, multiplier)
-                elif matype=='ema':
-                    self.calEMABand(closeData, highData, lowData, midtemp, hightemp, lowtemp, icount, period, multiplier)
-                else:
-                    raise Exception()
-            except FinanceMathFunctionPosBelowPeriod:
-                pass
-        outCount=[]
-        inCount=[]
-        outBoundCnt=[]
-        for icount in range(-1,0-len(hightemp),-1):
-            if (closeData[icount].value>=midtemp[icount].value
-                and highData[icount].value>=hightemp[icount].value):
-                outCount.append(closeData[icount])
-                if lowData[icount].value>=hightemp[icount].value:
-                    outBoundCnt.append(closeData[icount])
-            elif (closeData[icount].value<midtemp[icount].value
-                and lowData[icount].value<=lowtemp[icount].value):
-                outCount.append(closeData[icount])
-                if highData[icount].value<=hightemp[icount].value:
-                    outBoundCnt.append(closeData[icount])
-            else:
-                inCount.append(closeData[icount])
-        if len(outCount)==0:
+        basetemp=self.calBandBase(closeData, highData, lowData, period, matype)
+        (midtemp, hightemp, lowtemp)=basetemp.band(multiplier)
+        # the bars after the first band bar are counted
+        start=basetemp.start+1
+        (midtemp, hightemp, lowtemp)=(values[start:] for values in (midtemp, hightemp, lowtemp))
+        closevalue=closeData.valueArray[start:]
+        highvalue=highData.valueArray[start:]
+        lowvalue=lowData.valueArray[start:]
+        uptemp=(closevalue>=midtemp)&(highvalue>=hightemp)
+        downtemp=~uptemp&(closevalue<midtemp)&(lowvalue<=lowtemp)
+        outCount=int(numpy.count_nonzero(uptemp|downtemp))
+        outBoundCnt=int(numpy.count_nonzero((uptemp&(lowvalue>=hightemp))
+                                            |(downtemp&(highvalue<=hightemp))))
+        if outCount==0:
             return (0, 0)
-        return (len(outCount)/(len(inCount)+len(outCount)) ,len(outBoundCnt)/len(outCount))
+        return (outCount/len(closevalue), outBoundCnt/outCount)
+
+def _stateValue (value):
+    """convert a state attribute into a JSON value"""
+    if isinstance(value, FinanceIndicatorState):
+        return {"state":value.getState()}
+    if isinstance(value, collections.deque):
+        return {"deque":list(value), "maxlen":value.maxlen}
+    return value
+def _stateAttribute (value):
+    """convert a JSON value back into a state attribute"""
+    if isinstance(value, dict) and "state" in value:
+        return FinanceIndicatorState.fromState(value["state"])
+    if isinstance(value, dict) and "deque" in value:
+        return collections.deque(value["deque"], maxlen=value["maxlen"])
+    return value
+
+class FinanceIndicatorState(abc.ABC):
+    """This class is an abstract base of streaming indicator states.
+    
+    A state keeps the running sums and the last bars an indicator needs, so
+    update() takes one new bar and returns the new value in constant time.
+    It returns None while the indicator is warming up, where the
+    FinanceMathFunction functions raise FinanceMathFunctionPosBelowPeriod.
+    The state can be saved to a JSON file and restored.
+
+    Attributes:
+        inputNames: FinanceDataSet column names which update() takes
+        lastTime: epoch time of the last bar which is updated by updateSet,
+                None before the first update.
+    """
+    inputNames=("close",)
+    stateVersion=1
+    def __init__ (self):
+        self.lastTime=None
+    @abc.abstractmethod
+    def update (self, *values):
+        """update the indicator with one new bar
+
+        update the indicator with one new bar
+
+        Args:
+            values: one value for every name in inputNames
+
+        Returns:
+            return the new indicator value, None in warm-up bars
+
+        Raise:
+            None
+        """
+    def updateSet (self, idataset):
+        """update the indicator with the new bars of a dataset
+
+        update the indicator with the rows of a time sorted FinanceDataSet
+        which are later than lastTime.
+
+        Args:
+            idataset: FinanceDataSet class
+
+        Returns:
+            return a list of indicator values of the new rows
+
+        Raise:
+            FinanceMathFunctionError: idataset is not a FinanceDataSet.
+        """
+        if not isinstance(idataset, financeData.FinanceDataSet):
+            raise FinanceMathFunctionError("{0:s} is not a FinanceDataSet class.".format(str(idataset)))
+        timetemp=idataset.timeArray
+        if self.lastTime is None:
+            start=0
+        else:
+            start=int(numpy.searchsorted(timetemp, self.lastTime, side="right"))
+        columns=[idataset.getColumnArray(name).tolist() for name in self.inputNames]
+        result=[]
+        for icount in range(start, len(timetemp)):
+            result.append(self.update(*[column[icount] for column in columns]))
+        if start<len(timetemp):
+            self.lastTime=int(timetemp[-1])
+        return result
+    def getState (self):
+        """get a snapshot of the state
+
+        get a snapshot of the state
+
+        Args:
+            None
+
+        Returns:
+            return a dict which can be saved by json
+
+        Raise:
+            None
+        """
+        return {"class":type(self).__name__,
+                "version":FinanceIndicatorState.stateVersion,
+                "attributes":{name:_stateValue(value) 
+                              for (name, value) in self.__dict__.items()}}
+    @staticmethod
+    def fromState (state):
+        """create a state from a snapshot
+
+        create a state from a snapshot which is returned by getState
+
+        Args:
+            state: a snapshot dict
+
+        Returns:
+            return an indicator state
+
+        Raise:
+            FinanceMathStateWrong: the snapshot is not a indicator state.
+        """
+        try:
+            classtemp=globals().get(state["class"])
+            if (not isinstance(classtemp, type) or 
+                not issubclass(classtemp, FinanceIndicatorState) or
+                state["version"]!=FinanceIndicatorState.stateVersion):
+                raise FinanceMathStateWrong("{0:s} is not a indicator state.".format(str(state["class"])))
+            result=classtemp.__new__(classtemp)
+            for (name, value) in state["attributes"].items():
+                setattr(result, name, _stateAttribute(value))
+        except (KeyError, TypeError, AttributeError) as e:
+            raise FinanceMathStateWrong("indicator state is wrong. {0:s}".format(str(e)))
+        return result
+    def saveState (self, stateFile):
+        """save the state to a JSON file
+
+        save the state to a JSON file. The file is replaced atomically.
+
+        Args:
+            stateFile: state file name
+
+        Returns:
+            None
+
+        Raise:
+            None
+        """
+        financeData._writeAtomic(stateFile, False,
+                                 lambda fileW: json.dump(self.getState(), fileW))
+    @staticmethod
+    def loadState (stateFile):
+        """load a state from a JSON file
+
+        load a state from a JSON file which is saved by saveState
+
+        Args:
+            stateFile: state file name
+
+        Returns:
+            return an indicator state
+
+        Raise:
+            FinanceMathStateWrong: the file is not a indicator state.
+        """
+        with open(stateFile, 'r') as stateFileR:
+            try:
+                statetemp=json.load(stateFileR)
+            except ValueError as e:
+                raise FinanceMathStateWrong("{0:s} is not a indicator state file. {1:s}".format(stateFile, str(e)))
+        return FinanceIndicatorState.fromState(statetemp)
+
+class FinanceMAState(FinanceIndicatorState):
+    """This class is a streaming moving average, same as calMA.
+    
+    This class is a streaming moving average, same as calMA.
+    The running sum is summed again from the window every period bars, so
+    rounding error does not accumulate.
+
+    Attributes:
+        period: moving average period
+    """
+    def __init__ (self, period=5):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.window=collections.deque(maxlen=period)
+        self.total=0.0
+        self.refresh=0
+    def update (self, value):
+        if len(self.window)==self.period:
+            self.total-=self.window[0]
+        self.window.append(float(value))
+        self.total+=self.window[-1]
+        self.refresh+=1
+        if self.refresh>=self.period:
+            self.total=math.fsum(self.window)
+            self.refresh=0
+        if len(self.window)<self.period:
+            return None
+        return self.total/self.period
+
+class FinanceWMAState(FinanceIndicatorState):
+    """This class is a streaming weighted moving average, same as calWMA.
+    
+    This class is a streaming weighted moving average, same as calWMA.
+    The weighted sum moves by period*value-sum of the previous window.
+
+    Attributes:
+        period: moving average period
+    """
+    def __init__ (self, period=5):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.window=collections.deque(maxlen=period)
+        self.total=0.0
+        self.weighted=0.0
+        self.refresh=0
+    def __resum (self):
+        self.total=math.fsum(self.window)
+        self.weighted=math.fsum(value*(icount+1) 
+                                for (icount, value) in enumerate(self.window))
+        self.refresh=0
+    def update (self, value):
+        value=float(value)
+        if len(self.window)<self.period:
+            self.window.append(value)
+            if len(self.window)<self.period:
+                return None
+            self.__resum()
+        else:
+            self.weighted+=self.period*value-self.total
+            self.total+=value-self.window[0]
+            self.window.append(value)
+            self.refresh+=1
+            if self.refresh>=self.period:
+                self.__resum()
+        return self.weighted/(self.period*(self.period+1)/2.0)
+
+class FinanceEMAState(FinanceIndicatorState):
+    """This class is a streaming exponential moving average, same as calEMA.
+    
+    This class is a streaming exponential moving average, same as calEMA.
+    The period window sum moves by sum*ratio+value-oldest*ratio**period.
+
+    Attributes:
+        period: moving average period
+    """
+    def __init__ (self, period=5):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.window=collections.deque(maxlen=period)
+        self.total=0.0
+        self.refresh=0
+    def __resum (self):
+        ratio=1.0-2.0/(self.period+1)
+        self.total=math.fsum(value*ratio**(self.period-1-icount)
+                             for (icount, value) in enumerate(self.window))
+        self.refresh=0
+    def update (self, value):
+        value=float(value)
+        ratio=1.0-2.0/(self.period+1)
+        if len(self.window)<self.period:
+            self.window.append(value)
+            if len(self.window)<self.period:
+                return None
+            self.__resum()
+        else:
+            self.total=self.total*ratio+value-self.window[0]*ratio**self.period
+            self.window.append(value)
+            self.refresh+=1
+            if self.refresh>=self.period:
+                self.__resum()
+        return self.total*(1.0-ratio)/(1.0-ratio**self.period)
+
+class FinanceHMAState(FinanceIndicatorState):
+    """This class is a streaming hull moving average, same as calHMA.
+    
+    This class is a streaming hull moving average, same as calHMA.
+
+    Attributes:
+        period: moving average period
+    """
+    def __init__ (self, period=5):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.full=FinanceWMAState(period)
+        self.half=FinanceWMAState(int(period/2))
+        self.root=FinanceWMAState(int(math.sqrt(period)))
+    def update (self, value):
+        fulltemp=self.full.update(value)
+        halftemp=self.half.update(value)
+        if fulltemp is None:
+            return None
+        return self.root.update(halftemp*2-fulltemp)
+
+class FinanceATRState(FinanceIndicatorState):
+    """This class is a streaming average true range.
+    
+    This class is a streaming average true range. It is the EMA of true
+    range*multiplier. The true range of the first bar is high-low.
+
+    Attributes:
+        period: ATR period
+        multiplier: range mutiplier
+    """
+    inputNames=("close", "high", "low")
+    def __init__ (self, period=14, multiplier=1.0):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.multiplier=float(multiplier)
+        self.average=FinanceEMAState(period)
+        self.lastClose=None
+    def update (self, close, high, low):
+        rangetemp=math.fabs(high-low)
+        if self.lastClose is not None:
+            rangetemp=max(rangetemp, math.fabs(high-self.lastClose),
+                          math.fabs(low-self.lastClose))
+        self.lastClose=float(close)
+        return self.average.update(rangetemp*self.multiplier)
+
+class FinanceEMABandState(FinanceIndicatorState):
+    """This class is a streaming EMA band, same as calEMABand.
+    
+    This class is a streaming EMA band, same as calEMABand.
+    update() returns a (middle, high, low) tuple.
+
+    Attributes:
+        period: band period
+        multiplier: high/low mutiplier
+    """
+    inputNames=("close", "high", "low")
+    averageClass=FinanceEMAState
+    def __init__ (self, period, multiplier):
+        _checkPeriod(period)
+        super().__init__()
+        self.period=period
+        self.multiplier=float(multiplier)
+        self.middle=self.averageClass(period)
+        self.high=self.averageClass(period)
+        self.low=self.averageClass(period)
+    def update (self, close, high, low):
+        midtemp=self.middle.update(close)
+        hightemp=self.high.update(high)
+        lowtemp=self.low.update(low)
+        if midtemp is None or hightemp is None or lowtemp is None:
+            return None
+        offset=max(hightemp-midtemp, midtemp-lowtemp)
+        return (midtemp, midtemp+offset*self.multiplier, 
+                midtemp-offset*self.multiplier)
+
+class FinanceHMABandState(FinanceEMABandState):
+    """This class is a streaming HMA band, same as calHMABand.
+    
+    This class is a streaming HMA band, same as calHMABand.
+    update() returns a (middle, high, low) tuple.
+
+    Attributes:
+        period: band period
+        multiplier: high/low mutiplier
+    """
+    averageClass=FinanceHMAState
+
+class FinanceKKMACDState(FinanceIndicatorState):
+    """This class is a streaming KK MACD difference, same as calKKMACD.
+    
+    This class is a streaming KK MACD difference, same as calKKMACD.
+    update() returns HMA-EMA.
+
+    Attributes:
+        periodHMA: HMA moving average period
+        periodEMA: EMA moving average period
+    """
+    def __init__ (self, periodHMA, periodEMA):
+        _checkPeriod(periodHMA)
+        _checkPeriod(periodEMA)
+        super().__init__()
+        self.periodHMA=periodHMA
+        self.periodEMA=periodEMA
+        self.hma=FinanceHMAState(periodHMA)
+        self.ema=FinanceEMAState(periodEMA)
+    def update (self, value):
+        hmatemp=self.hma.update(value)
+        ematemp=self.ema.update(value)
+        if hmatemp is None or ematemp is None:
+            return None
+        return hmatemp-ematemp
+
+# Objectives bind the dataset lines once, a range query table is kept by
+# its FinanceLine and a new line view would build it again.
+def _ratioObjective (fobj, idataset, period, multipliers, matype="hma"):
+    (closeline, highline, lowline)=(idataset.closeValue, idataset.highValue, 
+                                    idataset.lowValue)
+    return [fobj.calRatio(closeline, highline, lowline, period, multiplier, 
+                          matype=matype)
+            for multiplier in multipliers]
+def _ratioHmaPeriods (periods, matype="hma"):
+    if matype!="hma":
+        return ([], [], [])
+    return (periods, periods, periods)
+def _hmaBandWeightPeriod (period):
+    return int(FinanceMathFunction.cjGRation*period)
+def _hmaBandWeightObjective (fobj, idataset, period, multipliers):
+    (closeline, highline, lowline)=(idataset.closeValue, idataset.highValue, 
+                                    idataset.lowValue)
+    # significant points depend on the period only
+    hmaperiod=_hmaBandWeightPeriod(period)
+    warmup=hmaperiod+int(math.sqrt(hmaperiod))-2
+    (peaktemp, valetemp)=fobj.getHighLowSignificantPoint(
+        fobj.calHMASeries(highline, hmaperiod)[warmup:],
+        fobj.calHMASeries(lowline, hmaperiod)[warmup:],
+        highline, lowline, int(hmaperiod*FinanceMathFunction.cjGRation))
+    return [fobj.calHMABandWeight(closeline, highline, lowline, peaktemp, 
+                                  valetemp, period, multiplier)
+            for multiplier in multipliers]
+def _hmaBandWeightHmaPeriods (periods):
+    hmaperiods=periods+[_hmaBandWeightPeriod(period) for period in periods]
+    return (periods, hmaperiods, hmaperiods)
+def _kkMacdWeightObjective (fobj, idataset, period, multipliers, offset=2):
+    # multipliers are EMA periods, the HMA of period is cached for all of them
+    closeline=idataset.closeValue
+    return [fobj.calKKMacdWeight(closeline, period, int(multiplier), offset)
+            for multiplier in multipliers]
+def _kkMacdWeightHmaPeriods (periods, offset=2):
+    return (periods, [], [])
+# FinanceDataSet of a sweep worker process, it is set once by _sweepInit
+_sweepSet=None
+def _sweepInit (idataset):
+    global _sweepSet
+    _sweepSet=idataset
+def _sweepTask (task):
+    return _sweepPeriods(_sweepSet, *task)
+def _sweepPeriods (idataset, objective, periods, multipliers, options):
+    """evaluate a chunk of periods and all multipliers"""
+    fobj=FinanceMathFunction()
+    lines=(idataset.closeValue, idataset.highValue, idataset.lowValue)
+    # the HMAs of the chunk are cached from one multi-period pass per line,
+    # dataset line views share their cache keys
+    for (line, hmaperiods) in zip(lines, sweepHmaPeriodDict[objective](periods, **options)):
+        hmaperiods=sorted(set(period for period in hmaperiods if period>=4))
+        if hmaperiods:
+            fobj.calMultiPeriodSeries(line, hmaperiods, "hma")
+    result=[]
+    for period in periods:
+        valuetemp=sweepObjectiveDict[objective](fobj, idataset, period, 
+                                                multipliers, **options)
+        result.extend((value, period, multiplier) 
+                      for (value, multiplier) in zip(valuetemp, multipliers))
+    return result
+sweepObjectiveDict={"ratio":_ratioObjective,
+                    "hmaBandWeight":_hmaBandWeightObjective,
+                    "kkMacdWeight":_kkMacdWeightObjective}
+# HMA periods of the close, high and low lines which a chunk of periods uses
+sweepHmaPeriodDict={"ratio":_ratioHmaPeriods,
+                    "hmaBandWeight":_hmaBandWeightHmaPeriods,
+                    "kkMacdWeight":_kkMacdWeightHmaPeriods}
+# max periods of a sweep task, it bounds the cached HMA rows of a task
+sweepChunkSize=16
+
+def iterSweep (idataset, objective, periods, multipliers, processes=None, 
+               **options):
+    """evaluate an objective for a period and multiplier grid
+
+    evaluate an objective for a period and multiplier grid. One task is a
+    chunk of periods with all multipliers. The HMA lines of a chunk are
+    computed in one calMultiPeriodSeries pass per line, and the work which
+    depends on the period only is done once. The tasks run in a process
+    pool, and idataset is sent to every worker process once by the pool
+    initializer instead of with every task.
+
+    Args:
+        idataset: FinanceDataSet class
+        objective: objective name in sweepObjectiveDict.
+                 "ratio" returns calRatio (ratio, out of bound ratio) and
+                 takes option matype. "hmaBandWeight" returns
+                 calHMABandWeight of the HMA significant points.
+                 "kkMacdWeight" returns calKKMacdWeight, periods are HMA
+                 periods, multipliers are EMA periods and it takes option
+                 offset.
+        periods: a sequence of periods
+        multipliers: a sequence of multipliers
+        processes: worker process count. None for the CPU count, 1 to run
+                 in this process.
+        options: other objective arguments
+
+    Returns:
+        yield (value, period, multiplier) of every grid point as the tasks
+        are finished
+
+    Raise:
+        FinanceMathFunctionError: An error occured sweeping.
+    """
+    if not isinstance(idataset, financeData.FinanceDataSet):
+        raise FinanceMathFunctionError("{0:s} is not a FinanceDataSet class.".format(str(idataset)))
+    if objective not in sweepObjectiveDict:
+        raise FinanceMathFunctionError("{0:s} is not a sweep objective.".format(str(objective)))
+    multipliers=[float(multiplier) for multiplier in multipliers]
+    periods=sorted(set(int(period) for period in periods))
+    # a few chunks per worker keep the pool balanced
+    workers=1 if processes==1 else (processes or os.cpu_count() or 1)
+    chunksize=max(1, min(sweepChunkSize, -(-len(periods)//(4*workers))))
+    tasks=[(objective, periods[icount:icount+chunksize], multipliers, options) 
+           for icount in range(0, len(periods), chunksize)]
+    if processes==1:
+        for task in tasks:
+            yield from _sweepPeriods(idataset, *task)
+        return
+    with multiprocessing.Pool(processes, initializer=_sweepInit, 
+                              initargs=(idataset,)) as pool:
+        for result in pool.imap_unordered(_sweepTask, tasks):
+            yield from result
+def sweep (idataset, objective, periods, multipliers, processes=None, 
+           **options):
+    """evaluate an objective for a grid and sort the results
+
+    evaluate an objective for a grid and sort the results by value. A tuple
+    value is sorted by its first item. See iterSweep.
+
+    Returns:
+        return a list of (value, period, multiplier), the smallest value
+        first
+    """
+    return sorted(iterSweep(idataset, objective, periods, multipliers, 
+                            processes, **options),
+                  key=lambda item: (item[0][0] if isinstance(item[0], tuple) 
+                                    else item[0], item[1], item[2]))
 
 class financeMathTest(unittest.TestCase):
     def setUp (self):
         self.sampleSet=financeData.FinanceDataSet()
         self.sampleSet.getDataFromFile('./history/test.csv')
-    def xxtest_Atr (self):
+    def test_Atr (self):
         fobj=FinanceMathFunction()
+        (closeline, highline, lowline)=(self.sampleSet.closeValue, 
+                                        self.sampleSet.highValue, self.sampleSet.lowValue)
         atrline=financeData.FinanceLine()
         for icount in range(len(self.sampleSet)):
             try:
-                fobj.calATR(self.sampleSet.closeValue,self.sampleSet.highValue,self.sampleSet.lowValue,atrline,icount,16, 2.0)
+                fobj.calATR(closeline,highline,lowline,atrline,icount,16, 2.0)
             except FinanceMathFunctionPosBelowPeriod:
                 continue
-        for item in atrline:
-            print('atr %s %f' %(str(item.time), item.value))
-        self.assertTrue(True)
+        self.assertEqual(len(atrline), len(closeline)-15)
+        self.assertEqual(atrline[0].time, closeline[15].time)
+        rangetemp=fobj.calTRSeries(closeline, highline, lowline).valueArray
+        self.assertEqual(rangetemp[0], highline[0].value-lowline[0].value)
+        self.assertEqual(rangetemp[1], max(highline[1].value-lowline[1].value, 
+                                           abs(highline[1].value-closeline[0].value),
+                                           abs(lowline[1].value-closeline[0].value)))
+        emaline=fobj.calEMASeries(financeData.FinanceLine.fromArray(closeline.timeArray, 
+                                                                    rangetemp*2.0), 16)
+        seriestemp=fobj.calATRSeries(closeline, highline, lowline, 16, 2.0)
+        self.assertTrue(numpy.array_equal(seriestemp.valueArray, emaline.valueArray, equal_nan=True))
+        self.assertTrue(numpy.array_equal(seriestemp.valueArray[15:], atrline.valueArray))
+        statetemp=FinanceATRState(16, 2.0)
+        for (icount, value) in enumerate(statetemp.updateSet(self.sampleSet)):
+            if value is not None:
+                self.assertAlmostEqual(value, seriestemp[icount].value, delta=1e-8)
+        with self.assertRaises(FinanceMathFunctionError):
+            fobj.calATRSeries(closeline, highline, lowline[:-1], 16)
+    def test_maSeries (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        for name in ("MA", "WMA", "EMA"):
+            for period in (2, 5, 17):
+                seriestemp=getattr(fobj, "cal"+name+"Series")(closeline, period)
+                linetemp=financeData.FinanceLine()
+                for icount in range(len(closeline)):
+                    try:
+                        getattr(fobj, "cal"+name)(closeline, linetemp, icount, period)
+                    except FinanceMathFunctionPosBelowPeriod:
+                        continue
+                self.assertEqual(len(seriestemp), len(closeline))
+                self.assertTrue(numpy.isnan(seriestemp.valueArray[:period-1]).all())
+                self.assertTrue(numpy.array_equal(seriestemp.timeArray, closeline.timeArray))
+                self.assertTrue(numpy.allclose(seriestemp.valueArray[period-1:], 
+                                               linetemp.valueArray, rtol=0, atol=1e-8))
+        self.assertTrue(numpy.isnan(fobj.calMASeries(closeline[:3], 5).valueArray).all())
+        with self.assertRaises(FinanceMathFunctionError):
+            fobj.calEMASeries(closeline, 1)
+    def test_indicatorState (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        for (stateClass, function) in ((FinanceMAState, fobj.calMA), 
+                                       (FinanceWMAState, fobj.calWMA), 
+                                       (FinanceEMAState, fobj.calEMA), 
+                                       (FinanceHMAState, fobj.calHMA)):
+            statetemp=stateClass(9)
+            resulttemp=[value for value in statetemp.updateSet(self.sampleSet) if value is not None]
+            linetemp=financeData.FinanceLine()
+            for icount in range(len(closeline)):
+                try:
+                    function(closeline, linetemp, icount, 9)
+                except FinanceMathFunctionPosBelowPeriod:
+                    continue
+            self.assertTrue(numpy.allclose(resulttemp, linetemp.valueArray, rtol=0, atol=1e-8))
+        highline=self.sampleSet.highValue
+        lowline=self.sampleSet.lowValue
+        (midtemp, hightemp, lowtemp)=(financeData.FinanceLine(), financeData.FinanceLine(), 
+                                      financeData.FinanceLine())
+        for icount in range(len(closeline)):
+            try:
+                fobj.calHMABand(closeline, highline, lowline, midtemp, hightemp, lowtemp, icount, 16, 1.5)
+            except FinanceMathFunctionPosBelowPeriod:
+                continue
+        resulttemp=[value for value in FinanceHMABandState(16, 1.5).updateSet(self.sampleSet) if value is not None]
+        self.assertTrue(numpy.allclose(resulttemp, numpy.column_stack((midtemp.valueArray, 
+                                                                     hightemp.valueArray, 
+                                                                     lowtemp.valueArray)),
+                                       rtol=0, atol=1e-8))
+    def test_indicatorStateBase (self):
+        with self.assertRaises(TypeError):
+            FinanceIndicatorState()
+        statetemp=FinanceMAState(5).getState()
+        statetemp["class"]="FinanceIndicatorState"
+        with self.assertRaises(FinanceMathStateWrong):
+            FinanceIndicatorState.fromState(statetemp)
+    def test_indicatorStateFile (self):
+        fulltemp=FinanceKKMACDState(16, 25)
+        resulttemp=fulltemp.updateSet(self.sampleSet)
+        statetemp=FinanceKKMACDState(16, 25)
+        firsttemp=statetemp.updateSet(self.sampleSet[:200])
+        (handle, statefile)=tempfile.mkstemp(suffix=".json")
+        os.close(handle)
+        try:
+            statetemp.saveState(statefile)
+            statetemp=FinanceIndicatorState.loadState(statefile)
+        finally:
+            os.remove(statefile)
+        self.assertTrue(isinstance(statetemp, FinanceKKMACDState))
+        self.assertEqual(firsttemp+statetemp.updateSet(self.sampleSet), resulttemp)
+        self.assertEqual(statetemp.updateSet(self.sampleSet), [])
+        with self.assertRaises(FinanceMathStateWrong):
+            FinanceIndicatorState.fromState({"class":"FinanceMathFunction", "version":1, "attributes":{}})
+    def test_indicatorCache (self):
+        cachetemp=FinanceIndicatorCache(maxEntries=3)
+        linetemp=financeData.FinanceLine(self.sampleSet.closeValue)
+        self.assertEqual(self.sampleSet.closeValue.cacheKey, self.sampleSet.closeValue.cacheKey)
+        self.assertNotEqual(self.sampleSet.closeValue.cacheKey, self.sampleSet.highValue.cacheKey)
+        self.assertNotEqual(linetemp.cacheKey, self.sampleSet.closeValue.cacheKey)
+        for icount in range(3):
+            cachetemp.lookup(self.sampleSet.closeValue, "ma", 5, 
+                             lambda: _maArray(self.sampleSet.closeValue.valueArray, 5))
+        self.assertEqual((cachetemp.hits, cachetemp.misses), (2, 1))
+        cachetemp.lookup(linetemp, "ma", 5, lambda: _maArray(linetemp.valueArray, 5))
+        linetemp.add(financeData.FinancePoint(datetime.datetime(2030, 1, 1), 1.0))
+        cachetemp.lookup(linetemp, "ma", 5, lambda: _maArray(linetemp.valueArray, 5))
+        self.assertEqual((len(cachetemp), cachetemp.misses), (2, 3))
+        for period in (6, 7, 8):
+            cachetemp.lookup(linetemp, "ma", period, lambda: _maArray(linetemp.valueArray, period))
+        self.assertEqual(len(cachetemp), 3)
+        cachetemp.invalidate(linetemp)
+        self.assertEqual((len(cachetemp), cachetemp.bytes), (0, 0))
+        fobj=FinanceMathFunction()
+        hmatemp=financeData.FinanceLine()
+        for icount in range(len(self.sampleSet)):
+            try:
+                fobj.calHMA(self.sampleSet.closeValue, hmatemp, icount, 16)
+            except FinanceMathFunctionPosBelowPeriod:
+                continue
+        self.assertEqual((fobj.cache.misses, len(fobj.cache)), (1, 1))
+        self.assertEqual(len(hmatemp), len(self.sampleSet)-16-int(math.sqrt(16))+2)
+    def test_indicatorDiskCache (self):
+        fobj=FinanceMathFunction()
+        cachedir=tempfile.mkdtemp()
+        cachetemp=FinanceIndicatorDiskCache(cachedir)
+        def hmaLookup (idataset):
+            return cachetemp.lookup((idataset.closeValue,), "hma", (16,),
+                                    lambda closeline: fobj.calHMASeries(closeline, 16).valueArray,
+                                    16+int(math.sqrt(16))-1, label="test")
+        try:
+            fulltemp=fobj.calHMASeries(self.sampleSet.closeValue, 16).valueArray
+            headtemp=hmaLookup(self.sampleSet[:400])
+            self.assertTrue(numpy.array_equal(headtemp, fulltemp[:400], equal_nan=True))
+            resulttemp=hmaLookup(self.sampleSet)
+            self.assertTrue(numpy.allclose(resulttemp, fulltemp, rtol=0, atol=1e-8, equal_nan=True))
+            self.assertTrue(numpy.array_equal(hmaLookup(self.sampleSet), resulttemp, equal_nan=True))
+            self.assertEqual((cachetemp.misses, cachetemp.extends, cachetemp.hits), (1, 1, 1))
+            changedtemp=financeData.FinanceDataSet(self.sampleSet)
+            del changedtemp[200]
+            hmaLookup(changedtemp)
+            self.assertEqual((cachetemp.misses, len(os.listdir(cachedir))), (2, 1))
+        finally:
+            shutil.rmtree(cachedir)
+    def test_multiPeriod (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        periods=[4, 9, 16, 25, 40, 97]
+        for matype in ("ma", "wma", "ema", "hma"):
+            resulttemp=fobj.calMultiPeriodSeries(closeline, periods, matype)
+            self.assertEqual(resulttemp.shape, (len(periods), len(closeline)))
+            for (icount, period) in enumerate(periods):
+                linetemp=getattr(FinanceMathFunction(), "cal"+matype.upper()+"Series")(closeline, period)
+                self.assertTrue(numpy.allclose(resulttemp[icount], linetemp.valueArray, 
+                                               rtol=0, atol=1e-8, equal_nan=True))
+        with self.assertRaises(FinanceMathFunctionError):
+            fobj.calMultiPeriodSeries(closeline, periods, "sma")
+        fobj=FinanceMathFunction()
+        resulttemp=fobj.calMultiPeriodSeries(closeline, periods, "hma")
+        self.assertFalse(resulttemp.flags.writeable)
+        self.assertTrue(numpy.array_equal(fobj.calHMASeries(closeline, 16).valueArray, 
+                                          resulttemp[2], equal_nan=True))
+        self.assertEqual((fobj.cache.hits, fobj.cache.misses), (1, len(periods)))
+    def test_hmaEngine (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        for period in (4, 16, 50):
+            seriestemp=fobj.calHMASeries(closeline, period).valueArray
+            engine=FinanceHMAEngine(period)
+            for sizetemp in (0, 3, period, period+1, 200, 201, len(closeline)):
+                resulttemp=engine.extend(closeline.valueArray[:sizetemp])
+                self.assertEqual(len(engine), sizetemp)
+                self.assertTrue(numpy.allclose(resulttemp, seriestemp[:sizetemp], 
+                                               rtol=0, atol=1e-8, equal_nan=True))
+            self.assertFalse(resulttemp.flags.writeable)
+            self.assertTrue(numpy.array_equal(engine.compute(closeline.valueArray), 
+                                              seriestemp, equal_nan=True))
+            with self.assertRaises(FinanceMathFunctionError):
+                engine.extend(closeline.valueArray[:10])
+        with self.assertRaises(FinanceMathFunctionError):
+            FinanceHMAEngine(3)
+    def test_sweep (self):
+        settemp=self.sampleSet[-200:]
+        resulttemp=sweep(settemp, "ratio", [16, 20, 16], [1.0, 2.0], processes=1)
+        self.assertEqual(len(resulttemp), 4)
+        ratiotemp=[item[0][0] for item in resulttemp]
+        self.assertEqual(ratiotemp, sorted(ratiotemp))
+        fobj=FinanceMathFunction()
+        self.assertEqual([item for item in resulttemp if item[1:]==(20, 2.0)][0][0],
+                         fobj.calRatio(settemp.closeValue, settemp.highValue, settemp.lowValue, 20, 2.0))
+        self.assertEqual(sweep(settemp, "ratio", [16, 20], [1.0, 2.0], processes=2), resulttemp)
+        resulttemp=sweep(settemp, "hmaBandWeight", range(10, 50, 3), [1.0, 2.0], processes=1)
+        self.assertEqual(len(resulttemp), 28)
+        valuetemp=[item for item in resulttemp if item[1:]==(28, 2.0)][0][0]
+        self.assertAlmostEqual(valuetemp, _hmaBandWeightObjective(fobj, settemp, 28, [2.0])[0], 
+                               delta=1e-8)
+        with self.assertRaises(FinanceMathFunctionError):
+            sweep(settemp, "unknown", [16], [1.0], processes=1)
+    def test_bandBase (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        highline=self.sampleSet.highValue
+        lowline=self.sampleSet.lowValue
+        for (matype, function) in (("hma", fobj.calHMABand), ("ema", fobj.calEMABand)):
+            for multiplier in (0.5, 1.5, 3.0):
+                basetemp=fobj.calBandBase(closeline, highline, lowline, 16, matype)
+                lines=(financeData.FinanceLine(), financeData.FinanceLine(), 
+                       financeData.FinanceLine())
+                for icount in range(len(closeline)):
+                    try:
+                        function(closeline, highline, lowline, *lines, icount, 16, multiplier)
+                    except FinanceMathFunctionPosBelowPeriod:
+                        continue
+                self.assertEqual(len(closeline)-basetemp.start, len(lines[0]))
+                for (values, line) in zip(basetemp.band(multiplier), lines):
+                    self.assertTrue(numpy.allclose(values[basetemp.start:], line.valueArray, 
+                                                   rtol=0, atol=1e-8))
+        self.assertEqual(fobj.cache.misses, 8)
+        self.assertEqual(fobj.cache.bytes, 6*len(closeline)*8+2*len(closeline)*8)
+        with self.assertRaises(FinanceMathFunctionError):
+            fobj.calBandBase(closeline, highline, lowline, 16, "wma")
+    def test_bandSeries (self):
+        fobj=FinanceMathFunction()
+        lines=(self.sampleSet.closeValue, self.sampleSet.highValue, self.sampleSet.lowValue)
+        multipliers=[0.5, 1.5, 3.0]
+        (midtemp, hightemp, lowtemp)=fobj.calBandSeries(*lines, 16, multipliers, "ema")
+        self.assertEqual(midtemp.shape, (3, len(lines[0])))
+        self.assertEqual(hightemp.shape, midtemp.shape)
+        for (icount, multiplier) in enumerate(multipliers):
+            for (values, row) in zip(fobj.calBandSeries(*lines, 16, multiplier, "ema"), 
+                                     (midtemp, hightemp, lowtemp)):
+                self.assertTrue(numpy.array_equal(values, row[icount], equal_nan=True))
+        self.assertEqual(fobj.cache.misses, 4)
+    def test_kkMacdWeight (self):
+        fobj=FinanceMathFunction()
+        closeline=self.sampleSet.closeValue
+        difftemp=fobj.calKKMACDSeries(closeline, 16, 9)
+        linetemp=(financeData.FinanceLine(), financeData.FinanceLine(), financeData.FinanceLine())
+        for icount in range(len(closeline)):
+            try:
+                fobj.calKKMACD(closeline, *linetemp, icount, 16, 9)
+            except FinanceMathFunctionPosBelowPeriod:
+                continue
+        self.assertTrue(numpy.allclose(difftemp.valueArray[-len(linetemp[2]):], 
+                                       linetemp[2].valueArray, rtol=0, atol=1e-8))
+        distance=[]
+        for icount in range(len(difftemp)-len(linetemp[2])+1, len(difftemp)-1):
+            (prev, value, post)=difftemp.valueArray[icount-1:icount+2]
+            pricetemp=closeline.valueArray[max(icount-3, 0):icount+1]
+            if value>=prev and value>post:
+                distance.append(pricetemp.max()-pricetemp[-1])
+            elif value<=prev and value<post:
+                distance.append(pricetemp[-1]-pricetemp.min())
+        self.assertAlmostEqual(fobj.calKKMacdWeight(closeline, 16, 9, 3), 
+                               sum(distance)/len(distance), delta=1e-9)
+        self.assertEqual(fobj.calKKMacdWeight(closeline[:10], 16, 9), math.inf)
+        resulttemp=sweep(self.sampleSet[-200:], "kkMacdWeight", [16], [9, 13], processes=1)
+        self.assertEqual(len(resulttemp), 2)
+    def test_significantPoint (self):
+        fobj=FinanceMathFunction()
+        timetemp=numpy.arange(11)*86400000000
+        highline=financeData.FinanceLine.fromArray(timetemp, [1, 3, 1, 1, 5, 1, 1, 2, 1, 4, 2])
+        lowline=financeData.FinanceLine.fromArray(timetemp, [0, 2, 0, -1, 4, 0, -2, 1, 0, 3, 1])
+        (maxIndex, minIndex)=fobj.getSignificantPointIndex(highline, lowline, highline, lowline, 1)
+        self.assertEqual(maxIndex.tolist(), [1, 4, 7, 9])
+        self.assertEqual(minIndex.tolist(), [3, 6, 8])
+        (peakline, valeline)=fobj.getHighLowSignificantPoint(highline, lowline, highline, lowline, 1)
+        self.assertEqual(numpy.flatnonzero(peakline.valueArray==financeData.FinanceLine.peakValeDict["peak"]).tolist(), 
+                         maxIndex.tolist())
+        self.assertEqual(numpy.flatnonzero(valeline.valueArray==financeData.FinanceLine.peakValeDict["vale"]).tolist(), 
+                         minIndex.tolist())
+        self.assertTrue(numpy.array_equal(valeline.timeArray, timetemp))
+        hmahigh=fobj.calHMASeries(self.sampleSet.highValue, 9)[9+3-2:]
+        hmalow=fobj.calHMASeries(self.sampleSet.lowValue, 9)[9+3-2:]
+        (maxIndex, minIndex)=fobj.getSignificantPointIndex(hmahigh, hmalow, self.sampleSet.highValue, 
+                                                           self.sampleSet.lowValue, 5)
+        self.assertTrue(len(maxIndex)>0 and len(minIndex)>0)
+        self.assertTrue((numpy.diff(maxIndex)>0).all() and (numpy.diff(minIndex)>0).all())
     def test_ratio (self):
         fobj=FinanceMathFunction()
-        print(fobj.calRatio(self.sampleSet.closeValue,self.sampleSet.highValue,self.sampleSet.lowValue,10,1.0))
-        self.assertTrue(True)
+        lines=(self.sampleSet.closeValue, self.sampleSet.highValue, self.sampleSet.lowValue)
+        (ratio, boundRatio)=fobj.calRatio(*lines,10,1.0)
+        self.assertTrue(0<ratio<1 and 0<=boundRatio<=1)
+        self.assertEqual(fobj.calRatio(*lines,10,0.0)[0], 1.0)
+        self.assertEqual(fobj.calRatio(*lines,10,1000.0), (0, 0))
+        (peakline, valeline)=fobj.getHighLowSignificantPoint(*lines[1:], *lines[1:], 2)
+        self.assertGreater(fobj.calHMABandWeight(*lines, peakline, valeline, 10, 1.0), 0.0)
 if __name__=="__main__":
     unittest.main()
     
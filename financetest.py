@@ -80,32 +80,16 @@ if __name__=="__main__":
     #    print(item.time,item.value)
 
     fobj=fm.FinanceMathFunction()
-    midline=fd.FinanceLine()
-    hiline=fd.FinanceLine()
-    loline=fd.FinanceLine()
-    for icount in range(len(line1)):
-        try:
-            fobj.calHMABand(line1,line2,line3,midline,hiline,loline,icount,
-                            int(30*fm.FinanceMathFunction.goldRatio),fm.FinanceMathFunction.goldRatio*3)
-        except fm.FinanceMathFunctionPosBelowPeriod:
-            continue
-    plotObj.addLine(midline)
-    plotObj.addLine(hiline)
-    plotObj.addLine(loline)
+    basetemp=fobj.calBandBase(line1,line2,line3,int(30*fm.FinanceMathFunction.goldRatio))
+    for values in basetemp.band(fm.FinanceMathFunction.goldRatio*3):
+        plotObj.addLine(fd.FinanceLine.fromArray(line1.timeArray[basetemp.start:],
+                                                 values[basetemp.start:]))
 
     fobj=fm.FinanceMathFunction()
-    midline=fd.FinanceLine()
-    hiline=fd.FinanceLine()
-    loline=fd.FinanceLine()
-    for icount in range(len(line1)):
-        try:
-            fobj.calHMABand(line1,line2,line3,midline,hiline,loline,icount,
-                            int(90*fm.FinanceMathFunction.goldRatio),fm.FinanceMathFunction.goldRatio*10)
-        except fm.FinanceMathFunctionPosBelowPeriod:
-            continue
-    plotObj.addLine(midline)
-    plotObj.addLine(hiline)
-    plotObj.addLine(loline)
+    basetemp=fobj.calBandBase(line1,line2,line3,int(90*fm.FinanceMathFunction.goldRatio))
+    for values in basetemp.band(fm.FinanceMathFunction.goldRatio*10):
+        plotObj.addLine(fd.FinanceLine.fromArray(line1.timeArray[basetemp.start:],
+                                                 values[basetemp.start:]))
 
     plotObj.show()
     
@@ -9,6 +9,8 @@ import sys
 import configparser
 import traceback
 import datetime
+import math
+import numpy
 from PyQt4 import QtGui
 from PyQt4 import QtCore
 from PyQt4 import uic
@@ -97,10 +99,13 @@ class QtDraw(QtGui.QMainWindow):
     posW=8
     stickW=6
     dotW=6
+    candleMinW=2
+    indicatorCacheDir="./cache"
     def __init__ (self, parent=None, inputFile=None):
         #self.candleData=financeData.FinanceDataSet()
         #self.drawItems=[]
         self.clearData()
+        self.indicatorCache=financeMath.FinanceIndicatorDiskCache(QtDraw.indicatorCacheDir)
         ###
         self.scaleXOffset=0
         self.scaleYRation=1.0
@@ -261,24 +266,21 @@ class QtDraw(QtGui.QMainWindow):
                 if self.actionCrossLine.isChecked()==True:
                     ipos=self.scene2pos(pos.x())
                     if ipos<len(self.candleData):
+                        rowtemp=self.candleData.getRow(ipos)
                         self.toLog("{0:s} Start:{1:.2f}  High:{2:.2f} Low:{3:.2f} "
                                    "End:{4:.2f} Vol:{5:.2f}"
                                    .format(datetime.datetime
-                                           .strftime(
-                                               self.candleData.openValue[ipos].time
-                                               , '%Y%m%d%H%M%S'),
-                                           self.candleData.openValue[ipos].value,
-                                           self.candleData.highValue[ipos].value,
-                                           self.candleData.lowValue[ipos].value,
-                                           self.candleData.closeValue[ipos].value,
-                                           self.candleData.volumeValue[ipos].value)
+                                           .strftime(rowtemp[0], '%Y%m%d%H%M%S'),
+                                           *rowtemp[1:])
                                    )
-                    iverpos=ipos-len(self.candleData)
-                    if iverpos<0:
+                    if ipos<len(self.candleData):
+                        timetemp=self.candleData.getRow(ipos)[0]
                         for item in self.drawItems:
-                            if iverpos+len(item.line)<0:
+                            try:
+                                indextemp=item.line.indexOfTime(timetemp)
+                            except financeData.FinanceDataOutOfIndex:
                                 continue
-                            self.toLog("{0:s} : {1:f}".format(item.name, item.line[iverpos].value))
+                            self.toLog("{0:s} : {1:f}".format(item.name, item.line[indextemp].value))
                                 
                 if self.actionDrawLine.isChecked()==True:
                     self.drawTempPoint.append(pos)
@@ -376,19 +378,14 @@ class QtDraw(QtGui.QMainWindow):
         minvalue=None
         start=int(istart)
         stop=int(istop)
-        if len(self.candleData)!=0:
-            for linetemp in (self.candleData.openValue[start:stop],
-                self.candleData.highValue[start:stop],
-                self.candleData.lowValue[start:stop],
-                self.candleData.closeValue[start:stop]):
-                if len(linetemp)==0:
-                    continue
-                vtemp=max(linetemp).value
-                if maxvalue==None or maxvalue<vtemp:
-                    maxvalue=vtemp
-                vtemp=min(linetemp).value
-                if minvalue==None or minvalue>vtemp:
-                    minvalue=vtemp
+        (starttemp, stoptemp, steptemp)=(slice(start, stop)
+                                         .indices(len(self.candleData)))
+        if starttemp<stoptemp:
+            # high and low are checked to be the highest and lowest values
+            maxvalue=self.candleData.getRow(self.candleData.getRangeMaxIndex(
+                "high", starttemp, stoptemp))[2]
+            minvalue=self.candleData.getRow(self.candleData.getRangeMinIndex(
+                "low", starttemp, stoptemp))[3]
         itemcount=1
         for ditem in self.drawItems:
             if ditem.drawtype==DrawItem.drawtypeDict["peakvale"]:
@@ -408,14 +405,15 @@ class QtDraw(QtGui.QMainWindow):
                     stoptemp=stop-lendif
                     if stoptemp<0:
                         continue
-                linetemp=item[starttemp:stoptemp]
+                (starttemp, stoptemp, steptemp)=(slice(starttemp, stoptemp)
+                                                 .indices(len(item)))
                 #linetemp=item[start:stop]
-                if len(linetemp)==0:
+                if starttemp>=stoptemp:
                     continue
-                vtemp=max(linetemp).value
+                vtemp=item[item.getRangeMaxIndex(starttemp, stoptemp)].value
                 if maxvalue==None or maxvalue<vtemp:
                     maxvalue=vtemp
-                vtemp=min(linetemp).value
+                vtemp=item[item.getRangeMinIndex(starttemp, stoptemp)].value
                 if minvalue==None or minvalue>vtemp:
                     minvalue=vtemp
         #wtemp=QtDraw.dotW
@@ -454,6 +452,7 @@ class QtDraw(QtGui.QMainWindow):
     def clearScene (self):
         self.ui.graphicsView.scene().clear()
         self.scaleXOffset=0
+        self.candleItems=[]
     def clearData (self):
         if "candleData" in self.__dict__.keys():
             del self.candleData
@@ -461,6 +460,8 @@ class QtDraw(QtGui.QMainWindow):
         if "drawItems" in self.__dict__.keys():
             del self.drawItems
         self.drawItems=[]
+        self.candleItems=[]
+        self.candleLevel=0
     def setScene (self):
         viewVisibleBar=self.realViewRect.width()/QtDraw.posW
         datawidth=(len(self.candleData)+1)*QtDraw.posW
@@ -489,6 +490,7 @@ class QtDraw(QtGui.QMainWindow):
             #realBarNum=wtemp/QtDraw.posW
             if self.scaleXOffset!=0:
                 realBarNum+=self.scaleXOffset
+            self.updateCandleLevel(realBarNum)
             posl=posr-realBarNum
             if posl<0:
                 posl=0
@@ -527,22 +529,13 @@ class QtDraw(QtGui.QMainWindow):
         if ipos!=self.lastPos:
             self.lastPos=ipos
             if ipos<len(self.candleData):
+                rowtemp=self.candleData.getRow(ipos)
                 self.labelValue.setText("{0:s} Start:{1:.2f}  High:{2:.2f} "
                                         "Low:{3:.2f} End:{4:.2f} Vol:{5:.2f}"
                                         .format(datetime.datetime
-                                                .strftime(self.candleData
-                                                          .openValue[ipos].time, 
+                                                .strftime(rowtemp[0],
                                                           '%Y%m%d%H%M%S'),
-                                                self.candleData.openValue[ipos]
-                                                .value,
-                                                self.candleData.highValue[ipos]
-                                                .value,
-                                                self.candleData.lowValue[ipos]
-                                                .value,
-                                                self.candleData.closeValue[ipos]
-                                                .value,
-                                                self.candleData.volumeValue[ipos]
-                                                .value))
+                                                *rowtemp[1:]))
             else:
                 self.labelValue.setText("")
         self.clearCrossLine()
@@ -611,6 +604,30 @@ class QtDraw(QtGui.QMainWindow):
         self.candleData.getDataFromFile(fileName)
         self.unit=0.01
         self.toLog(str(self.candleData))
+    def windowLine (self, srcset, values):
+        """make a line of the candle window from full history values
+
+        make a line of the candle window from full history values. The
+        NaN warm-up values are not in the line.
+
+        Args:
+            srcset: the FinanceDataSet which candleData is sliced from
+            values: a value array which has the same length as srcset
+
+        Returns:
+            return a financeData.FinanceLine
+
+        Raise:
+            None
+        """
+        start=len(srcset)-len(self.candleData)
+        validtemp=numpy.flatnonzero(~numpy.isnan(values[start:]))
+        if len(validtemp):
+            start+=int(validtemp[0])
+        else:
+            start=len(srcset)
+        return financeData.FinanceLine.fromArray(srcset.timeArray[start:],
+                                                 values[start:])
     def loadFromIni (self, fileName):
         """load data and config from ini file
 
@@ -631,7 +648,20 @@ class QtDraw(QtGui.QMainWindow):
         config.read(fileName)
         ###
         srcset=financeData.FinanceDataSet()
-        srcset.getDataFromFile(config["common"]["file"])
+        filetemp=config["common"]["file"]
+        if not financeData.isBinaryDataFile(filetemp):
+            # prefer the binary history file written by dataCenter
+            binarytemp=os.path.splitext(filetemp)[0]+".fds"
+            if financeData.isBinaryDataFile(binarytemp):
+                filetemp=binarytemp
+        if financeData.isBinaryDataFile(filetemp):
+            srcset.mapBinaryFile(filetemp)
+        else:
+            srcset.getDataFromFile(filetemp)
+        if "timetype" in config["common"]:
+            srcset=srcset.resample(config["common"]["timetype"],
+                                   int(config["common"].get("timeperiod",
+                                                            "1")))
         try:
             periodtemp=int(config["common"]["period"])
         except KeyError:
@@ -692,25 +722,17 @@ class QtDraw(QtGui.QMainWindow):
             if (indicator=="ma" or indicator=="wma" or indicator=="ema" or 
                 indicator=="hma"):
                 fobj=financeMath.FinanceMathFunction()
-                linetemp=financeData.FinanceLine()
-                for icount in range(len(self.candleData.closeValue)):
-                    try:
-                        if indicator=="ma":
-                            fobj.calMA(self.candleData.closeValue, linetemp, 
-                                       icount, period1)
-                        elif indicator=="wma":
-                            fobj.calWMA(self.candleData.closeValue, linetemp, 
-                                        icount, period1)
-                        elif indicator=="ema":
-                            fobj.calEMA(self.candleData.closeValue, linetemp, 
-                                        icount, period1)
-                        elif indicator=="hma":
-                            fobj.calHMA(self.candleData.closeValue, linetemp, 
-                                        icount, period1)
-                        else:
-                            continue
-                    except financeMath.FinanceMathFunctionPosBelowPeriod:
-                        continue
+                functemp={"ma":fobj.calMASeries, "wma":fobj.calWMASeries, 
+                          "ema":fobj.calEMASeries, "hma":fobj.calHMASeries}[indicator]
+                lookback=period1
+                if indicator=="hma":
+                    lookback+=int(math.sqrt(period1))-1
+                # indicators are computed on the full history and cached
+                valuetemp=self.indicatorCache.lookup(
+                    (srcset.closeValue,), indicator, (period1,), 
+                    lambda closeline: functemp(closeline, period1).valueArray, 
+                    lookback, label=filetemp)
+                linetemp=self.windowLine(srcset, valuetemp)
                 self.drawItems.append(DrawItem(linetemp,
                                                name=sectionname[10:-1],
                                                pen=QtGui.QPen(pen1color,
@@ -748,25 +770,24 @@ class QtDraw(QtGui.QMainWindow):
                                       )
             elif indicator=="emaband" or indicator=="hmaband":
                 fobj=financeMath.FinanceMathFunction()
-                midtemp=financeData.FinanceLine()
-                hightemp=financeData.FinanceLine()
-                lowtemp=financeData.FinanceLine()
-                for icount in range(len(self.candleData.closeValue)):
-                    try:
-                        if indicator=="emaband":
-                            fobj.calEMABand(self.candleData.closeValue, 
-                                            self.candleData.highValue, 
-                                            self.candleData.lowValue,
-                                            midtemp, hightemp, lowtemp, 
-                                            icount, period1, multiplier1)
-                        elif indicator=="hmaband":
-                            fobj.calHMABand(self.candleData.closeValue, 
-                                            self.candleData.highValue, 
-                                            self.candleData.lowValue,
-                                            midtemp, hightemp, lowtemp, 
-                                            icount, period1, multiplier1)
-                    except financeMath.FinanceMathFunctionPosBelowPeriod:
-                        continue
+                if indicator=="emaband":
+                    functemp=fobj.calEMASeries
+                    lookback=period1
+                else:
+                    functemp=fobj.calHMASeries
+                    lookback=period1+int(math.sqrt(period1))-1
+                # close, high and low averages do not depend on multiplier
+                averagetemp=self.indicatorCache.lookup(
+                    (srcset.closeValue, srcset.highValue, srcset.lowValue),
+                    indicator, (period1,),
+                    lambda *lines: numpy.vstack([functemp(line, period1).valueArray
+                                                 for line in lines]),
+                    lookback, label=filetemp)
+                (midtemp, hightemp, lowtemp)=financeMath.FinanceBandBase(
+                    srcset.timeArray, *averagetemp).band(multiplier1)
+                midtemp=self.windowLine(srcset, midtemp)
+                hightemp=self.windowLine(srcset, hightemp)
+                lowtemp=self.windowLine(srcset, lowtemp)
                 self.drawItems.append(DrawItem(hightemp,
                                                name=sectionname[10:-1]+"_h",
                                                pen=QtGui.QPen(pen2color,
@@ -796,12 +817,14 @@ class QtDraw(QtGui.QMainWindow):
                                       )
             elif indicator=="atr":
                 fobj=financeMath.FinanceMathFunction()
-                atrtemp=financeData.FinanceLine()
-                for icount in range(len(self.candleData.closeValue)):
-                    try:
-                        fobj.calATR(self.candleData.closeValue,self.candleData.highValue,self.candleData.lowValue,atrtemp,icount,period1, multiplier1)
-                    except financeMath.FinanceMathFunctionPosBelowPeriod:
-                        continue
+                # one more bar of lookback for the previous close
+                valuetemp=self.indicatorCache.lookup(
+                    (srcset.closeValue, srcset.highValue, srcset.lowValue), 
+                    indicator, (period1, multiplier1), 
+                    lambda closeline, highline, lowline: fobj.calATRSeries(
+                        closeline, highline, lowline, period1, multiplier1).valueArray, 
+                    period1+1, label=filetemp)
+                atrtemp=self.windowLine(srcset, valuetemp)
                 self.drawItems.append(DrawItem(atrtemp,
                                                name=sectionname[10:-1],
                                                drawType="value"
@@ -830,15 +853,18 @@ class QtDraw(QtGui.QMainWindow):
         self.toLog('b:%f %f' %(btemp[0],btemp[1]))
         htemp=abs(self.value2Scene(wtemp*self.scaleYRation))
         otemp=abs(self.value2Scene(wtemp/2*self.scaleYRation))
+        highList=self.candleData.getColumnArray("high").tolist()
+        lowList=self.candleData.getColumnArray("low").tolist()
         for item in self.drawItems:
             if item.drawtype==DrawItem.drawtypeDict["line"]:
+                valueList=item.line.getValueList()
                 for icount in range(len(item.line)-1):
                     #self.toLog("{0:d} {1:f}".format(icount,item.line[-1-icount].value))
                     self.drawItemTemp.append(self.ui.graphicsView.scene()
                                              .addLine(self.pos2Scene(fulllen-1-icount),
-                                             self.value2Scene(item.line[-1-icount].value),
+                                             self.value2Scene(valueList[-1-icount]),
                                              self.pos2Scene(fulllen-2-icount),
-                                             self.value2Scene(item.line[-2-icount].value),
+                                             self.value2Scene(valueList[-2-icount]),
                                              pen=item.pen))
             elif item.drawtype==DrawItem.drawtypeDict["peakvale"]:
                 if "peakLine" not in item.line.__dict__.keys():
@@ -848,13 +874,14 @@ class QtDraw(QtGui.QMainWindow):
                 #if "drawItemTemp" in self.__dict__.keys():
                     #for item in self.drawItemTemp:
                     #    self.ui.graphicsView.scene().removeItem(item)
-                for revcount in range(-1, 1-len(item.line.peakLine), -1):
-                    ihigh=self.candleData[revcount].highValue[0].value
-                    ilow=self.candleData[revcount].lowValue[0].value
-                    if (item.line.peakLine[revcount].value==financeData
+                peakList=item.line.peakLine.getValueList()
+                for revcount in range(-1, 1-len(peakList), -1):
+                    ihigh=highList[revcount]
+                    ilow=lowList[revcount]
+                    if (peakList[revcount]==financeData
                         .FinanceLine.peakValeDict["slope"]):
                         continue
-                    if (item.line.peakLine[revcount].value==financeData
+                    if (peakList[revcount]==financeData
                         .FinanceLine.peakValeDict["peak"]):
                         (self.drawItemTemp
                             .append(self.ui.graphicsView.scene()
@@ -864,13 +891,14 @@ class QtDraw(QtGui.QMainWindow):
                                                 htemp,
                                                 brush=QtGui.QBrush(QtGui
                                                                    .QColor(255,0,0)))))
-                for revcount in range(-1, 1-len(item.line.valeLine), -1):
-                    ihigh=self.candleData[revcount].highValue[0].value
-                    ilow=self.candleData[revcount].lowValue[0].value
-                    if (item.line.valeLine[revcount].value==financeData
+                valeList=item.line.valeLine.getValueList()
+                for revcount in range(-1, 1-len(valeList), -1):
+                    ihigh=highList[revcount]
+                    ilow=lowList[revcount]
+                    if (valeList[revcount]==financeData
                         .FinanceLine.peakValeDict["slope"]):
                         continue
-                    if (item.line.valeLine[revcount].value==financeData
+                    if (valeList[revcount]==financeData
                         .FinanceLine.peakValeDict["vale"]):
                         (self.drawItemTemp
                             .append(self.ui.graphicsView.scene()
@@ -880,37 +908,74 @@ class QtDraw(QtGui.QMainWindow):
                                                 htemp,
                                                 brush=QtGui
                                                 .QBrush(QtGui.QColor(255,0,0)))))
-    def drawCandle (self):
+    def updateCandleLevel (self, barNum):
+        """redraw candles if the visible bar count needs another level
+
+        redraw candles if the visible bar count needs another pyramid level.
+        A candle is at least QtDraw.candleMinW pixels wide.
+
+        Args:
+            barNum: visible bar count
+
+        Returns:
+            None
+
+        Raise:
+            None
+        """
+        maxtemp=int(self.realViewRect.width()/QtDraw.candleMinW)
+        leveltemp=(financeData.FinanceDataSet
+                   .getPyramidLevelFor(int(barNum), maxtemp))
+        if leveltemp!=self.candleLevel:
+            self.drawCandle(leveltemp)
+    def drawCandle (self, level=0):
         try:
+            for item in self.candleItems:
+                self.ui.graphicsView.scene().removeItem(item)
+            self.candleItems=[]
+            self.candleLevel=level
             if len(self.candleData)==0:
                 return
-            for icount in range(len(self.candleData)):
-                istart=self.candleData[icount].openValue[0].value
-                ihigh=self.candleData[icount].highValue[0].value
-                ilow=self.candleData[icount].lowValue[0].value
-                iend=self.candleData[icount].closeValue[0].value
-                self.ui.graphicsView.scene().addLine(self.pos2Scene(icount),
-                                                     self.value2Scene(ihigh),
-                                                     self.pos2Scene(icount),
-                                                     self.value2Scene(ilow))
+            # one candle of level merges spantemp bars
+            settemp=self.candleData.getPyramidLevel(level)
+            spantemp=2**level
+            widthtemp=QtDraw.stickW+(spantemp-1)*QtDraw.posW
+            openList=settemp.getColumnArray("open").tolist()
+            highList=settemp.getColumnArray("high").tolist()
+            lowList=settemp.getColumnArray("low").tolist()
+            closeList=settemp.getColumnArray("close").tolist()
+            for icount in range(len(settemp)):
+                istart=openList[icount]
+                ihigh=highList[icount]
+                ilow=lowList[icount]
+                iend=closeList[icount]
+                postemp=(icount*spantemp+
+                         min((icount+1)*spantemp, len(self.candleData))-1)/2
+                self.candleItems.append(self.ui.graphicsView.scene().addLine(
+                                            self.pos2Scene(postemp),
+                                            self.value2Scene(ihigh),
+                                            self.pos2Scene(postemp),
+                                            self.value2Scene(ilow)))
                 if istart<=iend:
                     brushtemp=QtGui.QBrush(QtGui.QColor(255,0,0))
-                    self.ui.graphicsView.scene().addRect(self.pos2Scene(icount)
-                                                         -QtDraw.stickW/2,
-                                                         self.value2Scene(iend),
-                                                         QtDraw.stickW,
-                                                         self.value2Scene(istart)
-                                                         -self.value2Scene(iend),
-                                                         brush=brushtemp)
+                    self.candleItems.append(self.ui.graphicsView.scene().addRect(
+                                                self.pos2Scene(postemp)
+                                                -widthtemp/2,
+                                                self.value2Scene(iend),
+                                                widthtemp,
+                                                self.value2Scene(istart)
+                                                -self.value2Scene(iend),
+                                                brush=brushtemp))
                 else:
                     brushtemp=QtGui.QBrush(QtGui.QColor(0,255,0))
-                    self.ui.graphicsView.scene().addRect(self.pos2Scene(icount)
-                                                         -QtDraw.stickW/2,
-                                                         self.value2Scene(istart),
-                                                         QtDraw.stickW,
-                                                         self.value2Scene(iend)
-                                                         -self.value2Scene(istart),
-                                                         brush=brushtemp)
+                    self.candleItems.append(self.ui.graphicsView.scene().addRect(
+                                                self.pos2Scene(postemp)
+                                                -widthtemp/2,
+                                                self.value2Scene(istart),
+                                                widthtemp,
+                                                self.value2Scene(iend)
+                                                -self.value2Scene(istart),
+                                                brush=brushtemp))
         except Exception as e:
             self.toLog(traceback.format_exc())
     def clearBtnClicked (self):
@@ -1048,39 +1113,10 @@ class QtDraw(QtGui.QMainWindow):
             self.toLog('Band Scan')
             goldRatio=financeMath.FinanceMathFunction.goldRatio
             cgRation=financeMath.FinanceMathFunction.cjGRation
-            finalValue=[]
-            lastperiod=None
-            for icount in range(5, 100):
-                periodtemp=int(icount*goldRatio)
-                if lastperiod==None:
-                    lasperiod=periodtemp
-                elif lasperiod==periodtemp:
-                    lasperiod=periodtemp
-                    continue
-                hmaPeriod=int(cgRation*periodtemp)
-                for jcount in range(2, 41):
-                    multemp=jcount*cgRation
-                    mobj=financeMath.FinanceMathFunction()
-                    hmalineHi=financeData.FinanceLine()
-                    hmalineLo=financeData.FinanceLine()
-                    for kcount in range(len(self.candleData.closeValue)):
-                        try:
-                            mobj.calHMA(self.candleData.highValue, hmalineHi, kcount, hmaPeriod)
-                        except financeMath.FinanceMathFunctionPosBelowPeriod:
-                            pass
-                        try:
-                            mobj.calHMA(self.candleData.lowValue, hmalineLo, kcount, hmaPeriod)
-                        except financeMath.FinanceMathFunctionPosBelowPeriod:
-                            pass
-                    pLine, vLine=mobj.getHighLowSignificantPoint(hmalineHi, hmalineLo, self.candleData.highValue, self.candleData.lowValue, int(hmaPeriod*financeMath.FinanceMathFunction.cjGRation))
-            
-                    wtemp=mobj.calHMABandWeight(self.candleData.closeValue, self.candleData.highValue, 
-                                  self.candleData.lowValue, pLine, vLine, periodtemp, multemp)
-                    #self.toLog('Period:%d Mul:%f WValue:%f' % (periodtemp, multemp, wtemp))
-                    #if len(finalValue)==0 or wtemp<finalValue[-1][0]:
-                    #    finalValue.append([wtemp, periodtemp, multemp])
-                    finalValue.append([wtemp, periodtemp, multemp])
-            finalValue.sort(key=lambda t: t[0])
+            # the grid runs in a process pool, see financeMath.iterSweep
+            finalValue=financeMath.sweep(self.candleData, "hmaBandWeight",
+                                         [int(icount*goldRatio) for icount in range(5, 100)],
+                                         [jcount*cgRation for jcount in range(2, 41)])
             for item in finalValue:
                 self.toLog('Final Period:%d Mul:%f WValue:%f' % (item[1], item[2], item[0]))
         except Exception as e:
@@ -1096,17 +1132,12 @@ class QtDraw(QtGui.QMainWindow):
             self.toLog('Ration scan. %s' %matemp)
             goldRatio=financeMath.FinanceMathFunction.goldRatio
             cgRation=financeMath.FinanceMathFunction.cjGRation
-            result=[]
-            for icount in range(10, 120):
-                periodtemp=int(icount*goldRatio)
-                for jcount in range(1, 21):
-                    multemp=jcount*cgRation
-                    mobj=financeMath.FinanceMathFunction()
-                    rtemp, otemp=mobj.calRatio(self.candleData.closeValue,self.candleData.highValue,self.candleData.lowValue, periodtemp,multemp,matype=matemp)
-                    result.append((periodtemp, multemp, rtemp, otemp))
-            result.sort(key=lambda t: t[2])
-            for item in result:
-                self.toLog('%f %f %f' %(item[0], item[1], item[2]))
+            result=financeMath.sweep(self.candleData, "ratio",
+                                     [int(icount*goldRatio) for icount in range(10, 120)],
+                                     [jcount*cgRation for jcount in range(1, 21)],
+                                     matype=matemp)
+            for ((rtemp, otemp), periodtemp, multemp) in result:
+                self.toLog('%f %f %f' %(periodtemp, multemp, rtemp))
 
         except Exception:
             self.toLog(traceback.format_exc())
@@ -1115,6 +1146,13 @@ class QtDraw(QtGui.QMainWindow):
             if QtGui.QMessageBox.warning(None, "Scan MACD arg.","This will take a lost of time. Are you sure?", QtGui.QMessageBox.Ok | QtGui.QMessageBox.Cancel) != QtGui.QMessageBox.Ok:
                 return
             self.toLog('Scanning...')
+            goldRatio=financeMath.FinanceMathFunction.goldRatio
+            # multipliers of the kkMacdWeight sweep are EMA periods
+            result=financeMath.sweep(self.candleData, "kkMacdWeight",
+                                     [int(icount*goldRatio) for icount in range(5, 40)],
+                                     [int(jcount*goldRatio) for jcount in range(3, 30)])
+            for (wtemp, hmaperiod, emaperiod) in result:
+                self.toLog('HMA:%d EMA:%d WValue:%f' % (hmaperiod, emaperiod, wtemp))
         except Exception as e:
             self.toLog(traceback.format_exc())
 if __name__=='__main__':
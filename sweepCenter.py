@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+.. module:: sweepCenter
+    :synopsis: sweep band, ratio and KK MACD arguments of all symbols in dataCenter.ini
+.. author: K.K.Chien
+"""
+import argparse
+import sys
+import time
+import financeMath
+import dataCenter
+
+def sweepGrid (objective):
+    """get the period and multiplier grid of the QtDraw scans
+
+    get the period and multiplier grid of the QtDraw scans
+
+    Args:
+        objective: objective name in financeMath.sweepObjectiveDict
+
+    Returns:
+        return (periods, multipliers)
+
+    Raise:
+        None
+    """
+    goldRatio=financeMath.FinanceMathFunction.goldRatio
+    cgRation=financeMath.FinanceMathFunction.cjGRation
+    if objective=="ratio":
+        return ([int(icount*goldRatio) for icount in range(10, 120)],
+                [jcount*cgRation for jcount in range(1, 21)])
+    if objective=="kkMacdWeight":
+        return ([int(icount*goldRatio) for icount in range(5, 40)],
+                [int(jcount*goldRatio) for jcount in range(3, 30)])
+    return ([int(icount*goldRatio) for icount in range(5, 100)],
+            [jcount*cgRation for jcount in range(2, 41)])
+
+if __name__=="__main__":
+    parser=argparse.ArgumentParser(description="Sweep band, ratio and KK MACD "
+                                   "arguments of dataCenter symbols.")
+    parser.add_argument("--ini", default="dataCenter.ini",
+                        help="dataCenter config file")
+    parser.add_argument("--objective", default="ratio",
+                        choices=sorted(financeMath.sweepObjectiveDict.keys()))
+    parser.add_argument("--matype", default="hma", choices=["hma", "ema"],
+                        help="moving average type of ratio objective")
+    parser.add_argument("--bars", type=int, default=1000,
+                        help="sweep the last bars, 0 for all bars")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker process count, default CPU count")
+    parser.add_argument("--top", type=int, default=10,
+                        help="print the best results")
+    args=parser.parse_args()
+    ddc=dataCenter.DataCenterCofigCollect()
+    ddc.loadFromFile(args.ini)
+    dcenter=dataCenter.DataCenter()
+    (periods, multipliers)=sweepGrid(args.objective)
+    options={"matype":args.matype} if args.objective=="ratio" else {}
+    for item in ddc:
+        print("Processing",":",item.Name)
+        sys.stdout.flush()
+        settemp=dcenter.getDataFromFile(item)
+        if args.bars>0:
+            settemp=settemp[-args.bars:]
+        if len(settemp)==0:
+            print("    No data.")
+            continue
+        starttemp=time.perf_counter()
+        result=financeMath.sweep(settemp, args.objective, periods,
+                                 multipliers, args.processes, **options)
+        print("    Sweep {0:d} points in {1:.3f} s."
+              .format(len(result), time.perf_counter()-starttemp))
+        for (value, period, multiplier) in result[:args.top]:
+            print("    Period:{0:d} Mul:{1:f} Value:{2:s}"
+                  .format(period, multiplier, str(value)))
+        sys.stdout.flush()